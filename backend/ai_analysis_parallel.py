@@ -4,8 +4,8 @@ Optimized version of repository analysis with concurrent processing
 """
 
 import asyncio
-import httpx
 from typing import List, Dict
+from github_service import GitHubService
 from workflow_parser import WorkflowParser
 from workflow_duplicate_detector import DuplicateDetector
 from assessment_logic import determine_assessment_types
@@ -53,7 +53,7 @@ async def analyze_single_repository(
         
         workflow_url = f"https://api.github.com/repos/{repo_name}/contents/.github/workflows"
         
-        async with httpx.AsyncClient(verify=False, timeout=30.0) as client:
+        async with GitHubService.get_http_client() as client:
             # Parallel fetch of multiple API endpoints
             file_tree_task = fetch_repo_file_tree(repo_name, github_token, client)
             languages_task = client.get(f"https://api.github.com/repos/{repo_name}/languages", headers=headers)
@@ -17,6 +17,7 @@ async def check_scopes():
         return
     
     from crypto import decrypt_secret
+    from github_service import GitHubService
     github_token = decrypt_secret(github_token_secret.encrypted_value)
     
     headers = {
@@ -25,7 +26,7 @@ async def check_scopes():
         'X-GitHub-Api-Version': '2022-11-28'
     }
     
-    async with httpx.AsyncClient(verify=False) as client:
+    async with httpx.AsyncClient(verify=GitHubService._get_ssl_verify()) as client:
         print("Checking token scopes...")
         r = await client.get('https://api.github.com/user', headers=headers)
         scopes = r.headers.get('x-oauth-scopes', '')
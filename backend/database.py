@@ -11,15 +11,26 @@ os.makedirs("data", exist_ok=True)
 SECRETS_DATABASE_URL = "sqlite:///./data/secrets.db"
 TEMPLATES_DATABASE_URL = "sqlite:///./data/templates.db"
 
+# Connection pool sizing (tunable per deployment)
+POOL_SIZE = int(os.getenv("SA_POOL_SIZE", "20"))
+MAX_OVERFLOW = int(os.getenv("SA_MAX_OVERFLOW", "40"))
+
 # Create SQLAlchemy engines
 secrets_engine = create_engine(
     SECRETS_DATABASE_URL, 
-    connect_args={"check_same_thread": False}  # Needed for SQLite
+    connect_args={"check_same_thread": False},  # Needed for SQLite
+    pool_size=POOL_SIZE,
+    max_overflow=MAX_OVERFLOW,
+    pool_pre_ping=True
 )
 
 templates_engine = create_engine(
     TEMPLATES_DATABASE_URL, 
-    connect_args={"check_same_thread": False}  # Needed for SQLite
+    connect_args={"check_same_thread": False},  # Needed for SQLite
+    pool_size=POOL_SIZE,
+    max_overflow=MAX_OVERFLOW,
+    pool_pre_ping=True,
+    insertmanyvalues_page_size=1000  # Chunk size for batched multi-row INSERTs
 )
 
 # Create sessionmakers
@@ -53,6 +64,11 @@ def create_tables():
     # Create templates tables
     from templates_models import Template
     TemplatesBase.metadata.create_all(bind=templates_engine)
+    # create_all() does not add columns to existing tables
+    with templates_engine.begin() as conn:
+        columns = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(templates)")}
+        if 'keywords_normalized' not in columns:
+            conn.exec_driver_sql("ALTER TABLE templates ADD COLUMN keywords_normalized JSON")
 
 # Dependency to get secrets database session
 def get_db():
@@ -1,7 +1,16 @@
 import asyncio
+import base64
+import hashlib
 import httpx
+import orjson
 import os
-from typing import List, Dict, Optional
+import random
+import secrets
+import ssl
+import time
+from collections import Counter, OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Dict, Optional, Tuple
 from sqlalchemy.orm import Session
 from secrets_crud import SecretCRUD
 from datetime import datetime, timedelta
@@ -12,34 +21,137 @@ class RepositoryCache:
     def __init__(self):
         self.cache = {}
         self.cache_ttl = timedelta(minutes=10)  # Cache for 10 minutes
+        self.refresh_after = self.cache_ttl * 0.8  # Refresh in the background when close to expiry
     
     def get(self, key: str) -> Optional[Dict]:
         """Get cached data if not expired"""
-        if key in self.cache:
-            entry = self.cache[key]
-            if datetime.now() - entry['timestamp'] < self.cache_ttl:
-                return entry['data']
-            else:
-                # Expired, remove it
-                del self.cache[key]
+        entry = self.cache.get(key)
+        if entry and datetime.now() - entry['timestamp'] < self.cache_ttl:
+            return entry['data']
+        # Expired entries are kept so they can still be served stale if GitHub is unreachable
         return None
     
-    def set(self, key: str, data: List[Dict]):
-        """Cache the data"""
+    def get_stale(self, key: str) -> Optional[Dict]:
+        """Get cached data even if it has expired"""
+        entry = self.cache.get(key)
+        return entry['data'] if entry else None
+    
+    def is_refresh_due(self, key: str) -> bool:
+        """Check whether cached data is close to expiring and should be refreshed"""
+        entry = self.cache.get(key)
+        return entry is not None and datetime.now() - entry['timestamp'] >= self.refresh_after
+    
+    def get_pages(self, key: str) -> List[tuple]:
+        """Get the (etag, repositories) pages the cached data was built from, for conditional requests"""
+        entry = self.cache.get(key)
+        return entry.get('pages', []) if entry else []
+    
+    def set(self, key: str, data: List[Dict], pages: Optional[List[tuple]] = None, timestamp: Optional[datetime] = None):
+        """Cache the data, optionally with the (etag, repositories) pages it was built from"""
         self.cache[key] = {
             'data': data,
-            'timestamp': datetime.now()
+            'pages': pages or [],
+            'timestamp': timestamp or datetime.now()
         }
     
     def clear(self):
         """Clear all cached data"""
         self.cache = {}
 
+class ConcurrencyLimitedTransport(httpx.AsyncBaseTransport):
+    """
+    Transport that caps the number of GitHub requests in flight, so bursts of fan-out don't trip
+    GitHub's secondary rate limits, and counts the requests it sends. Rate-limited requests are
+    retried once GitHub's Retry-After (or rate limit reset) has passed, if that is soon enough;
+    reads that hit a transient server error are retried with exponential backoff.
+    """
+    MAX_RETRIES = 5
+    MAX_RATE_LIMIT_WAIT = 60  # Seconds; longer waits are returned to the caller as the rate-limit response
+    RETRYABLE_SERVER_ERRORS = (500, 502, 503, 504)
+    IDEMPOTENT_READS = ("GET", "HEAD")  # Writes may have been applied even when GitHub answers 5xx
+    
+    def __init__(self, transport: httpx.AsyncBaseTransport, max_concurrent: int, stats: Counter):
+        self.transport = transport
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.stats = stats
+    
+    @staticmethod
+    def _retry_wait(request: httpx.Request, response: httpx.Response, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying a response, or None if it shouldn't be retried"""
+        if response.status_code in ConcurrencyLimitedTransport.RETRYABLE_SERVER_ERRORS:
+            if request.method not in ConcurrencyLimitedTransport.IDEMPOTENT_READS:
+                return None
+            return 2 ** attempt + random.uniform(0, 1)
+        if response.status_code not in (403, 429):
+            return None
+        retry_after = response.headers.get("Retry-After")
+        reset = response.headers.get("X-RateLimit-Reset")
+        try:
+            if retry_after is not None:
+                wait = float(retry_after)
+            elif response.headers.get("X-RateLimit-Remaining") == "0" and reset is not None:
+                wait = float(reset) - time.time()
+            elif response.status_code == 429:
+                wait = 2 ** attempt
+            else:
+                return None  # A plain 403 is a permission error
+        except ValueError:
+            return None
+        if wait > ConcurrencyLimitedTransport.MAX_RATE_LIMIT_WAIT:
+            return None
+        # Jitter so requests held back together don't all retry at the same instant
+        return max(wait, 0) + random.uniform(0, 1)
+    
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        for attempt in range(self.MAX_RETRIES + 1):
+            async with self.semaphore:
+                self.stats["graphql_calls" if request.url.path.endswith("/graphql") else "rest_calls"] += 1
+                response = await self.transport.handle_async_request(request)
+            
+            wait = self._retry_wait(request, response, attempt) if attempt < self.MAX_RETRIES else None
+            if wait is None:
+                break
+            # Sleep outside the semaphore so other requests can proceed
+            self.stats["server_error_retries" if response.status_code >= 500 else "rate_limit_retries"] += 1
+            await response.aclose()
+            await asyncio.sleep(wait)
+        
+        if response.status_code == 304:
+            self.stats["not_modified"] += 1
+        return response
+    
+    async def aclose(self):
+        await self.transport.aclose()
+
 class GitHubService:
     """Service for interacting with GitHub API"""
     
     BASE_URL = os.getenv('GITHUB_API_URL', 'https://api.github.com')
     _repo_cache = RepositoryCache()  # Shared cache instance
+    BLOB_CACHE_SIZE = 2048  # File contents kept by blob sha, least recently used evicted first
+    BLOB_CACHE_MAX_CHARS = 64 * 1024 * 1024  # Total characters of cached file contents
+    _blob_cache: "OrderedDict[str, str]" = OrderedDict()  # File contents keyed by git blob sha (immutable)
+    _blob_cache_chars = 0
+    _inflight: Dict[str, asyncio.Future] = {}  # In-flight requests keyed by cache key (single-flight)
+    _http_client: Optional[httpx.AsyncClient] = None  # Shared pooled client, see get_http_client()
+    _background_tasks: set = set()  # Keep references to background cache refreshes
+    TOKEN_VERIFICATION_TTL = 300  # Seconds a successful token verification is trusted
+    _verified_tokens: Dict[str, float] = {}  # sha256(token) -> monotonic time the verification expires
+    CONDITIONAL_CACHE_SIZE = 1024  # Responses kept for ETag revalidation, least recently used evicted first
+    CONDITIONAL_CACHE_MAX_BYTES = 64 * 1024 * 1024  # Total size of the cached response bodies
+    CONDITIONAL_CACHE_MAX_ENTRY_BYTES = 4 * 1024 * 1024  # Larger bodies (e.g. big recursive trees) aren't cached
+    _conditional_cache: "OrderedDict[tuple, tuple]" = OrderedDict()  # (token hash, url, params) -> (etag, last_modified, content)
+    _conditional_cache_bytes = 0
+    MAX_CONCURRENT_PAGES = 10  # Pages of a listing fetched in parallel once the page count is known
+    _shared_cache = None  # Redis client shared by all workers, see _get_shared_cache()
+    _shared_cache_disabled = False
+    MAX_CONCURRENT_REQUESTS = int(os.getenv('GITHUB_MAX_CONCURRENT_REQUESTS', '10'))  # GitHub requests in flight at once
+    request_stats: Counter = Counter()  # Outbound request and cache hit counters, reported by /health
+    DEFAULT_BRANCH_TTL = 600  # Seconds a repository's default branch is remembered
+    DEFAULT_BRANCH_CACHE_SIZE = 1024
+    _default_branch_cache: Dict[tuple, tuple] = {}  # (token hash, full repo name) -> (default branch, monotonic expiry)
+    BRANCH_SHA_TTL = 60  # Seconds a branch head SHA is remembered; writes through the shared client drop it sooner
+    _branch_sha_cache: Dict[tuple, tuple] = {}  # (token hash, full repo name, branch) -> (head SHA, monotonic expiry)
     
     @staticmethod
     def get_base_url(db: Session = None) -> str:
@@ -48,16 +160,201 @@ class GitHubService:
         return os.getenv('GITHUB_API_URL', 'https://api.github.com')
     
     @staticmethod
-    def get_http_client() -> httpx.AsyncClient:
-        """Create an HTTP client with proper SSL configuration"""
-        # Temporary SSL fix for development environments
-        # In production, you should use verify=True with proper certificates
+    def _get_ssl_verify():
+        """
+        TLS verification for GitHub requests: the certifi bundle by default, GITHUB_CA_BUNDLE for
+        a corporate proxy's CA, or disabled with GITHUB_SSL_VERIFY=false (development only)
+        """
+        if os.getenv('GITHUB_SSL_VERIFY', 'true').lower() in ('0', 'false', 'no'):
+            return False
+        import certifi
+        return ssl.create_default_context(cafile=os.getenv('GITHUB_CA_BUNDLE') or certifi.where())
+    
+    @staticmethod
+    def _create_http_client() -> httpx.AsyncClient:
+        """Create an HTTP client with proper SSL configuration and a keep-alive connection pool"""
+        transport = httpx.AsyncHTTPTransport(
+            verify=GitHubService._get_ssl_verify(),
+            http2=True,  # Multiplex concurrent requests over a single connection
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50)
+        )
         return httpx.AsyncClient(
-            verify=False,  # Temporarily disable SSL verification for development
+            transport=ConcurrencyLimitedTransport(
+                transport, GitHubService.MAX_CONCURRENT_REQUESTS, GitHubService.request_stats
+            ),
             timeout=30.0,  # Set timeout
-            follow_redirects=True
+            follow_redirects=True,
+            event_hooks={"response": [
+                GitHubService._forget_token_on_unauthorized,
+                GitHubService._forget_branch_shas_on_write
+            ]}
         )
     
+    @staticmethod
+    @asynccontextmanager
+    async def get_http_client() -> AsyncIterator[httpx.AsyncClient]:
+        """
+        Provide the shared HTTP client. The client is kept open across calls so
+        TCP/TLS connections are reused; it is closed by close_http_client() on shutdown.
+        """
+        if GitHubService._http_client is None or GitHubService._http_client.is_closed:
+            GitHubService._http_client = GitHubService._create_http_client()
+        yield GitHubService._http_client
+    
+    @staticmethod
+    async def open_http_client():
+        """Create the shared HTTP client ahead of the first request; loading the CA bundle blocks"""
+        if GitHubService._http_client is None or GitHubService._http_client.is_closed:
+            GitHubService._http_client = await asyncio.to_thread(GitHubService._create_http_client)
+    
+    @staticmethod
+    async def close_http_client():
+        """Close the shared HTTP client and its pooled connections"""
+        if GitHubService._http_client is not None:
+            await GitHubService._http_client.aclose()
+            GitHubService._http_client = None
+    
+    @staticmethod
+    def _authorization_hash(headers: Dict) -> str:
+        """Hash the Authorization header so caches can be scoped to a token without storing it"""
+        return hashlib.blake2b(headers.get("Authorization", "").encode(), digest_size=8).hexdigest()
+    
+    @staticmethod
+    async def get_default_branch(client: httpx.AsyncClient, full_repo_name: str, headers: Dict) -> Optional[str]:
+        """Get a repository's default branch, remembered for DEFAULT_BRANCH_TTL seconds. None if the lookup fails."""
+        cache_key = (GitHubService._authorization_hash(headers), full_repo_name)
+        cached = GitHubService._default_branch_cache.get(cache_key)
+        if cached and time.monotonic() < cached[1]:
+            return cached[0]
+        
+        repo_response = await GitHubService.conditional_get(
+            client, f"{GitHubService.get_base_url()}/repos/{full_repo_name}", headers
+        )
+        if repo_response.status_code != 200:
+            return None
+        
+        default_branch = orjson.loads(repo_response.content).get('default_branch', 'main')
+        if len(GitHubService._default_branch_cache) >= GitHubService.DEFAULT_BRANCH_CACHE_SIZE:
+            # Evict the oldest entry
+            GitHubService._default_branch_cache.pop(next(iter(GitHubService._default_branch_cache)))
+        GitHubService._default_branch_cache[cache_key] = (default_branch, time.monotonic() + GitHubService.DEFAULT_BRANCH_TTL)
+        return default_branch
+    
+    @staticmethod
+    async def get_branch_sha(client: httpx.AsyncClient, full_repo_name: str, branch: str, headers: Dict) -> Optional[str]:
+        """
+        Get the head commit SHA of a branch, remembered for BRANCH_SHA_TTL seconds. Only use it as
+        the base of a new branch; None if the lookup fails.
+        """
+        cache_key = (GitHubService._authorization_hash(headers), full_repo_name, branch)
+        cached = GitHubService._branch_sha_cache.get(cache_key)
+        if cached and time.monotonic() < cached[1]:
+            return cached[0]
+        
+        ref_response = await client.get(
+            f"{GitHubService.get_base_url()}/repos/{full_repo_name}/git/ref/heads/{branch}", headers=headers
+        )
+        if ref_response.status_code != 200:
+            return None
+        
+        sha = ref_response.json()["object"]["sha"]
+        if len(GitHubService._branch_sha_cache) >= GitHubService.DEFAULT_BRANCH_CACHE_SIZE:
+            # Evict the oldest entry
+            GitHubService._branch_sha_cache.pop(next(iter(GitHubService._branch_sha_cache)))
+        GitHubService._branch_sha_cache[cache_key] = (sha, time.monotonic() + GitHubService.BRANCH_SHA_TTL)
+        return sha
+    
+    @staticmethod
+    async def get_default_branch_head(client: httpx.AsyncClient, full_repo_name: str,
+                                      headers: Dict) -> Tuple[Optional[str], Optional[str]]:
+        """Get a repository's default branch and its head commit SHA, either None if its lookup fails"""
+        default_branch = await GitHubService.get_default_branch(client, full_repo_name, headers)
+        if default_branch is None:
+            return None, None
+        return default_branch, await GitHubService.get_branch_sha(client, full_repo_name, default_branch, headers)
+    
+    @staticmethod
+    async def create_branch(client: httpx.AsyncClient, full_repo_name: str, branch: str, sha: str,
+                            headers: Dict, max_attempts: int = 5) -> tuple:
+        """
+        Create a branch at the given commit. If the name is taken (422), retry with a timestamped,
+        randomized suffix so parallel requests for the same repository don't collide.
+        Returns (branch name, response of the last attempt).
+        """
+        create_ref_url = f"{GitHubService.get_base_url()}/repos/{full_repo_name}/git/refs"
+        new_branch = branch
+        for attempt in range(max_attempts):
+            if attempt:
+                new_branch = f"{branch}-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{secrets.token_hex(3)}"
+            response = await client.post(
+                create_ref_url, headers=headers, json={"ref": f"refs/heads/{new_branch}", "sha": sha}
+            )
+            if response.status_code != 422:
+                break
+        return new_branch, response
+    
+    @staticmethod
+    async def _forget_branch_shas_on_write(response: httpx.Response):
+        """Response hook: a successful write to a repository may have moved its branches"""
+        request = response.request
+        if request.method == "GET" or not response.is_success or not GitHubService._branch_sha_cache:
+            return
+        path = request.url.path.split("/repos/", 1)
+        if len(path) != 2:
+            return
+        full_repo_name = "/".join(path[1].split("/")[:2])
+        for cache_key in [key for key in GitHubService._branch_sha_cache if key[1] == full_repo_name]:
+            GitHubService._branch_sha_cache.pop(cache_key, None)
+    
+    @staticmethod
+    async def conditional_get(client: httpx.AsyncClient, url: str, headers: Dict, params: Optional[Dict] = None) -> httpx.Response:
+        """
+        GET with ETag/Last-Modified revalidation. A 304 from GitHub (which doesn't count against the
+        rate limit) is answered with the previously cached 200 response body.
+        """
+        cache_key = (
+            GitHubService._authorization_hash(headers),
+            url,
+            tuple(sorted((params or {}).items()))
+        )
+        cached = GitHubService._conditional_cache.get(cache_key)
+        
+        request_headers = headers
+        if cached:
+            etag, last_modified, _ = cached
+            request_headers = {**headers}
+            if etag:
+                request_headers["If-None-Match"] = etag
+            if last_modified:
+                request_headers["If-Modified-Since"] = last_modified
+        
+        response = await client.get(url, headers=request_headers, params=params)
+        
+        if response.status_code == 304 and cached:
+            GitHubService._conditional_cache.move_to_end(cache_key)
+            return httpx.Response(
+                200,
+                content=cached[2],
+                headers={"Content-Type": response.headers.get("Content-Type", "application/json")},
+                request=response.request
+            )
+        
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if (response.status_code == 200 and (etag or last_modified)
+                and len(response.content) <= GitHubService.CONDITIONAL_CACHE_MAX_ENTRY_BYTES):
+            previous = GitHubService._conditional_cache.pop(cache_key, None)
+            if previous:
+                GitHubService._conditional_cache_bytes -= len(previous[2])
+            GitHubService._conditional_cache[cache_key] = (etag, last_modified, response.content)
+            GitHubService._conditional_cache_bytes += len(response.content)
+            while (len(GitHubService._conditional_cache) > GitHubService.CONDITIONAL_CACHE_SIZE
+                   or GitHubService._conditional_cache_bytes > GitHubService.CONDITIONAL_CACHE_MAX_BYTES):
+                _, evicted = GitHubService._conditional_cache.popitem(last=False)
+                GitHubService._conditional_cache_bytes -= len(evicted[2])
+        
+        return response
+    
     @staticmethod
     def is_sso_error(error_message: str) -> bool:
         """Check if error is related to SSO enforcement"""
@@ -86,14 +383,34 @@ class GitHubService:
             return f"{base_msg}Organization: {org_name}\n\n{steps}"
         return f"{base_msg}\n\n{steps}"
     
+    @staticmethod
+    async def _single_flight(key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Coalesce concurrent identical requests: if a request for the key is already
+        in flight, await its result instead of issuing a new request.
+        """
+        future = GitHubService._inflight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+        
+        future = asyncio.ensure_future(fetch())
+        GitHubService._inflight[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if GitHubService._inflight.get(key) is future:
+                del GitHubService._inflight[key]
+    
     @staticmethod
     async def get_github_token(db: Session) -> Optional[str]:
         """Get GITHUB_TOKEN from secrets storage"""
-        try:
+        def load_token() -> Optional[str]:
             secret = SecretCRUD.get_secret_by_name(db, "GITHUB_TOKEN")
-            if secret:
-                return SecretCRUD.decrypt_secret_value(secret)
-            return None
+            return SecretCRUD.decrypt_secret_value(secret) if secret else None
+        
+        try:
+            # The query and the decryption both block, keep them off the event loop
+            return await asyncio.to_thread(load_token)
         except Exception as e:
             print(f"Error getting GitHub token: {e}")
             return None
@@ -191,18 +508,274 @@ class GitHubService:
     async def get_organization_repositories(token: str, org_name: str) -> List[Dict]:
         """Get repositories for a specific organization with language details"""
         # Check cache first
-        cache_key = f"org:{org_name}"
+        cache_key = GitHubService._repo_cache_key(token, f"org:{org_name}")
+        
+        def fetch():
+            return GitHubService._fetch_organization_repositories(token, org_name, cache_key)
+        
+        return await GitHubService._get_cached_repositories(cache_key, fetch)
+    
+    @staticmethod
+    def _get_shared_cache():
+        """
+        Get the Redis client used to share the repository cache between worker processes.
+        None when REDIS_URL isn't set or the redis package isn't installed.
+        """
+        if GitHubService._shared_cache is None and not GitHubService._shared_cache_disabled:
+            redis_url = os.getenv("REDIS_URL")
+            if not redis_url:
+                GitHubService._shared_cache_disabled = True
+                return None
+            try:
+                import redis.asyncio as redis
+            except ImportError:
+                print("REDIS_URL is set but the redis package is not installed; using the in-process cache only")
+                GitHubService._shared_cache_disabled = True
+                return None
+            GitHubService._shared_cache = redis.from_url(redis_url, socket_timeout=1, socket_connect_timeout=1)
+        return GitHubService._shared_cache
+    
+    @staticmethod
+    async def close_shared_cache():
+        """Close the shared Redis cache connection"""
+        if GitHubService._shared_cache is not None:
+            await GitHubService._shared_cache.aclose()
+            GitHubService._shared_cache = None
+    
+    @staticmethod
+    async def _load_shared_repositories(cache_key: str) -> Optional[List[Dict]]:
+        """Load repositories cached by another worker into the local cache. None on a miss or Redis error."""
+        shared_cache = GitHubService._get_shared_cache()
+        if shared_cache is None:
+            return None
+        try:
+            payload = await shared_cache.get(f"gh:repos:{cache_key}")
+        except Exception as e:
+            print(f"Shared cache read failed, using the in-process cache only: {e}")
+            return None
+        if payload is None:
+            return None
+        
+        try:
+            entry = orjson.loads(payload)
+            data = entry["data"]
+            timestamp = datetime.fromisoformat(entry["timestamp"])
+        except (orjson.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+            # A corrupt or old-format entry is a miss; the next fetch overwrites it
+            print(f"Ignoring unreadable shared cache entry: {e}")
+            return None
+        GitHubService._repo_cache.set(cache_key, data, timestamp=timestamp)
+        GitHubService.request_stats["shared_cache_hits"] += 1
+        return data
+    
+    @staticmethod
+    async def clear_repository_cache():
+        """Clear the repository cache, including the copies shared with other workers through Redis"""
+        GitHubService._repo_cache.clear()
+        shared_cache = GitHubService._get_shared_cache()
+        if shared_cache is None:
+            return
+        keys = [key async for key in shared_cache.scan_iter(match="gh:repos:*", count=500)]
+        if keys:
+            await shared_cache.delete(*keys)
+    
+    @staticmethod
+    async def _share_repositories(cache_key: str, data: List[Dict]):
+        """Publish freshly fetched repositories to the other workers"""
+        shared_cache = GitHubService._get_shared_cache()
+        if shared_cache is None:
+            return
+        try:
+            # Leave out values precomputed on the dicts (e.g. _languages_casefold); readers recompute them
+            shareable_data = [
+                {key: value for key, value in repo.items() if not key.startswith("_")}
+                for repo in data
+            ]
+            payload = orjson.dumps({"timestamp": datetime.now(), "data": shareable_data})
+            await shared_cache.setex(
+                f"gh:repos:{cache_key}", int(GitHubService._repo_cache.cache_ttl.total_seconds()), payload
+            )
+        except Exception as e:
+            print(f"Shared cache write failed: {e}")
+    
+    @staticmethod
+    async def _fetch_and_share_repositories(cache_key: str, fetch: Callable[[], Awaitable[List[Dict]]]) -> List[Dict]:
+        """Fetch repositories from GitHub and publish them to the shared cache"""
+        data = await fetch()
+        await GitHubService._share_repositories(cache_key, data)
+        return data
+    
+    @staticmethod
+    def _repo_cache_key(token: str, key: str) -> str:
+        """Build a repository cache key that is scoped to the token, so users never see each other's data"""
+        token_hash = hashlib.blake2b(token.encode(), digest_size=8).hexdigest()
+        return f"{key}:{token_hash}"
+    
+    @staticmethod
+    async def _get_cached_repositories(cache_key: str, fetch: Callable[[], Awaitable[List[Dict]]]) -> List[Dict]:
+        """
+        Serve repositories from the cache with stale-while-revalidate semantics: data close to
+        expiry is refreshed in the background, and expired data is served if GitHub is unreachable.
+        """
         cached_data = GitHubService._repo_cache.get(cache_key)
         if cached_data is not None:
+            GitHubService.request_stats["repository_cache_hits"] += 1
+            if GitHubService._repo_cache.is_refresh_due(cache_key) and cache_key not in GitHubService._inflight:
+                task = asyncio.ensure_future(GitHubService._refresh_cached_repositories(cache_key, fetch))
+                GitHubService._background_tasks.add(task)
+                task.add_done_callback(GitHubService._background_tasks.discard)
             return cached_data
         
+        shared_data = await GitHubService._load_shared_repositories(cache_key)
+        if shared_data is not None:
+            return shared_data
+        
+        try:
+            return await GitHubService._single_flight(
+                cache_key, lambda: GitHubService._fetch_and_share_repositories(cache_key, fetch)
+            )
+        except (httpx.RequestError, httpx.HTTPStatusError) as e:
+            is_transient = isinstance(e, httpx.RequestError) or e.response.status_code >= 500
+            stale_data = GitHubService._repo_cache.get_stale(cache_key)
+            if is_transient and stale_data is not None:
+                print(f"Serving stale cached repositories after GitHub error: {e}")
+                return stale_data
+            raise
+    
+    @staticmethod
+    async def _refresh_cached_repositories(cache_key: str, fetch: Callable[[], Awaitable[List[Dict]]]):
+        """Refresh cached repositories in the background"""
+        try:
+            await GitHubService._single_flight(
+                cache_key, lambda: GitHubService._fetch_and_share_repositories(cache_key, fetch)
+            )
+        except Exception as e:
+            print(f"Background repository cache refresh failed: {e}")
+    
+    @staticmethod
+    def _get_last_page(response: httpx.Response) -> Optional[int]:
+        """Read the last page number from GitHub's Link header, None if it isn't there"""
+        last_url = response.links.get("last", {}).get("url")
+        if not last_url:
+            return None
+        last_page = httpx.URL(last_url).params.get("page", "")
+        return int(last_page) if last_page.isdigit() else None
+    
+    @staticmethod
+    async def _fetch_all_pages(fetch_page: Callable[[int], Awaitable[tuple]], per_page: int) -> List[List]:
+        """
+        Fetch every page of a paginated listing. fetch_page(page) returns (items, last_page); after
+        page 1 the pages up to last_page are fetched concurrently, and further pages one at a time
+        for as long as the final page is full (no Link header, or the listing grew meanwhile).
+        """
+        items, last_page = await fetch_page(1)
+        pages = [items]
+        
+        if last_page and last_page > 1:
+            semaphore = asyncio.Semaphore(GitHubService.MAX_CONCURRENT_PAGES)
+            
+            async def fetch_page_limited(page: int) -> List:
+                async with semaphore:
+                    page_items, _ = await fetch_page(page)
+                    return page_items
+            
+            pages.extend(await asyncio.gather(*[fetch_page_limited(page) for page in range(2, last_page + 1)]))
+        
+        while len(pages[-1]) >= per_page:
+            items, _ = await fetch_page(len(pages) + 1)
+            pages.append(items)
+        
+        return pages
+    
+    @staticmethod
+    async def iter_organization_repositories(token: str, org_name: str) -> AsyncIterator[Dict]:
+        """
+        Iterate over an organization's repositories page by page as they arrive from GitHub,
+        instead of waiting for the complete list. Serves from the cache when available.
+        """
+        cache_key = GitHubService._repo_cache_key(token, f"org:{org_name}")
+        if GitHubService._repo_cache.get_stale(cache_key) is not None or cache_key in GitHubService._inflight:
+            # Cached (fresh, due for refresh or stale) or already being fetched by another request:
+            # let the cached lookup handle refreshing and sharing the in-flight result
+            for repo in await GitHubService.get_organization_repositories(token, org_name):
+                yield repo
+            return
+        
+        shared_data = await GitHubService._load_shared_repositories(cache_key)
+        if shared_data is not None:
+            for repo in shared_data:
+                yield repo
+            return
+        
+        # Publish the stream as the in-flight fetch, so concurrent requests wait for its result
+        # instead of crawling the organization again
+        future = asyncio.get_running_loop().create_future()
+        GitHubService._inflight[cache_key] = future
+        streamed_data = None
+        try:
+            async for repo in GitHubService._stream_organization_repositories(token, org_name, cache_key):
+                yield repo
+            streamed_data = GitHubService._repo_cache.get_stale(cache_key)
+            if streamed_data is not None:
+                await GitHubService._share_repositories(cache_key, streamed_data)
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Waiting requests re-raise it; don't log it as never retrieved
+            raise
+        finally:
+            if GitHubService._inflight.get(cache_key) is future:
+                del GitHubService._inflight[cache_key]
+            if streamed_data is not None:
+                future.set_result(streamed_data)
+            elif not future.done():
+                # Abandoned before the last page: finish the fetch for the requests waiting on it
+                GitHubService._complete_abandoned_stream(token, org_name, cache_key, future)
+    
+    @staticmethod
+    def _complete_abandoned_stream(token: str, org_name: str, cache_key: str, future: asyncio.Future):
+        """Resolve an abandoned stream's in-flight future with a complete fetch in the background"""
+        task = asyncio.ensure_future(GitHubService._single_flight(
+            cache_key,
+            lambda: GitHubService._fetch_and_share_repositories(
+                cache_key, lambda: GitHubService._fetch_organization_repositories(token, org_name, cache_key)
+            )
+        ))
+        GitHubService._background_tasks.add(task)
+        task.add_done_callback(GitHubService._background_tasks.discard)
+        
+        def resolve(done: asyncio.Task):
+            if done.cancelled():
+                future.cancel()
+            elif done.exception() is not None:
+                future.set_exception(done.exception())
+                future.exception()
+            else:
+                future.set_result(done.result())
+        task.add_done_callback(resolve)
+    
+    @staticmethod
+    async def _fetch_organization_repositories(token: str, org_name: str, cache_key: str) -> List[Dict]:
+        """Fetch organization repositories from GitHub and store them in the cache"""
+        return [
+            repo async for repo in GitHubService._stream_organization_repositories(token, org_name, cache_key)
+        ]
+    
+    @staticmethod
+    async def _stream_organization_repositories(token: str, org_name: str, cache_key: str) -> AsyncIterator[Dict]:
+        """
+        Yield organization repositories page by page with language/workflow details,
+        storing the complete list in the cache once all pages have been read
+        """
         headers = {
             "Authorization": f"token {token}",
             "Accept": "application/vnd.github.v3+json",
             "User-Agent": "Backend-App/1.0"
         }
         
-        repositories = []
+        # Only fetch detailed info for the first 10 repositories to speed up response
+        # Users can view details for specific repos individually
+        max_detailed_repos = 10
+        all_repositories = []
         per_page = 100
         page = 1
         
@@ -227,7 +800,16 @@ class GitHubService:
                 if not page_repos:
                     break
                 
-                repositories.extend(page_repos)
+                detailed_count = max(0, min(max_detailed_repos - len(all_repositories), len(page_repos)))
+                if detailed_count:
+                    await GitHubService._add_repository_details(page_repos[:detailed_count], headers)
+                # Set empty details for remaining repositories
+                for repo in page_repos[detailed_count:]:
+                    GitHubService._set_empty_repository_details(repo)
+                
+                all_repositories.extend(page_repos)
+                for repo in page_repos:
+                    yield repo
                 
                 # If we got fewer than per_page results, we're done
                 if len(page_repos) < per_page:
@@ -235,116 +817,118 @@ class GitHubService:
                 
                 page += 1
         
-        # Only fetch detailed info for the first 10 repositories to speed up response
-        # Users can view details for specific repos individually
-        repos_to_fetch_languages = repositories[:10] if repositories else []
-        repos_without_languages = repositories[10:] if len(repositories) > 10 else []
+        # Cache the result
+        GitHubService._repo_cache.set(cache_key, all_repositories)
+    
+    @staticmethod
+    def _set_empty_repository_details(repo: Dict):
+        """Mark a repository as having no fetched language/workflow details"""
+        repo["languages_detail"] = {}
+        repo["workflow_info"] = {
+            "workflow_files": [],
+            "total_count": 0,
+            "has_workflows": False,
+            "has_polaris_in_root": False
+        }
+    
+    @staticmethod
+    async def _add_repository_details(repositories: List[Dict], headers: Dict):
+        """Fetch languages, workflow files and root polaris files for the given repositories"""
+        # Limit concurrent requests to avoid overwhelming the API
+        max_concurrent = 3  # Reduced for more API calls per repo
+        semaphore = asyncio.Semaphore(max_concurrent)
         
-        if repos_to_fetch_languages:
-            # Limit concurrent requests to avoid overwhelming the API
-            max_concurrent = 3  # Reduced for more API calls per repo
-            semaphore = asyncio.Semaphore(max_concurrent)
-            
-            async def fetch_repo_details(repo):
-                async with semaphore:
-                    async with GitHubService.get_http_client() as client:
-                        try:
-                            owner = repo.get("owner", {}).get("login")
-                            repo_name = repo.get("name")
-                            if owner and repo_name:
-                                # Fetch languages
-                                lang_response = await client.get(
-                                    f"{GitHubService.BASE_URL}/repos/{owner}/{repo_name}/languages",
+        async def fetch_repo_details(repo):
+            async with semaphore:
+                async with GitHubService.get_http_client() as client:
+                    try:
+                        owner = repo.get("owner", {}).get("login")
+                        repo_name = repo.get("name")
+                        if owner and repo_name:
+                            # Fetch languages
+                            lang_response = await client.get(
+                                f"{GitHubService.BASE_URL}/repos/{owner}/{repo_name}/languages",
+                                headers=headers
+                            )
+                            if lang_response.status_code == 200:
+                                languages = lang_response.json()
+                                repo["languages_detail"] = languages
+                            else:
+                                repo["languages_detail"] = {}
+                            
+                            # Fetch workflow files info
+                            try:
+                                workflows_response = await client.get(
+                                    f"{GitHubService.BASE_URL}/repos/{owner}/{repo_name}/contents/.github/workflows",
                                     headers=headers
                                 )
-                                if lang_response.status_code == 200:
-                                    languages = lang_response.json()
-                                    repo["languages_detail"] = languages
+                                if workflows_response.status_code == 200:
+                                    workflows_data = workflows_response.json()
+                                    workflow_files = []
+                                    
+                                    for item in workflows_data:
+                                        if item.get("type") == "file" and item.get("name", "").endswith((".yml", ".yaml")):
+                                            workflow_files.append({
+                                                "name": item.get("name"),
+                                                "path": item.get("path"),
+                                                "size": item.get("size"),
+                                                "sha": item.get("sha")
+                                            })
+                                    
+                                    repo["workflow_info"] = {
+                                        "workflow_files": workflow_files,
+                                        "total_count": len(workflow_files),
+                                        "has_workflows": len(workflow_files) > 0
+                                    }
                                 else:
-                                    repo["languages_detail"] = {}
-                                
-                                # Fetch workflow files info
-                                try:
-                                    workflows_response = await client.get(
-                                        f"{GitHubService.BASE_URL}/repos/{owner}/{repo_name}/contents/.github/workflows",
-                                        headers=headers
-                                    )
-                                    if workflows_response.status_code == 200:
-                                        workflows_data = workflows_response.json()
-                                        workflow_files = []
-                                        
-                                        for item in workflows_data:
-                                            if item.get("type") == "file" and item.get("name", "").endswith((".yml", ".yaml")):
-                                                workflow_files.append({
-                                                    "name": item.get("name"),
-                                                    "path": item.get("path"),
-                                                    "size": item.get("size"),
-                                                    "sha": item.get("sha")
-                                                })
-                                        
-                                        repo["workflow_info"] = {
-                                            "workflow_files": workflow_files,
-                                            "total_count": len(workflow_files),
-                                            "has_workflows": len(workflow_files) > 0
-                                        }
-                                    else:
-                                        repo["workflow_info"] = {
-                                            "workflow_files": [],
-                                            "total_count": 0,
-                                            "has_workflows": False
-                                        }
-                                except Exception:
                                     repo["workflow_info"] = {
                                         "workflow_files": [],
                                         "total_count": 0,
                                         "has_workflows": False
                                     }
-                                
-                                # Check for polaris files in root
-                                try:
-                                    root_response = await client.get(
-                                        f"{GitHubService.BASE_URL}/repos/{owner}/{repo_name}/contents/",
-                                        headers=headers
-                                    )
-                                    if root_response.status_code == 200:
-                                        root_data = root_response.json()
-                                        polaris_files = [
-                                            item for item in root_data 
-                                            if item.get("type") == "file" and item.get("name") in ["polaris.yml", "polaris.yaml"]
-                                        ]
-                                        if not repo.get("workflow_info"):
-                                            repo["workflow_info"] = {
-                                                "workflow_files": [],
-                                                "total_count": 0,
-                                                "has_workflows": False
-                                            }
-                                        repo["workflow_info"]["has_polaris_in_root"] = len(polaris_files) > 0
-                                        # Add polaris files to workflow_files list
-                                        for pf in polaris_files:
-                                            repo["workflow_info"]["workflow_files"].append({
-                                                "name": pf.get("name"),
-                                                "path": pf.get("name"),
-                                                "size": pf.get("size", 0),
-                                                "sha": pf.get("sha", "")
-                                            })
-                                except Exception:
+                            except Exception:
+                                repo["workflow_info"] = {
+                                    "workflow_files": [],
+                                    "total_count": 0,
+                                    "has_workflows": False
+                                }
+                            
+                            # Check for polaris files in root
+                            try:
+                                root_response = await client.get(
+                                    f"{GitHubService.BASE_URL}/repos/{owner}/{repo_name}/contents/",
+                                    headers=headers
+                                )
+                                if root_response.status_code == 200:
+                                    root_data = root_response.json()
+                                    polaris_files = [
+                                        item for item in root_data 
+                                        if item.get("type") == "file" and item.get("name") in ["polaris.yml", "polaris.yaml"]
+                                    ]
                                     if not repo.get("workflow_info"):
                                         repo["workflow_info"] = {
                                             "workflow_files": [],
                                             "total_count": 0,
                                             "has_workflows": False
                                         }
-                                    repo["workflow_info"]["has_polaris_in_root"] = False
-                            else:
-                                repo["languages_detail"] = {}
-                                repo["workflow_info"] = {
-                                    "workflow_files": [],
-                                    "total_count": 0,
-                                    "has_workflows": False,
-                                    "has_polaris_in_root": False
-                                }
-                        except Exception as e:
-                            print(f"Could not fetch details for {repo.get('full_name', 'unknown')}: {e}")
+                                    repo["workflow_info"]["has_polaris_in_root"] = len(polaris_files) > 0
+                                    # Add polaris files to workflow_files list
+                                    for pf in polaris_files:
+                                        repo["workflow_info"]["workflow_files"].append({
+                                            "name": pf.get("name"),
+                                            "path": pf.get("name"),
+                                            "size": pf.get("size", 0),
+                                            "sha": pf.get("sha", "")
+                                        })
+                            except Exception:
+                                if not repo.get("workflow_info"):
+                                    repo["workflow_info"] = {
+                                        "workflow_files": [],
+                                        "total_count": 0,
+                                        "has_workflows": False
+                                    }
+                                repo["workflow_info"]["has_polaris_in_root"] = False
+                        else:
                             repo["languages_detail"] = {}
                             repo["workflow_info"] = {
                                 "workflow_files": [],
@@ -352,45 +936,25 @@ class GitHubService:
                                 "has_workflows": False,
                                 "has_polaris_in_root": False
                             }
-                        return repo
-            
-            # Fetch details for the first batch of repositories
-            try:
-                repos_with_details = await asyncio.gather(*[fetch_repo_details(repo) for repo in repos_to_fetch_languages], return_exceptions=True)
-                # Filter out any exceptions and keep valid repositories
-                repos_with_details = [repo for repo in repos_with_details if not isinstance(repo, Exception)]
-            except Exception as e:
-                print(f"Error fetching repo details: {e}")
-                # Fallback: set empty details for first batch
-                for repo in repos_to_fetch_languages:
-                    repo["languages_detail"] = {}
-                    repo["workflow_info"] = {
-                        "workflow_files": [],
-                        "total_count": 0,
-                        "has_workflows": False,
-                        "has_polaris_in_root": False
-                    }
-                repos_with_details = repos_to_fetch_languages
-        else:
-            repos_with_details = []
-        
-        # Set empty details for remaining repositories
-        for repo in repos_without_languages:
-            repo["languages_detail"] = {}
-            repo["workflow_info"] = {
-                "workflow_files": [],
-                "total_count": 0,
-                "has_workflows": False,
-                "has_polaris_in_root": False
-            }
-        
-        # Combine both lists
-        all_repositories = repos_with_details + repos_without_languages
-        
-        # Cache the result
-        GitHubService._repo_cache.set(cache_key, all_repositories)
+                    except Exception as e:
+                        print(f"Could not fetch details for {repo.get('full_name', 'unknown')}: {e}")
+                        repo["languages_detail"] = {}
+                        repo["workflow_info"] = {
+                            "workflow_files": [],
+                            "total_count": 0,
+                            "has_workflows": False,
+                            "has_polaris_in_root": False
+                        }
+                    return repo
         
-        return all_repositories
+        # Fetch details for the batch of repositories (details are set on the repo dicts in place)
+        try:
+            await asyncio.gather(*[fetch_repo_details(repo) for repo in repositories], return_exceptions=True)
+        except Exception as e:
+            print(f"Error fetching repo details: {e}")
+            # Fallback: set empty details for the batch
+            for repo in repositories:
+                GitHubService._set_empty_repository_details(repo)
     
     @staticmethod
     async def get_organization_secrets(token: str, org_name: str) -> List[Dict]:
@@ -470,27 +1034,39 @@ class GitHubService:
     async def get_user_repositories(token: str) -> List[Dict]:
         """Get all repositories the authenticated user has access to with language details"""
         # Check cache first
-        cache_key = "user:repos"
-        cached_data = GitHubService._repo_cache.get(cache_key)
-        if cached_data is not None:
-            return cached_data
+        cache_key = GitHubService._repo_cache_key(token, "user:repos")
+        
+        def fetch():
+            return GitHubService._fetch_user_repositories(token, cache_key)
         
+        return await GitHubService._get_cached_repositories(cache_key, fetch)
+    
+    @staticmethod
+    async def _fetch_user_repositories(token: str, cache_key: str) -> List[Dict]:
+        """Fetch the authenticated user's repositories from GitHub and store them in the cache"""
         headers = {
             "Authorization": f"token {token}",
             "Accept": "application/vnd.github.v3+json",
             "User-Agent": "Backend-App/1.0"
         }
         
-        repositories = []
         per_page = 100
-        page = 1
+        
+        # Revalidate previously fetched pages with their ETags; a 304 costs no rate limit
+        cached_pages = GitHubService._repo_cache.get_pages(cache_key)
+        fetched_pages = {}  # page number -> (etag, repositories)
+        unchanged_pages = set()
 
         async with GitHubService.get_http_client() as client:
-            # Fetch all pages to get all repositories
-            while True:
+            async def fetch_page(page: int) -> tuple:
+                cached_page = cached_pages[page - 1] if page <= len(cached_pages) else None
+                request_headers = headers
+                if cached_page and cached_page[0]:
+                    request_headers = {**headers, "If-None-Match": cached_page[0]}
+                
                 response = await client.get(
                     f"{GitHubService.BASE_URL}/user/repos",
-                    headers=headers,
+                    headers=request_headers,
                     params={
                         "page": page,
                         "per_page": per_page,
@@ -499,19 +1075,28 @@ class GitHubService:
                         "affiliation": "owner,collaborator,organization_member"
                     }
                 )
-                response.raise_for_status()
-                page_repos = response.json()
-                
-                if not page_repos:
-                    break
-                
-                repositories.extend(page_repos)
-                
-                # If we got fewer than per_page results, we're done
-                if len(page_repos) < per_page:
-                    break
-                
-                page += 1
+                if response.status_code == 304:
+                    etag, page_repos = cached_page
+                    unchanged_pages.add(page)
+                    last_page = GitHubService._get_last_page(response) or len(cached_pages)
+                else:
+                    response.raise_for_status()
+                    etag, page_repos = response.headers.get("ETag"), orjson.loads(response.content)
+                    last_page = GitHubService._get_last_page(response)
+                fetched_pages[page] = (etag, page_repos)
+                return page_repos, last_page
+            
+            # Fetch all pages to get all repositories
+            page_lists = await GitHubService._fetch_all_pages(fetch_page, per_page)
+        
+        pages = [fetched_pages[page] for page in range(1, len(page_lists) + 1)]
+        repositories = [repo for page_repos in page_lists for repo in page_repos]
+        
+        stale_data = GitHubService._repo_cache.get_stale(cache_key)
+        if stale_data is not None and len(unchanged_pages) == len(pages) == len(cached_pages):
+            # Nothing changed on GitHub: keep the cached repositories and their details
+            GitHubService._repo_cache.set(cache_key, stale_data, pages)
+            return stale_data
         
         # Only fetch detailed info for the first 10 repositories to speed up response
         # Users can view details for specific repos individually
@@ -666,13 +1251,178 @@ class GitHubService:
         all_repositories = repos_with_details + repos_without_languages
         
         # Cache the result
-        GitHubService._repo_cache.set(cache_key, all_repositories)
+        GitHubService._repo_cache.set(cache_key, all_repositories, pages)
         
         return all_repositories
     
+    USER_REPOSITORIES_QUERY = """
+    query($cursor: String) {
+      viewer {
+        repositories(first: 100, after: $cursor, affiliations: [OWNER, COLLABORATOR, ORGANIZATION_MEMBER],
+                     ownerAffiliations: [OWNER, COLLABORATOR, ORGANIZATION_MEMBER],
+                     orderBy: {field: UPDATED_AT, direction: DESC}) {
+          pageInfo { hasNextPage endCursor }
+          nodes {
+            databaseId name nameWithOwner description url sshUrl
+            isPrivate isFork isArchived isDisabled
+            createdAt updatedAt pushedAt diskUsage
+            stargazerCount forkCount
+            openIssues: issues(states: OPEN) { totalCount }
+            openPullRequests: pullRequests(states: OPEN) { totalCount }
+            owner { login }
+            primaryLanguage { name }
+            languages(first: 20, orderBy: {field: SIZE, direction: DESC}) { edges { size node { name } } }
+            defaultBranchRef { name }
+            repositoryTopics(first: 20) { nodes { topic { name } } }
+            licenseInfo { name }
+            workflows: object(expression: "HEAD:.github/workflows") {
+              ... on Tree { entries { name path type oid object { ... on Blob { byteSize } } } }
+            }
+            polarisYml: object(expression: "HEAD:polaris.yml") { ... on Blob { oid byteSize } }
+            polarisYaml: object(expression: "HEAD:polaris.yaml") { ... on Blob { oid byteSize } }
+          }
+        }
+      }
+    }
+    """
+    
+    @staticmethod
+    def get_graphql_url() -> str:
+        """Get the GraphQL endpoint matching the REST base URL (GitHub Enterprise serves it at /api/graphql)"""
+        base_url = GitHubService.BASE_URL.rstrip("/")
+        if base_url.endswith("/api/v3"):
+            return f"{base_url[:-len('/v3')]}/graphql"
+        return f"{base_url}/graphql"
+    
+    @staticmethod
+    async def get_user_repositories_graphql(token: str) -> List[Dict]:
+        """
+        Get all repositories the authenticated user has access to through the GraphQL API.
+        Unlike the REST listing, every repository comes back with its language breakdown and
+        workflow files in the same response, 100 repositories per request.
+        """
+        cache_key = GitHubService._repo_cache_key(token, "user:repos:graphql")
+        
+        def fetch():
+            return GitHubService._fetch_user_repositories_graphql(token, cache_key)
+        
+        return await GitHubService._get_cached_repositories(cache_key, fetch)
+    
+    @staticmethod
+    async def _fetch_user_repositories_graphql(token: str, cache_key: str) -> List[Dict]:
+        """Page through the viewer's repositories with GraphQL and store them in the cache"""
+        headers = {
+            "Authorization": f"token {token}",
+            "User-Agent": "Backend-App/1.0"
+        }
+        
+        repositories = []
+        cursor = None
+        
+        async with GitHubService.get_http_client() as client:
+            while True:
+                response = await client.post(
+                    GitHubService.get_graphql_url(),
+                    headers=headers,
+                    content=orjson.dumps({
+                        "query": GitHubService.USER_REPOSITORIES_QUERY,
+                        "variables": {"cursor": cursor}
+                    })
+                )
+                response.raise_for_status()
+                result = orjson.loads(response.content)
+                
+                data = result.get("data")
+                if not data:
+                    messages = [error.get("message", "") for error in result.get("errors", [])]
+                    raise ValueError(f"GraphQL query failed: {'; '.join(messages) or 'no data returned'}")
+                
+                page = data["viewer"]["repositories"]
+                # Nodes can be null for repositories the token cannot read (e.g. SAML-protected orgs)
+                repositories.extend(
+                    GitHubService._graphql_repository_to_rest(node) for node in page["nodes"] if node
+                )
+                
+                if not page["pageInfo"]["hasNextPage"]:
+                    break
+                cursor = page["pageInfo"]["endCursor"]
+        
+        GitHubService._repo_cache.set(cache_key, repositories)
+        return repositories
+    
+    @staticmethod
+    def _graphql_repository_to_rest(node: Dict) -> Dict:
+        """Convert a GraphQL repository node to the REST field names used by format_repository"""
+        workflow_files = [
+            {
+                "name": entry["name"],
+                "path": entry["path"],
+                "size": (entry.get("object") or {}).get("byteSize"),
+                "sha": entry["oid"]
+            }
+            for entry in ((node.get("workflows") or {}).get("entries") or [])
+            if entry["type"] == "blob" and entry["name"].endswith((".yml", ".yaml"))
+        ]
+        has_workflows = len(workflow_files) > 0
+        
+        polaris_files = [
+            {"name": name, "path": name, "size": blob.get("byteSize", 0), "sha": blob.get("oid", "")}
+            for name, blob in (("polaris.yml", node.get("polarisYml")), ("polaris.yaml", node.get("polarisYaml")))
+            if blob
+        ]
+        
+        primary_language = node.get("primaryLanguage") or {}
+        default_branch = node.get("defaultBranchRef") or {}
+        
+        return {
+            "id": node.get("databaseId"),
+            "name": node.get("name"),
+            "full_name": node.get("nameWithOwner"),
+            "owner": node.get("owner") or {},
+            "description": node.get("description"),
+            "html_url": node.get("url"),
+            "clone_url": f"{node.get('url')}.git",
+            "ssh_url": node.get("sshUrl"),
+            "language": primary_language.get("name"),
+            "languages_detail": {
+                edge["node"]["name"]: edge["size"]
+                for edge in (node.get("languages") or {}).get("edges", [])
+            },
+            "stargazers_count": node.get("stargazerCount"),
+            "watchers_count": node.get("stargazerCount"),  # REST reports stargazers as watchers
+            "forks_count": node.get("forkCount"),
+            # REST counts open pull requests as issues
+            "open_issues_count": node["openIssues"]["totalCount"] + node["openPullRequests"]["totalCount"],
+            "private": node.get("isPrivate"),
+            "fork": node.get("isFork"),
+            "archived": node.get("isArchived"),
+            "disabled": node.get("isDisabled"),
+            "created_at": node.get("createdAt"),
+            "updated_at": node.get("updatedAt"),
+            "pushed_at": node.get("pushedAt"),
+            "size": node.get("diskUsage"),
+            "default_branch": default_branch.get("name"),
+            "topics": [topic["topic"]["name"] for topic in (node.get("repositoryTopics") or {}).get("nodes", [])],
+            "license": node.get("licenseInfo"),
+            "workflow_info": {
+                "workflow_files": workflow_files + polaris_files,
+                "total_count": len(workflow_files),
+                "has_workflows": has_workflows,
+                "has_polaris_in_root": len(polaris_files) > 0
+            }
+        }
+    
     @staticmethod
     async def get_repository_details(token: str, owner: str, repo_name: str) -> Dict:
         """Get detailed information about a specific repository including custom properties"""
+        return await GitHubService._single_flight(
+            GitHubService._repo_cache_key(token, f"repo-details:{owner}/{repo_name}"),
+            lambda: GitHubService._fetch_repository_details(token, owner, repo_name)
+        )
+    
+    @staticmethod
+    async def _fetch_repository_details(token: str, owner: str, repo_name: str) -> Dict:
+        """Fetch repository details from GitHub"""
         headers = {
             "Authorization": f"token {token}",
             "Accept": "application/vnd.github.v3+json",
@@ -908,6 +1658,59 @@ class GitHubService:
             print(f"Unexpected error getting repository details: {e}")
             raise ValueError(f"Unexpected error: {str(e)}")
     
+    @staticmethod
+    def _hash_token(token: str) -> str:
+        """Hash a token so it can be used as a cache key without keeping the token itself"""
+        return hashlib.sha256(token.encode()).hexdigest()
+    
+    @staticmethod
+    def forget_token_verification(token: Optional[str] = None):
+        """Forget the cached verification of a token, or of all tokens"""
+        if token is None:
+            GitHubService._verified_tokens.clear()
+        else:
+            GitHubService._verified_tokens.pop(GitHubService._hash_token(token), None)
+    
+    @staticmethod
+    async def _forget_token_on_unauthorized(response: httpx.Response):
+        """Response hook: a 401 from GitHub means the token used for the request is no longer valid"""
+        if response.status_code == 401:
+            # GitHub accepts both the "token" and "Bearer" schemes, in any case
+            scheme, _, token = response.request.headers.get("Authorization", "").partition(" ")
+            if scheme.lower() in ("token", "bearer") and token:
+                GitHubService.forget_token_verification(token.strip())
+    
+    @staticmethod
+    async def verify_token_cached(token: str) -> bool:
+        """
+        Verify a token, trusting a successful verification for TOKEN_VERIFICATION_TTL seconds.
+        Concurrent verifications of the same token share one request, and a previously verified
+        token stays valid while GitHub is unreachable or failing (5xx).
+        """
+        token_hash = GitHubService._hash_token(token)
+        expires_at = GitHubService._verified_tokens.get(token_hash)
+        if expires_at is not None and time.monotonic() < expires_at:
+            return True
+        
+        try:
+            await GitHubService._single_flight(
+                f"verify:{token_hash}", lambda: GitHubService.get_user_info(token)
+            )
+            GitHubService._verified_tokens[token_hash] = time.monotonic() + GitHubService.TOKEN_VERIFICATION_TTL
+            return True
+        except httpx.HTTPStatusError as e:
+            print(f"HTTP error verifying token: {e.response.status_code} - {e.response.text}")
+            # Serve a previously verified token while GitHub itself is failing
+            is_valid = expires_at is not None and e.response.status_code >= 500
+        except httpx.RequestError as e:
+            print(f"Network error verifying token: {e}")
+            # Serve a previously verified token on transient network failures
+            is_valid = expires_at is not None
+        
+        if not is_valid:
+            GitHubService._verified_tokens.pop(token_hash, None)
+        return is_valid
+    
     @staticmethod
     async def verify_token(token: str) -> bool:
         """Verify if the GitHub token is valid"""
@@ -945,6 +1748,28 @@ class GitHubService:
             "company": org.get("company")
         }
     
+    @staticmethod
+    def get_repository_languages_casefold(repo: Dict) -> frozenset:
+        """
+        Get the case-folded names of the primary language and of all languages with code in the
+        detailed breakdown. Computed once and kept on the (cached) repository dict.
+        """
+        languages_casefold = repo.get("_languages_casefold")
+        if languages_casefold is None:
+            languages_detail = repo.get("languages_detail")
+            if not isinstance(languages_detail, dict):
+                languages_detail = {}
+            languages = {
+                lang_name.casefold()
+                for lang_name, bytes_count in languages_detail.items()
+                if lang_name and isinstance(bytes_count, int) and bytes_count > 0
+            }
+            primary_language = repo.get("language")
+            if primary_language:
+                languages.add(primary_language.casefold())
+            languages_casefold = repo["_languages_casefold"] = frozenset(languages)
+        return languages_casefold
+    
     @staticmethod
     def format_repository(repo: Dict) -> Dict:
         """Format repository data for API response"""
@@ -1085,6 +1910,183 @@ class GitHubService:
             'content': block_content.strip()
         }
 
+    @staticmethod
+    def _build_matching_workflow_file(workflow_file: Dict, content: str, search_term: str) -> Optional[Dict]:
+        """
+        Build the matching-file entry for a workflow whose content contains the search term.
+        Returns None if the search term does not occur in the content.
+        """
+        search_term_lower = search_term.lower()
+        
+        # Case-insensitive search
+        if search_term_lower not in content.lower():
+            return None
+        
+        # Parse the YAML content to find complete jobs/steps containing the search term
+        lines = content.split('\n')
+        matching_blocks = []
+        
+        # Find all line numbers that contain the search term
+        matching_line_numbers = [
+            i for i, line in enumerate(lines, 1)
+            if search_term_lower in line.lower()
+        ]
+        
+        # For each matching line, find the containing job or step
+        processed_blocks = set()  # Track which blocks we've already processed
+        
+        for line_num in matching_line_numbers:
+            block_info = GitHubService._find_containing_block(lines, line_num - 1)  # Convert to 0-based index
+            
+            if block_info and block_info['block_id'] not in processed_blocks:
+                processed_blocks.add(block_info['block_id'])
+                matching_blocks.append({
+                    "block_type": block_info['block_type'],
+                    "block_name": block_info['block_name'],
+                    "start_line": block_info['start_line'],
+                    "end_line": block_info['end_line'],
+                    "content": block_info['content'],
+                    "matching_line": line_num,
+                    "matching_text": lines[line_num - 1].strip()
+                })
+        
+        return {
+            "name": workflow_file.get("name"),
+            "path": workflow_file.get("path"),
+            "html_url": workflow_file.get("html_url"),
+            "download_url": workflow_file.get("download_url"),
+            "size": workflow_file.get("size"),
+            "matching_blocks": matching_blocks,
+            "matches": matching_blocks,  # Keep for backward compatibility
+            "total_matches": len(matching_blocks)
+        }
+
+    @staticmethod
+    async def _search_workflow_content_via_code_search(token: str, search_term: str, org_name: str, headers: Dict) -> Optional[Dict]:
+        """
+        Find workflow files containing the search term across an organization, using GitHub code
+        search to pick the candidate files instead of downloading every workflow file of every
+        repository. The candidates are filtered with the same case-insensitive substring check as the
+        per-repository scan. Returns None, so the caller falls back to that scan, if code search is
+        unavailable, the term isn't a single word, code search finds nothing (the term may only occur
+        inside longer words, which code search doesn't match), or the hits can't all be read.
+        """
+        # Code search splits file contents into words at punctuation and whitespace; only a single
+        # word can be matched reliably
+        if not (search_term.isascii() and search_term.replace("_", "").isalnum()):
+            return None
+        
+        per_page = 100
+        max_pages = 10  # GitHub Search API returns up to 1000 results (10 pages x 100 per_page)
+        search_query = f'"{search_term}" in:file path:.github/workflows org:{org_name}'
+        
+        async with GitHubService.get_http_client() as client:
+            async def fetch_search_page(page: int):
+                return await client.get(
+                    f"{GitHubService.BASE_URL}/search/code",
+                    headers=headers,
+                    params={"q": search_query, "per_page": per_page, "page": page}
+                )
+            
+            first_response = await fetch_search_page(1)
+            if first_response.status_code != 200:
+                # Code search disabled, query rejected or rate limited - use the per-repository scan
+                print(f"Code search unavailable for org '{org_name}' (HTTP {first_response.status_code}), falling back to per-repository scan")
+                return None
+            
+            first_page = orjson.loads(first_response.content)
+            total_count = first_page.get("total_count", 0)
+            if not total_count:
+                return None
+            if total_count > per_page * max_pages or first_page.get("incomplete_results", False):
+                print(f"Code search results for org '{org_name}' are truncated, falling back to per-repository scan")
+                return None
+            
+            items = list(first_page.get("items", []))
+            last_page = (total_count + per_page - 1) // per_page
+            
+            # Fetch the remaining result pages concurrently
+            if last_page > 1:
+                page_responses = await asyncio.gather(
+                    *[fetch_search_page(page) for page in range(2, last_page + 1)],
+                    return_exceptions=True
+                )
+                for page, page_response in enumerate(page_responses, 2):
+                    if isinstance(page_response, Exception) or page_response.status_code != 200:
+                        failure = page_response if isinstance(page_response, Exception) else f"HTTP {page_response.status_code}"
+                        print(f"Code search result page {page} failed for org '{org_name}' ({failure}), falling back to per-repository scan")
+                        return None
+                    items.extend(orjson.loads(page_response.content).get("items", []))
+            
+            # Keep only YAML files directly under .github/workflows, once per repository and path
+            repositories: Dict[str, Dict] = {}
+            hit_items: Dict[tuple, Dict] = {}
+            for item in items:
+                path = item.get("path", "")
+                if not path.startswith(".github/workflows/") or "/" in path[len(".github/workflows/"):]:
+                    continue
+                if not path.endswith((".yml", ".yaml")):
+                    continue
+                repo = item.get("repository") or {}
+                full_name = repo.get("full_name")
+                if not full_name:
+                    continue
+                repositories.setdefault(full_name, repo)
+                hit_items[(full_name, path)] = item
+            
+            # Download all candidate files together; their content decides whether they match
+            semaphore = asyncio.Semaphore(3)  # Conservative limit for content downloading
+            
+            async def fetch_hit_content(item: Dict) -> Optional[Dict]:
+                async with semaphore:
+                    response = await client.get(item["url"], headers=headers)
+                    response.raise_for_status()
+                    file_data = orjson.loads(response.content)
+                    content = base64.b64decode(file_data.get("content", "")).decode("utf-8", errors="replace")
+                    workflow_file = {
+                        "name": file_data.get("name", item.get("name")),
+                        "path": file_data.get("path", item.get("path")),
+                        "html_url": file_data.get("html_url", item.get("html_url")),
+                        "download_url": file_data.get("download_url"),
+                        "size": file_data.get("size")
+                    }
+                    return GitHubService._build_matching_workflow_file(workflow_file, content, search_term)
+            
+            try:
+                hit_results = await asyncio.gather(*[fetch_hit_content(item) for item in hit_items.values()])
+            except Exception as e:
+                print(f"Error fetching code search hits for org '{org_name}' ({e}), falling back to per-repository scan")
+                return None
+        
+        matching_files_by_repo: Dict[str, List[Dict]] = {}
+        for (full_name, _), matching_file in zip(hit_items, hit_results):
+            if matching_file:
+                matching_files_by_repo.setdefault(full_name, []).append(matching_file)
+        
+        matching_repositories = [
+            {
+                **GitHubService.format_repository(repositories[full_name]),
+                "matching_workflow_files": matching_files,
+                "total_matching_files": len(matching_files),
+                "total_matches": sum(f["total_matches"] for f in matching_files)
+            }
+            for full_name, matching_files in matching_files_by_repo.items()
+        ]
+        
+        return {
+            "matching_repositories": matching_repositories,
+            "search_statistics": {
+                # Code search covers the whole organization without reporting how many repositories
+                # or workflow files it looked at
+                "total_repositories_searched": None,
+                "repositories_with_workflows": None,
+                "matching_repositories": len(matching_repositories),
+                "total_workflow_files_searched": len(hit_items),
+                "matching_workflow_files": sum(len(files) for files in matching_files_by_repo.values()),
+                "search_method": "code_search"
+            }
+        }
+
     @staticmethod
     async def search_repositories_by_workflow_content(token: str, search_term: str, scope: str = 'user', org_name: str = None) -> Dict:
         """Search repositories by content within their workflow files"""
@@ -1095,6 +2097,20 @@ class GitHubService:
         }
         
         try:
+            # Organization scope: let GitHub code search find the matching files in one query
+            if scope == 'organization' and org_name:
+                code_search_results = await GitHubService._search_workflow_content_via_code_search(
+                    token, search_term, org_name, headers
+                )
+                if code_search_results is not None:
+                    return {
+                        "search_term": search_term,
+                        "scope": scope,
+                        "organization": org_name,
+                        **code_search_results,
+                        "success": True
+                    }
+            
             # Get repositories based on scope
             if scope == 'user':
                 repositories = await GitHubService.get_user_repositories(token)
@@ -1160,49 +2176,11 @@ class GitHubService:
                                     )
                                     
                                     if content_response.status_code == 200:
-                                        content = content_response.text
-                                        
-                                        # Case-insensitive search
-                                        if search_term.lower() in content.lower():
-                                            # Parse the YAML content to find complete jobs/steps containing the search term
-                                            lines = content.split('\n')
-                                            matching_blocks = []
-                                            
-                                            # Find all line numbers that contain the search term
-                                            matching_line_numbers = []
-                                            for i, line in enumerate(lines, 1):
-                                                if search_term.lower() in line.lower():
-                                                    matching_line_numbers.append(i)
-                                            
-                                            # For each matching line, find the containing job or step
-                                            processed_blocks = set()  # Track which blocks we've already processed
-                                            
-                                            for line_num in matching_line_numbers:
-                                                block_info = GitHubService._find_containing_block(lines, line_num - 1)  # Convert to 0-based index
-                                                
-                                                if block_info and block_info['block_id'] not in processed_blocks:
-                                                    processed_blocks.add(block_info['block_id'])
-                                                    matching_blocks.append({
-                                                        "block_type": block_info['block_type'],
-                                                        "block_name": block_info['block_name'],
-                                                        "start_line": block_info['start_line'],
-                                                        "end_line": block_info['end_line'],
-                                                        "content": block_info['content'],
-                                                        "matching_line": line_num,
-                                                        "matching_text": lines[line_num - 1].strip()
-                                                    })
-                                            
-                                            matching_files.append({
-                                                "name": workflow_file.get("name"),
-                                                "path": workflow_file.get("path"),
-                                                "html_url": workflow_file.get("html_url"),
-                                                "download_url": workflow_file.get("download_url"),
-                                                "size": workflow_file.get("size"),
-                                                "matching_blocks": matching_blocks,
-                                                "matches": matching_blocks,  # Keep for backward compatibility
-                                                "total_matches": len(matching_blocks)
-                                            })
-                                            
+                                        matching_file = GitHubService._build_matching_workflow_file(
+                                            workflow_file, content_response.text, search_term
+                                        )
+                                        if matching_file:
+                                            matching_files.append(matching_file)
                                             search_stats["matching_workflow_files"] += 1
                                 
                                 except Exception as e:
@@ -1282,7 +2260,7 @@ class GitHubService:
                 )
                 
                 if response.status_code == 200:
-                    workflows_data = response.json()
+                    workflows_data = orjson.loads(response.content)
                     workflow_files = []
                     
                     for item in workflows_data:
@@ -1317,43 +2295,28 @@ class GitHubService:
             "User-Agent": "Backend-App/1.0"
         }
         
-        branches = []
-        page = 1
         per_page = 100
         
         async with GitHubService.get_http_client() as client:
+            async def fetch_page(page: int) -> tuple:
+                response = await client.get(
+                    f"{GitHubService.BASE_URL}/repos/{owner}/{repo}/branches",
+                    headers=headers,
+                    params={"page": page, "per_page": per_page}
+                )
+                if response.status_code == 404:
+                    # Repository not found or no branches
+                    return [], None
+                response.raise_for_status()
+                return orjson.loads(response.content), GitHubService._get_last_page(response)
+            
             try:
-                while True:
-                    response = await client.get(
-                        f"{GitHubService.BASE_URL}/repos/{owner}/{repo}/branches",
-                        headers=headers,
-                        params={"page": page, "per_page": per_page}
-                    )
-                    
-                    if response.status_code == 200:
-                        branches_page = response.json()
-                        if not branches_page:
-                            break
-                        
-                        branches.extend([{
-                            'name': branch['name'],
-                            'commit_sha': branch['commit']['sha'],
-                            'protected': branch.get('protected', False)
-                        } for branch in branches_page])
-                        
-                        # If we got fewer than per_page results, we're done
-                        if len(branches_page) < per_page:
-                            break
-                        
-                        page += 1
-                    elif response.status_code == 404:
-                        # Repository not found or no branches
-                        return []
-                    else:
-                        response.raise_for_status()
-                        return []
-                        
-                return branches
+                pages = await GitHubService._fetch_all_pages(fetch_page, per_page)
+                return [{
+                    'name': branch['name'],
+                    'commit_sha': branch['commit']['sha'],
+                    'protected': branch.get('protected', False)
+                } for branches_page in pages for branch in branches_page]
             except Exception as e:
                 print(f"Error fetching branches for {owner}/{repo}: {e}")
                 return []
@@ -1377,7 +2340,7 @@ class GitHubService:
                 )
                 
                 if response.status_code == 200:
-                    workflows_data = response.json()
+                    workflows_data = orjson.loads(response.content)
                     workflow_files = []
                     
                     for item in workflows_data:
@@ -1405,22 +2368,78 @@ class GitHubService:
                 return []
     
     @staticmethod
-    async def get_file_content(token: str, owner: str, repo: str, file_path: str) -> str:
-        """Get the content of a file from a repository"""
+    def _get_cached_blob(sha: Optional[str]) -> Optional[str]:
+        """Get cached file contents by blob sha, marking them as recently used"""
+        content = GitHubService._blob_cache.get(sha) if sha else None
+        if content is not None:
+            GitHubService._blob_cache.move_to_end(sha)
+        return content
+    
+    @staticmethod
+    def _cache_blob(sha: str, content: str):
+        """Cache file contents by blob sha, evicting the least recently used beyond the size limits"""
+        previous = GitHubService._blob_cache.pop(sha, None)
+        if previous is not None:
+            GitHubService._blob_cache_chars -= len(previous)
+        GitHubService._blob_cache[sha] = content
+        GitHubService._blob_cache_chars += len(content)
+        while (len(GitHubService._blob_cache) > GitHubService.BLOB_CACHE_SIZE
+               or GitHubService._blob_cache_chars > GitHubService.BLOB_CACHE_MAX_CHARS):
+            _, evicted = GitHubService._blob_cache.popitem(last=False)
+            GitHubService._blob_cache_chars -= len(evicted)
+    
+    @staticmethod
+    async def get_file_content(token: str, owner: str, repo: str, file_path: str,
+                               ref: Optional[str] = None, sha: Optional[str] = None) -> str:
+        """
+        Get the content of a file from a repository.
+        If the blob sha is known it is fetched directly from the Git blobs API, otherwise the
+        file sha is resolved from the contents API (optionally at the given ref). Content is
+        cached by blob sha, which is immutable, so entries never expire; the least recently
+        used are evicted once the cache is full.
+        """
+        cached_content = GitHubService._get_cached_blob(sha)
+        if cached_content is not None:
+            return cached_content
+        
         headers = {
             "Authorization": f"token {token}",
-            "Accept": "application/vnd.github.v3.raw",
+            "Accept": "application/vnd.github.v3+json",
             "User-Agent": "Backend-App/1.0"
         }
         
         async with GitHubService.get_http_client() as client:
             try:
+                if not sha:
+                    # Resolve the blob sha of the file at the requested ref
+                    params = {"ref": ref} if ref else None
+                    response = await client.get(
+                        f"{GitHubService.BASE_URL}/repos/{owner}/{repo}/contents/{file_path}",
+                        headers=headers,
+                        params=params
+                    )
+                    response.raise_for_status()
+                    file_data = response.json()
+                    sha = file_data.get("sha")
+                    
+                    cached_content = GitHubService._get_cached_blob(sha)
+                    if cached_content is not None:
+                        return cached_content
+                    
+                    # Files up to 1MB are returned inline, no need for a second request
+                    if file_data.get("encoding") == "base64" and file_data.get("content"):
+                        content = base64.b64decode(file_data["content"]).decode("utf-8", errors="replace")
+                        GitHubService._cache_blob(sha, content)
+                        return content
+                
                 response = await client.get(
-                    f"{GitHubService.BASE_URL}/repos/{owner}/{repo}/contents/{file_path}",
-                    headers=headers
+                    f"{GitHubService.BASE_URL}/repos/{owner}/{repo}/git/blobs/{sha}",
+                    headers={**headers, "Accept": "application/vnd.github.raw"}
                 )
                 response.raise_for_status()
-                return response.text
+                content = response.text
+                GitHubService._cache_blob(sha, content)
+                return content
             except Exception as e:
                 print(f"Error fetching file content for {owner}/{repo}/{file_path}: {e}")
                 return ""
@@ -1454,7 +2473,7 @@ class GitHubService:
                             )
                             
                             if response.status_code == 200:
-                                data = response.json()
+                                data = orjson.loads(response.content)
                                 items = data.get('items', [])
                                 for item in items:
                                     # Check if keyword is in the file name (not just path)
@@ -1517,6 +2536,14 @@ class GitHubService:
         Returns a dict with keys: tree: List[entries], truncated: bool, sha: str, url: str
         Each entry has: path, mode, type ('blob' for files), sha, size (optional), url
         """
+        return await GitHubService._single_flight(
+            GitHubService._repo_cache_key(token, f"tree:{owner}/{repo}:{branch or ''}"),
+            lambda: GitHubService._fetch_repository_tree(token, owner, repo, branch)
+        )
+    
+    @staticmethod
+    async def _fetch_repository_tree(token: str, owner: str, repo: str, branch: Optional[str] = None) -> Dict:
+        """Fetch the recursive repository tree from GitHub"""
         headers = {
             "Authorization": f"token {token}",
             "Accept": "application/vnd.github.v3+json",
@@ -1533,7 +2560,7 @@ class GitHubService:
                     )
                     if repo_resp.status_code != 200:
                         return {"tree": [], "truncated": False}
-                    repo_data = repo_resp.json()
+                    repo_data = orjson.loads(repo_resp.content)
                     use_branch = repo_data.get("default_branch", "main")
 
                 # Fetch tree recursively
@@ -1544,7 +2571,7 @@ class GitHubService:
                 )
                 if tree_resp.status_code != 200:
                     return {"tree": [], "truncated": False, "branch": use_branch}
-                tree_data = tree_resp.json()
+                tree_data = orjson.loads(tree_resp.content)
                 # Add the branch information to the response
                 tree_data["branch"] = use_branch
                 return tree_data
@@ -1595,8 +2622,7 @@ class GitHubService:
                 raise Exception(f"Failed to create branch: {create_ref_response.text}")
             
             # Check if coverity.yaml already exists in the repository
-            import base64
-            content_encoded = base64.b64encode(coverity_yaml_content.encode()).decode()
+            content_encoded = base64.b64encode(coverity_yaml_content.encode('utf-8')).decode('ascii')
             
             # Try to get existing file to check if it exists and get its SHA
             existing_file_sha = None
@@ -1677,6 +2703,56 @@ The conversion includes:
             pr_data = create_pr_response.json()
             return pr_data["html_url"]
 
+    @staticmethod
+    def _build_enriched_workflow(workflow_file: Dict, analysis, template_matches) -> Dict:
+        """Build the workflow file entry enriched with its analysis and top template matches"""
+        return {
+            **workflow_file,
+            "analysis": {
+                "technologies": [
+                    {
+                        "name": tech.name,
+                        "type": tech.type.value,
+                        "confidence": tech.confidence,
+                        "evidence": tech.evidence[:2]  # Limit evidence
+                    } for tech in analysis.technologies
+                ],
+                "patterns": [
+                    {
+                        "type": pattern.pattern_type,
+                        "description": pattern.description,
+                        "confidence": pattern.confidence
+                    } for pattern in analysis.patterns[:3]  # Limit patterns
+                ],
+                "scores": {
+                    "complexity": round(analysis.complexity_score, 2),
+                    "security": round(analysis.security_score, 2),
+                    "modernization": round(analysis.modernization_score, 2)
+                },
+                "recommendations": analysis.recommendations[:3]  # Limit recommendations
+            },
+            "template_matches": [
+                {
+                    "template_id": match.template_id,
+                    "template_name": match.template_name,
+                    "similarity_score": round(match.similarity_score, 2),
+                    "matching_features": match.matching_features[:3],
+                    "missing_features": match.missing_features[:3],
+                    "improvement_potential": match.improvement_potential
+                } for match in template_matches[:3]  # Top 3 matches
+            ]
+        }
+    
+    @staticmethod
+    def _analyze_and_enrich_workflow(analyzer: LocalWorkflowAnalyzer, workflow_file: Dict, workflow_content: str, available_templates: List[Dict]) -> Dict:
+        """Analyze one workflow, match it against the templates and build its enriched entry (CPU-bound, run off the event loop)"""
+        analysis = analyzer.analyze_workflow_sync(
+            workflow_content,
+            workflow_file.get("name", "workflow.yml")
+        )
+        template_matches = analyzer.find_template_matches_sync(analysis, available_templates)
+        return GitHubService._build_enriched_workflow(workflow_file, analysis, template_matches)
+    
     @staticmethod
     async def analyze_workflows_and_recommend_templates(token: str, search_results: Dict, available_templates: List[Dict]) -> Dict:
         """Analyze workflow search results and recommend templates using local MCP server"""
@@ -1703,56 +2779,12 @@ The conversion includes:
                             if content_response.status_code == 200:
                                 workflow_content = content_response.text
                                 
-                                # Analyze the workflow
-                                analysis = await analyzer.analyze_workflow(
-                                    workflow_content, 
-                                    workflow_file.get("name", "workflow.yml")
-                                )
-                                
-                                # Find template matches
-                                template_matches = await analyzer.find_template_matches(
-                                    analysis, 
-                                    available_templates
+                                # Analyze, match templates and build the enriched entry off the event loop
+                                enriched_workflow = await asyncio.to_thread(
+                                    GitHubService._analyze_and_enrich_workflow,
+                                    analyzer, workflow_file, workflow_content, available_templates
                                 )
                                 
-                                # Create enriched workflow file data
-                                enriched_workflow = {
-                                    **workflow_file,
-                                    "analysis": {
-                                        "technologies": [
-                                            {
-                                                "name": tech.name,
-                                                "type": tech.type.value,
-                                                "confidence": tech.confidence,
-                                                "evidence": tech.evidence[:2]  # Limit evidence
-                                            } for tech in analysis.technologies
-                                        ],
-                                        "patterns": [
-                                            {
-                                                "type": pattern.pattern_type,
-                                                "description": pattern.description,
-                                                "confidence": pattern.confidence
-                                            } for pattern in analysis.patterns[:3]  # Limit patterns
-                                        ],
-                                        "scores": {
-                                            "complexity": round(analysis.complexity_score, 2),
-                                            "security": round(analysis.security_score, 2),
-                                            "modernization": round(analysis.modernization_score, 2)
-                                        },
-                                        "recommendations": analysis.recommendations[:3]  # Limit recommendations
-                                    },
-                                    "template_matches": [
-                                        {
-                                            "template_id": match.template_id,
-                                            "template_name": match.template_name,
-                                            "similarity_score": round(match.similarity_score, 2),
-                                            "matching_features": match.matching_features[:3],
-                                            "missing_features": match.missing_features[:3],
-                                            "improvement_potential": match.improvement_potential
-                                        } for match in template_matches[:3]  # Top 3 matches
-                                    ]
-                                }
-                                
                                 repo_recommendations.append(enriched_workflow)
                         
                         except Exception as e:
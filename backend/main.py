@@ -1,11 +1,27 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, field_serializer
-from typing import List, Optional
-from datetime import datetime
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel, ConfigDict, model_validator
+from typing import List, Literal, Optional
+from datetime import datetime, timedelta
+from collections import Counter
+from functools import lru_cache
+from itertools import count
 import uvicorn
-import httpx
+import asyncio
+import base64
+import hashlib
+import heapq
+import logging
+import orjson
 import os
+import queue
+import re
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
 from sqlalchemy.orm import Session
 
 # Import our modules
@@ -14,32 +30,99 @@ from secrets_crud import SecretCRUD
 from secrets_models import SecretCreate, SecretUpdate, SecretResponse, SecretWithValue, SecretsList
 from github_service import GitHubService
 from templates_crud import TemplateCRUD
-from templates_models import Template
-from polaris_converter import convert_polaris_to_coverity
-from optimized_search import optimized_search
-from workflow_analyzer import LocalWorkflowAnalyzer
-from workflow_parser import WorkflowParser
-from assessment_logic import determine_assessment_types
-from workflow_enhancement_helpers import (
-    fetch_repo_file_tree,
-    generate_enhancement_recommendations,
-    generate_new_workflow_recommendations
-)
-from crypto import decrypt_secret
-from workflow_duplicate_detector import DuplicateDetector
-from ai_analysis_parallel import analyze_repositories_parallel
+from templates_models import Template, normalize_keywords
+# Analysis, parsing and conversion modules are imported lazily inside the endpoints that use them
 
 # Application version
 APP_VERSION = "1.0.0"
 
+# Characters not allowed in workflow file names generated from template names
+WORKFLOW_FILENAME_INVALID_CHARS = re.compile(r'[^a-zA-Z0-9-]')
+
+@lru_cache(maxsize=512)
+def template_workflow_names(template_name: str) -> tuple:
+    """Workflow file name and pull request branch name for applying a template"""
+    base_name = WORKFLOW_FILENAME_INVALID_CHARS.sub('-', template_name.lower())
+    return f"{base_name}.yml", f"add-{base_name}"
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    Queue log records unformatted, so messages and tracebacks are formatted by the listener
+    thread instead of on the event loop (QueueHandler.prepare() would format them here).
+    """
+    def prepare(self, record):
+        return record
+
+# Errors are logged through a queue and written to stderr by a background thread
+logger = logging.getLogger(__name__)
+_log_queue = queue.SimpleQueue()
+_log_stream_handler = logging.StreamHandler(sys.stderr)
+_log_stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+log_listener = QueueListener(_log_queue, _log_stream_handler)
+logger.addHandler(DeferredQueueHandler(_log_queue))
+logger.propagate = False
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson, which is considerably faster on large payloads"""
+    
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+def etag_response(request: Request, content, cache_control: str = "private, max-age=30") -> Response:
+    """
+    Build a JSON response with a weak ETag over its body, answering 304 Not Modified when the
+    client already has that body. Content may be a JSON-serializable object or raw JSON bytes.
+    """
+    body = content if isinstance(content, bytes) else orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    etag = f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 app = FastAPI(
     title="Backend API with Secrets Management",
     description="A FastAPI backend with encrypted secrets storage",
-    version=APP_VERSION
+    version=APP_VERSION,
+    default_response_class=ORJSONResponse
 )
 
-# Create database tables on startup
-create_tables()
+# Category rules applied to a template's tools (set) and use cases (joined text), in output order
+TEMPLATE_CATEGORY_RULES = (
+    # Tool-specific categories
+    ('polaris', lambda tools, use_cases: 'Polaris' in tools),
+    ('coverity', lambda tools, use_cases: 'Coverity' in tools),
+    ('blackduck_sca', lambda tools, use_cases: 'Black Duck SCA' in tools or 'SCA' in use_cases),
+    ('srm', lambda tools, use_cases: 'SRM' in tools),
+    # Scanning type categories
+    ('SAST', lambda tools, use_cases: 'SAST' in use_cases),
+    ('SCA', lambda tools, use_cases: 'SCA' in use_cases or 'Dependency' in use_cases),
+)
+
+def infer_template_category(tools: list, use_cases: list) -> str:
+    """Determine a template's comma-separated category from its tools and use cases"""
+    tools_set = set(tools)
+    # Newline-joined so substring checks can't match across two use cases
+    use_cases_text = '\n'.join(use_cases)
+    category_parts = [
+        category for category, matches in TEMPLATE_CATEGORY_RULES
+        if matches(tools_set, use_cases_text)
+    ]
+    return ','.join(category_parts) if category_parts else 'security'
+
+def scan_template_files(directory, prefix: str = "") -> dict:
+    """Map template file paths relative to the directory (using '/' separators) to their full paths"""
+    files = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            relative_path = f"{prefix}{entry.name}"
+            if entry.is_dir():
+                files.update(scan_template_files(entry.path, f"{relative_path}/"))
+            elif entry.is_file():
+                files[relative_path] = entry.path
+    return files
 
 def initialize_templates_from_files(db: Session):
     """Initialize database templates from template files if database is empty"""
@@ -47,49 +130,51 @@ def initialize_templates_from_files(db: Session):
     from pathlib import Path
     
     # Check if templates already exist
-    existing_templates = TemplateCRUD.get_all_templates(db)
-    if existing_templates:
+    existing_count = TemplateCRUD.count_templates(db)
+    if existing_count:
         # Check if any template has invalid meta_data (JSON string instead of dict)
-        needs_refresh = any(
-            isinstance(t.meta_data, str) for t in existing_templates
-        )
-        if needs_refresh:
+        if TemplateCRUD.has_invalid_meta_data(db):
             print(f"⚠ Detected invalid template data, clearing and re-initializing...")
-            # Delete all existing templates
-            for template in existing_templates:
-                db.delete(template)
-            db.commit()
+            # Delete all existing templates (committed together with the re-inserted templates)
+            TemplateCRUD.delete_all_templates(db, commit=False)
         else:
-            print(f"✓ Templates already initialized ({len(existing_templates)} templates found)")
+            print(f"✓ Templates already initialized ({existing_count} templates found)")
             return
     
     # Load templates from templates/blackduck directory
     templates_dir = Path(__file__).parent / "templates" / "blackduck"
     templates_json_path = templates_dir / "templates.json"
     
-    if not templates_json_path.exists():
+    try:
+        templates_config = json.loads(templates_json_path.read_bytes())
+    except FileNotFoundError:
         print(f"Warning: Template configuration file not found at {templates_json_path}")
         return
     
     try:
-        with open(templates_json_path, 'r') as f:
-            templates_config = json.load(f)
+        # Index all template files with one directory scan instead of a stat per template
+        template_files = scan_template_files(templates_dir)
         
         templates_data = templates_config.get('templates', [])
-        loaded_count = 0
+        rows = []
+        seen_names = set()
         
         for template_info in templates_data:
             template_file = template_info.get('file')
-            if not template_file:
+            template_name = template_info.get('name')
+            if not template_file or not template_name:
+                continue
+            if template_name in seen_names:
+                print(f"Warning: Duplicate template name '{template_name}' in configuration, skipping")
                 continue
             
-            template_file_path = templates_dir / template_file
-            if not template_file_path.exists():
-                print(f"Warning: Template file not found: {template_file_path}")
+            template_file_path = template_files.get(template_file)
+            if template_file_path is None:
+                print(f"Warning: Template file not found: {templates_dir / template_file}")
                 continue
             
             # Read template content
-            with open(template_file_path, 'r') as f:
+            with open(template_file_path, 'r', encoding='utf-8') as f:
                 template_content = f.read()
             
             # Prepare meta_data
@@ -105,153 +190,175 @@ def initialize_templates_from_files(db: Session):
             tools = template_info.get('tools', [])
             use_cases = template_info.get('use_cases', [])
             
-            # Determine category from tools and use_cases
-            category_parts = []
+            category = infer_template_category(tools, use_cases)
             
-            # Add tool-specific categories
-            if 'Polaris' in tools:
-                category_parts.append('polaris')
-            if 'Coverity' in tools:
-                category_parts.append('coverity')
-            if 'Black Duck SCA' in tools or any('SCA' in uc for uc in use_cases):
-                category_parts.append('blackduck_sca')
-            if 'SRM' in tools:
-                category_parts.append('srm')
-            
-            # Add scanning type categories
-            if any('SAST' in uc for uc in use_cases):
-                category_parts.append('SAST')
-            if any('SCA' in uc or 'Dependency' in uc for uc in use_cases):
-                category_parts.append('SCA')
-            
-            category = ','.join(category_parts) if category_parts else 'security'
-            
-            # Create template
-            try:
-                TemplateCRUD.create_template(
-                    db,
-                    name=template_info['name'],
-                    content=template_content,
-                    description=template_info.get('description'),
-                    keywords=','.join(template_info.get('tools', [])),
-                    template_type=template_type,
-                    category=category,
-                    meta_data=meta_data
-                )
-                loaded_count += 1
-            except Exception as e:
-                print(f"Warning: Could not create template '{template_info['name']}': {e}")
+            seen_names.add(template_name)
+            rows.append({
+                'name': template_name,
+                'content': template_content,
+                'description': template_info.get('description'),
+                'keywords': ','.join(template_info.get('tools', [])),
+                'template_type': template_type,
+                'category': category,
+                'meta_data': meta_data
+            })
+        
+        # Insert all templates with a single batched statement and commit once
+        loaded_count = TemplateCRUD.create_templates_bulk(db, rows, commit=False)
+        db.commit()
+        TemplateCRUD.bump_version()
         
         print(f"✓ Initialized {loaded_count} templates from template files")
         
     except Exception as e:
+        # Roll back so a failed re-initialization keeps the existing templates
+        db.rollback()
         print(f"Warning: Could not initialize templates from files: {e}")
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize required secrets and templates on startup if they don't exist"""
-    from database import SecretsSessionLocal, TemplatesSessionLocal
-    secrets_db = SecretsSessionLocal()
-    templates_db = TemplatesSessionLocal()
+def initialize_required_secrets(db: Session):
+    """Create required secrets if they don't exist and log the GitHub API configuration"""
+    # Check and create GITHUB_TOKEN if missing
+    github_token = SecretCRUD.get_secret_by_name(db, "GITHUB_TOKEN")
+    if not github_token:
+        SecretCRUD.create_secret(
+            db,
+            name="GITHUB_TOKEN",
+            value="",  # Empty value - user must fill this
+            description=""
+        )
+        print("✓ Created GITHUB_TOKEN secret (empty - requires configuration)")
+    
+    # Log GitHub API URL configuration (from environment variable)
+    github_api_url = os.getenv('GITHUB_API_URL', 'https://api.github.com')
+    print(f"✓ Using GitHub API URL: {github_api_url}")
+    if github_api_url == 'https://api.github.com':
+        print("  (Default GitHub.com - set GITHUB_API_URL environment variable for GitHub Enterprise Server)")
+    else:
+        print("  (From GITHUB_API_URL environment variable)")
+
+def run_startup_initializer(session_factory, initializer):
+    """Run an initializer with its own database session (called in a worker thread)"""
+    db = session_factory()
     try:
-        # Check and create GITHUB_TOKEN if missing
-        github_token = SecretCRUD.get_secret_by_name(secrets_db, "GITHUB_TOKEN")
-        if not github_token:
-            SecretCRUD.create_secret(
-                secrets_db,
-                name="GITHUB_TOKEN",
-                value="",  # Empty value - user must fill this
-                description=""
-            )
-            print("✓ Created GITHUB_TOKEN secret (empty - requires configuration)")
-        
-        # Log GitHub API URL configuration (from environment variable)
-        github_api_url = os.getenv('GITHUB_API_URL', 'https://api.github.com')
-        print(f"✓ Using GitHub API URL: {github_api_url}")
-        if github_api_url == 'https://api.github.com':
-            print("  (Default GitHub.com - set GITHUB_API_URL environment variable for GitHub Enterprise Server)")
-        else:
-            print("  (From GITHUB_API_URL environment variable)")
-        
-        # Initialize templates from files if database is empty
-        initialize_templates_from_files(templates_db)
-        
+        initializer(db)
     except Exception as e:
-        print(f"Warning: Could not initialize required secrets and templates: {e}")
+        print(f"Warning: Could not run {initializer.__name__}: {e}")
     finally:
-        secrets_db.close()
-        templates_db.close()
+        db.close()
+
+@app.on_event("startup")
+async def startup_event():
+    """Create database tables and initialize required secrets and templates if they don't exist"""
+    from database import SecretsSessionLocal, TemplatesSessionLocal
+    loop = asyncio.get_running_loop()
+    log_listener.start()
+    
+    # Tables must exist before they can be populated
+    await loop.run_in_executor(None, create_tables)
+    
+    # Secrets and templates live in separate databases, initialize them concurrently (and set up
+    # the pooled GitHub client meanwhile)
+    await asyncio.gather(
+        loop.run_in_executor(None, run_startup_initializer, SecretsSessionLocal, initialize_required_secrets),
+        loop.run_in_executor(None, run_startup_initializer, TemplatesSessionLocal, initialize_templates_from_files),
+        GitHubService.open_http_client()
+    )
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Close pooled GitHub API and shared cache connections on shutdown"""
+    await GitHubService.close_http_client()
+    await GitHubService.close_shared_cache()
+    log_listener.stop()
+
+# Compress larger responses (repository lists, trees, analysis results)
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000", "http://localhost:3001"],  # React dev server
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    allow_headers=["Content-Type", "Authorization"],
+    max_age=86400,  # Let browsers cache preflight responses for a day
 )
 
 # Pydantic models
 class Item(BaseModel):
+    model_config = ConfigDict(extra="ignore", validate_assignment=False)
+    
     id: Optional[int] = None
     name: str
     description: Optional[str] = None
 
 class ItemCreate(BaseModel):
+    model_config = ConfigDict(extra="ignore", validate_assignment=False)
+    
     name: str
     description: Optional[str] = None
 
-# In-memory storage (replace with database in production)
-items_db = []
-next_id = 1
+# In-memory storage keyed by item id (replace with database in production)
+items_db = {}
+item_ids = count(1)  # Atomic id generator, replaces a global counter
+items_lock = asyncio.Lock()  # Serializes writes to items_db
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    from database import secrets_engine, templates_engine
+    return {
+        "status": "healthy",
+        "database_pools": {
+            "secrets": secrets_engine.pool.status(),
+            "templates": templates_engine.pool.status()
+        },
+        "github_requests": dict(GitHubService.request_stats)
+    }
 
 @app.post("/api/cache/clear")
 async def clear_cache():
     """Clear the repository cache"""
-    GitHubService._repo_cache.clear()
+    await GitHubService.clear_repository_cache()
     return {"status": "success", "message": "Repository cache cleared"}
 
 @app.get("/api/items", response_model=List[Item])
 async def get_items():
-    return items_db
+    return list(items_db.values())
 
 @app.get("/api/items/{item_id}", response_model=Item)
 async def get_item(item_id: int):
-    item = next((item for item in items_db if item["id"] == item_id), None)
+    item = items_db.get(item_id)
     if item is None:
         raise HTTPException(status_code=404, detail="Item not found")
     return item
 
 @app.post("/api/items", response_model=Item)
 async def create_item(item: ItemCreate):
-    global next_id
-    new_item = {
-        "id": next_id,
-        "name": item.name,
-        "description": item.description
-    }
-    items_db.append(new_item)
-    next_id += 1
+    async with items_lock:
+        item_id = next(item_ids)
+        new_item = {
+            "id": item_id,
+            "name": item.name,
+            "description": item.description
+        }
+        items_db[item_id] = new_item
     return new_item
 
 @app.put("/api/items/{item_id}", response_model=Item)
 async def update_item(item_id: int, item: ItemCreate):
-    existing_item = next((item for item in items_db if item["id"] == item_id), None)
-    if existing_item is None:
-        raise HTTPException(status_code=404, detail="Item not found")
-    
-    existing_item["name"] = item.name
-    existing_item["description"] = item.description
+    async with items_lock:
+        existing_item = items_db.get(item_id)
+        if existing_item is None:
+            raise HTTPException(status_code=404, detail="Item not found")
+        
+        existing_item["name"] = item.name
+        existing_item["description"] = item.description
     return existing_item
 
 @app.delete("/api/items/{item_id}")
 async def delete_item(item_id: int):
-    global items_db
-    items_db = [item for item in items_db if item["id"] != item_id]
+    async with items_lock:
+        items_db.pop(item_id, None)
     return {"message": "Item deleted successfully"}
 
 # ========== VERSION ENDPOINT ==========
@@ -297,7 +404,7 @@ async def get_secret_decrypted(secret_id: int, db: Session = Depends(get_db)):
             raise HTTPException(status_code=404, detail="Secret not found")
         
         # Decrypt the value
-        decrypted_value = SecretCRUD.decrypt_secret_value(secret)
+        decrypted_value = await run_in_threadpool(SecretCRUD.decrypt_secret_value, secret)
         
         # Create response with decrypted value
         return SecretWithValue(
@@ -323,6 +430,7 @@ async def create_secret(secret: SecretCreate, db: Session = Depends(get_db)):
             value=secret.value, 
             description=secret.description
         )
+        clear_github_token_cache()
         return new_secret
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -342,26 +450,29 @@ async def update_secret(secret_id: int, secret: SecretUpdate, db: Session = Depe
         )
         if not updated_secret:
             raise HTTPException(status_code=404, detail="Secret not found")
+        clear_github_token_cache()
         return updated_secret
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error updating secret: {str(e)}")
 
+# Secrets the application depends on and that must not be deleted
+PROTECTED_SECRET_NAMES = frozenset({"GITHUB_TOKEN", "GITHUB_API_URL"})
+
 @app.delete("/api/secrets/{secret_id}")
 async def delete_secret(secret_id: int, db: Session = Depends(get_db)):
     """Delete a secret"""
     try:
-        # Check if this is a protected secret
-        secret = SecretCRUD.get_secret_by_id(db, secret_id)
-        if secret and secret.name in ["GITHUB_TOKEN", "GITHUB_API_URL"]:
-            raise HTTPException(
-                status_code=403, 
-                detail=f"Cannot delete required secret: {secret.name}"
-            )
-        
-        success = SecretCRUD.delete_secret(db, secret_id)
-        if not success:
+        # Delete unless protected; only look the secret up again to explain a failed delete
+        deleted_name = SecretCRUD.delete_secret_if_not_protected(db, secret_id, PROTECTED_SECRET_NAMES)
+        if deleted_name is None:
+            secret = SecretCRUD.get_secret(db, secret_id)
+            if secret:
+                raise HTTPException(
+                    status_code=403, 
+                    detail=f"Cannot delete required secret: {secret.name}"
+                )
             raise HTTPException(status_code=404, detail="Secret not found")
         return {"message": "Secret deleted successfully"}
     except HTTPException:
@@ -382,6 +493,74 @@ async def get_secret_by_name(secret_name: str, db: Session = Depends(get_db)):
 
 # ========== GITHUB API ENDPOINTS ==========
 
+# Short-lived cache of the decrypted GITHUB_TOKEN so GitHub endpoints don't hit the database
+# on every request; token verifications are cached by GitHubService.verify_token_cached
+GITHUB_TOKEN_CACHE_TTL = timedelta(seconds=60)
+_github_token_cache = {"token": None, "timestamp": None}
+_github_token_lock = asyncio.Lock()  # One database read and decrypt per refresh
+
+def clear_github_token_cache():
+    """Forget the cached GITHUB_TOKEN and its verification state"""
+    _github_token_cache["token"] = None
+    _github_token_cache["timestamp"] = None
+    GitHubService.forget_token_verification()
+
+def _cached_github_token() -> Optional[str]:
+    token = _github_token_cache["token"]
+    if token is not None and datetime.now() - _github_token_cache["timestamp"] < GITHUB_TOKEN_CACHE_TTL:
+        return token
+    return None
+
+async def get_github_token_cached(db: Optional[Session] = None) -> Optional[str]:
+    """
+    Get the decrypted GITHUB_TOKEN, cached for GITHUB_TOKEN_CACHE_TTL. On a miss the token is
+    read from the given secrets session, or from a short-lived one if none is given.
+    """
+    token = _cached_github_token()
+    if token is not None:
+        return token
+    
+    async with _github_token_lock:
+        # Another request may have refreshed the token while this one waited
+        token = _cached_github_token()
+        if token is not None:
+            return token
+        
+        if db is not None:
+            token = await GitHubService.get_github_token(db)
+        else:
+            from database import SecretsSessionLocal
+            session = SecretsSessionLocal()
+            try:
+                token = await GitHubService.get_github_token(session)
+            finally:
+                session.close()
+        
+        if token:
+            _github_token_cache["token"] = token
+            _github_token_cache["timestamp"] = datetime.now()
+        return token
+
+async def get_validated_token(db: Session = Depends(get_db)) -> str:
+    """
+    Dependency returning a verified GITHUB_TOKEN, raising 404/401 if it is missing or invalid.
+    Handlers that reject bad input with a 400 call it directly after their own checks instead.
+    """
+    token = await get_github_token_cached(db)
+    
+    if not token:
+        raise HTTPException(
+            status_code=404,
+            detail="GITHUB_TOKEN secret not found. Please add it in Secrets Management."
+        )
+    
+    if not await GitHubService.verify_token_cached(token):
+        raise HTTPException(
+            status_code=401,
+            detail="GITHUB_TOKEN is invalid. Please update it in Secrets Management."
+        )
+    return token
+
 @app.get("/api/github/token-status")
 async def check_github_token_status(db: Session = Depends(get_db)):
     """Check if GITHUB_TOKEN exists and is valid"""
@@ -394,16 +573,17 @@ async def check_github_token_status(db: Session = Depends(get_db)):
                 "message": "GITHUB_TOKEN secret not found. Please add it in Secrets Management."
             }
         
-        is_valid = await GitHubService.verify_token(token)
-        if not is_valid:
+        # A single /user call both verifies the token and tells which user it belongs to
+        try:
+            user_info = await GitHubService.get_user_info(token)
+        except Exception as e:
+            print(f"Error verifying token: {e}")
             return {
                 "has_token": True,
                 "is_valid": False,
                 "message": "GITHUB_TOKEN exists but is invalid. Please update it in Secrets Management."
             }
         
-        # Get user info to show which user the token belongs to
-        user_info = await GitHubService.get_user_info(token)
         return {
             "has_token": True,
             "is_valid": True,
@@ -418,16 +598,9 @@ async def check_github_token_status(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Error checking token status: {str(e)}")
 
 @app.get("/api/github/token-scopes")
-async def get_github_token_scopes(db: Session = Depends(get_db)):
+async def get_github_token_scopes(token: str = Depends(get_validated_token)):
     """Get the scopes available for the current GitHub token"""
     try:
-        token = await GitHubService.get_github_token(db)
-        if not token:
-            raise HTTPException(
-                status_code=404,
-                detail="GITHUB_TOKEN secret not found. Please add it in Secrets Management."
-            )
-        
         scopes = await GitHubService.get_token_scopes(token)
         return {
             "scopes": scopes,
@@ -444,7 +617,7 @@ async def get_github_token_scopes(db: Session = Depends(get_db)):
 async def clear_github_cache():
     """Clear the GitHub repository cache"""
     try:
-        GitHubService._repo_cache.clear()
+        await GitHubService.clear_repository_cache()
         return {
             "success": True,
             "message": "GitHub repository cache cleared successfully"
@@ -453,22 +626,9 @@ async def clear_github_cache():
         raise HTTPException(status_code=500, detail=f"Error clearing cache: {str(e)}")
 
 @app.get("/api/github/organizations")
-async def get_github_organizations(db: Session = Depends(get_db)):
+async def get_github_organizations(token: str = Depends(get_validated_token)):
     """Get GitHub organizations for the authenticated user"""
     try:
-        token = await GitHubService.get_github_token(db)
-        if not token:
-            raise HTTPException(
-                status_code=404, 
-                detail="GITHUB_TOKEN secret not found. Please add it in Secrets Management."
-            )
-        
-        if not await GitHubService.verify_token(token):
-            raise HTTPException(
-                status_code=401,
-                detail="GITHUB_TOKEN is invalid. Please update it in Secrets Management."
-            )
-        
         organizations = await GitHubService.get_user_organizations(token)
         
         # Format the response
@@ -491,22 +651,9 @@ async def get_github_organizations(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Error fetching organizations: {error_msg}")
 
 @app.get("/api/github/organizations/{org_name}")
-async def get_github_organization_details(org_name: str, db: Session = Depends(get_db)):
+async def get_github_organization_details(org_name: str, token: str = Depends(get_validated_token)):
     """Get detailed information about a specific GitHub organization"""
     try:
-        token = await GitHubService.get_github_token(db)
-        if not token:
-            raise HTTPException(
-                status_code=404,
-                detail="GITHUB_TOKEN secret not found. Please add it in Secrets Management."
-            )
-        
-        if not await GitHubService.verify_token(token):
-            raise HTTPException(
-                status_code=401,
-                detail="GITHUB_TOKEN is invalid. Please update it in Secrets Management."
-            )
-        
         org_details = await GitHubService.get_organization_details(token, org_name)
         return GitHubService.format_organization(org_details)
     except HTTPException:
@@ -520,6 +667,24 @@ async def get_github_organization_details(org_name: str, db: Session = Depends(g
             )
         raise HTTPException(status_code=500, detail=f"Error fetching organization details: {error_msg}")
 
+def rank_languages(repo_count: Counter, top: Optional[int] = None) -> List[str]:
+    """Order languages by popularity (most used first), keeping only the top N when given"""
+    def popularity(lang: str):
+        return (repo_count[lang], lang.lower())
+    
+    if top is not None:
+        return heapq.nlargest(top, repo_count, key=popularity)
+    return sorted(repo_count, key=popularity, reverse=True)
+
+def repository_has_language(repo: dict, language_key: str) -> bool:
+    """
+    Check whether a repository uses the given (case-folded) language, looking at both the
+    primary language and the detailed language breakdown. 'all' matches every repository.
+    """
+    if language_key == "all":
+        return True
+    return language_key in GitHubService.get_repository_languages_casefold(repo)
+
 @app.get("/api/github/organizations/{org_name}/repositories")
 async def get_github_organization_repositories(org_name: str, language: str, db: Session = Depends(get_db)):
     """Get repositories for a specific GitHub organization filtered by language (language is required)"""
@@ -529,54 +694,25 @@ async def get_github_organization_repositories(org_name: str, language: str, db:
             detail="Language parameter is required. Use 'all' to get repositories of all languages."
         )
     
+    token = await get_validated_token(db)
+    
     try:
-        token = await GitHubService.get_github_token(db)
-        if not token:
-            raise HTTPException(
-                status_code=404,
-                detail="GITHUB_TOKEN secret not found. Please add it in Secrets Management."
-            )
-        
-        if not await GitHubService.verify_token(token):
-            raise HTTPException(
-                status_code=401,
-                detail="GITHUB_TOKEN is invalid. Please update it in Secrets Management."
-            )
-        
-        repositories = await GitHubService.get_organization_repositories(token, org_name)
-        
-        # Enhanced filtering: check both primary language and detailed language breakdown
-        if language.lower() != "all":
-            filtered_repositories = []
-            for repo in repositories:
-                repo_has_language = False
-                
-                # Check primary language
-                if repo.get("language") and repo.get("language").lower() == language.lower():
-                    repo_has_language = True
-                
-                # Check detailed language breakdown if available
-                if not repo_has_language and repo.get("languages_detail") and isinstance(repo.get("languages_detail"), dict):
-                    for lang_name, bytes_count in repo.get("languages_detail").items():
-                        if lang_name and bytes_count > 0 and lang_name.lower() == language.lower():
-                            repo_has_language = True
-                            break
-                
-                if repo_has_language:
-                    filtered_repositories.append(repo)
-            
-            repositories = filtered_repositories
-        
-        # Format the response
-        formatted_repos = [GitHubService.format_repository(repo) for repo in repositories]
+        # Filter and format in a single pass as repository pages arrive
+        language_key = language.casefold()
+        is_filtered = language_key != "all"
+        formatted_repos = [
+            GitHubService.format_repository(repo)
+            async for repo in GitHubService.iter_organization_repositories(token, org_name)
+            if repository_has_language(repo, language_key)
+        ]
         
         return {
             "organization": org_name,
             "repositories": formatted_repos,
             "count": len(formatted_repos),
-            "filtered_by_language": language if language.lower() != "all" else None,
-            "filter_method": "comprehensive" if language.lower() != "all" else "none",
-            "note": "Filtering includes both primary language and detailed language breakdown" if language.lower() != "all" else None
+            "filtered_by_language": language if is_filtered else None,
+            "filter_method": "comprehensive" if is_filtered else "none",
+            "note": "Filtering includes both primary language and detailed language breakdown" if is_filtered else None
         }
     except HTTPException:
         raise
@@ -590,62 +726,50 @@ async def get_github_organization_repositories(org_name: str, language: str, db:
         raise HTTPException(status_code=500, detail=f"Error fetching repositories: {error_msg}")
 
 @app.get("/api/github/organizations/{org_name}/languages")
-async def get_github_organization_languages(org_name: str, db: Session = Depends(get_db)):
+async def get_github_organization_languages(org_name: str, top: Optional[int] = Query(None, ge=1), token: str = Depends(get_validated_token)):
     """Get available programming languages for a specific GitHub organization (comprehensive list)"""
     try:
-        token = await GitHubService.get_github_token(db)
-        if not token:
-            raise HTTPException(
-                status_code=404,
-                detail="GITHUB_TOKEN secret not found. Please add it in Secrets Management."
-            )
-        
-        if not await GitHubService.verify_token(token):
-            raise HTTPException(
-                status_code=401,
-                detail="GITHUB_TOKEN is invalid. Please update it in Secrets Management."
-            )
-        
-        repositories = await GitHubService.get_organization_repositories(token, org_name)
-        
         # Get comprehensive list of all languages (primary + secondary from detailed breakdown)
-        languages = set()
-        language_stats = {}
+        repo_count = Counter()
+        is_primary = Counter()
         repos_with_detailed_languages = 0
+        total_repositories = 0
         
-        for repo in repositories:
+        # Aggregate as repository pages arrive instead of materializing the full list first
+        async for repo in GitHubService.iter_organization_repositories(token, org_name):
+            total_repositories += 1
+            counted_languages = set()  # Languages already credited to this repo
+            
             # Add primary language if available
-            if repo.get("language"):
-                primary_lang = repo.get("language")
-                languages.add(primary_lang)
-                language_stats[primary_lang] = language_stats.get(primary_lang, {"repo_count": 0, "is_primary": 0})
-                language_stats[primary_lang]["repo_count"] += 1
-                language_stats[primary_lang]["is_primary"] += 1
+            primary_lang = repo.get("language")
+            if primary_lang:
+                repo_count[primary_lang] += 1
+                is_primary[primary_lang] += 1
+                counted_languages.add(primary_lang)
             
             # Add all languages from detailed breakdown if available
-            if repo.get("languages_detail") and isinstance(repo.get("languages_detail"), dict):
+            languages_detail = repo.get("languages_detail")
+            if isinstance(languages_detail, dict) and languages_detail:
                 repos_with_detailed_languages += 1
-                for lang_name, bytes_count in repo.get("languages_detail").items():
-                    if lang_name and bytes_count > 0:  # Only include languages with actual code
-                        languages.add(lang_name)
-                        if lang_name not in language_stats:
-                            language_stats[lang_name] = {"repo_count": 0, "is_primary": 0}
-                        # Only increment repo_count if this language wasn't already counted for this repo
-                        if repo.get("language") != lang_name:
-                            language_stats[lang_name]["repo_count"] += 1
+                for lang_name, bytes_count in languages_detail.items():
+                    # Only include languages with actual code
+                    if lang_name and bytes_count > 0 and lang_name not in counted_languages:
+                        repo_count[lang_name] += 1
+                        counted_languages.add(lang_name)
+        
+        language_stats = {
+            lang: {"repo_count": count, "is_primary": is_primary[lang]}
+            for lang, count in repo_count.items()
+        }
         
         # Sort languages by popularity (most used first) and create objects with name and count
-        sorted_languages = sorted(
-            list(languages), 
-            key=lambda lang: (language_stats.get(lang, {}).get("repo_count", 0), lang.lower()), 
-            reverse=True
-        )
+        sorted_languages = rank_languages(repo_count, top)
         
         # Format languages as objects with name and count
         formatted_languages = [
             {
                 "name": lang,
-                "count": language_stats.get(lang, {}).get("repo_count", 0)
+                "count": repo_count[lang]
             }
             for lang in sorted_languages
         ]
@@ -654,10 +778,10 @@ async def get_github_organization_languages(org_name: str, db: Session = Depends
             "organization": org_name,
             "languages": formatted_languages,
             "language_stats": language_stats,
-            "total_repositories": len(repositories),
+            "total_repositories": total_repositories,
             "repos_with_detailed_languages": repos_with_detailed_languages,
             "collection_method": "comprehensive" if repos_with_detailed_languages > 0 else "primary_only",
-            "note": f"Collected from {repos_with_detailed_languages} repositories with detailed language data + primary languages from all {len(repositories)} repositories"
+            "note": f"Collected from {repos_with_detailed_languages} repositories with detailed language data + primary languages from all {total_repositories} repositories"
         }
     except HTTPException:
         raise
@@ -665,22 +789,9 @@ async def get_github_organization_languages(org_name: str, db: Session = Depends
         raise HTTPException(status_code=500, detail=f"Error fetching languages: {str(e)}")
 
 @app.get("/api/github/organizations/{org_name}/secrets")
-async def get_github_organization_secrets(org_name: str, db: Session = Depends(get_db)):
+async def get_github_organization_secrets(org_name: str, token: str = Depends(get_validated_token)):
     """Get organization secrets (only names, not values)"""
     try:
-        token = await GitHubService.get_github_token(db)
-        if not token:
-            raise HTTPException(
-                status_code=404,
-                detail="GITHUB_TOKEN secret not found. Please add it in Secrets Management."
-            )
-        
-        if not await GitHubService.verify_token(token):
-            raise HTTPException(
-                status_code=401,
-                detail="GITHUB_TOKEN is invalid. Please update it in Secrets Management."
-            )
-        
         secrets = await GitHubService.get_organization_secrets(token, org_name)
         return {
             "organization": org_name,
@@ -693,22 +804,9 @@ async def get_github_organization_secrets(org_name: str, db: Session = Depends(g
         raise HTTPException(status_code=500, detail=f"Error fetching organization secrets: {str(e)}")
 
 @app.get("/api/github/organizations/{org_name}/custom-properties")
-async def get_github_organization_custom_properties(org_name: str, db: Session = Depends(get_db)):
+async def get_github_organization_custom_properties(org_name: str, token: str = Depends(get_validated_token)):
     """Get organization custom properties schema"""
     try:
-        token = await GitHubService.get_github_token(db)
-        if not token:
-            raise HTTPException(
-                status_code=404,
-                detail="GITHUB_TOKEN secret not found. Please add it in Secrets Management."
-            )
-        
-        if not await GitHubService.verify_token(token):
-            raise HTTPException(
-                status_code=401,
-                detail="GITHUB_TOKEN is invalid. Please update it in Secrets Management."
-            )
-        
         properties = await GitHubService.get_organization_custom_properties(token, org_name)
         return {
             "organization": org_name,
@@ -721,22 +819,9 @@ async def get_github_organization_custom_properties(org_name: str, db: Session =
         raise HTTPException(status_code=500, detail=f"Error fetching organization custom properties: {str(e)}")
 
 @app.get("/api/github/organizations/{org_name}/variables")
-async def get_github_organization_variables(org_name: str, db: Session = Depends(get_db)):
+async def get_github_organization_variables(org_name: str, token: str = Depends(get_validated_token)):
     """Get organization variables (names and values)"""
     try:
-        token = await GitHubService.get_github_token(db)
-        if not token:
-            raise HTTPException(
-                status_code=404,
-                detail="GITHUB_TOKEN secret not found. Please add it in Secrets Management."
-            )
-        
-        if not await GitHubService.verify_token(token):
-            raise HTTPException(
-                status_code=401,
-                detail="GITHUB_TOKEN is invalid. Please update it in Secrets Management."
-            )
-        
         variables = await GitHubService.get_organization_variables(token, org_name)
         return {
             "organization": org_name,
@@ -751,7 +836,7 @@ async def get_github_organization_variables(org_name: str, db: Session = Depends
 
 
 @app.get("/api/github/user/repositories")
-async def get_github_user_repositories(language: str, db: Session = Depends(get_db)):
+async def get_github_user_repositories(request: Request, language: str, db: Session = Depends(get_db)):
     """Get all repositories the authenticated user has access to, filtered by language (language is required)"""
     if not language or language.strip() == "":
         raise HTTPException(
@@ -759,122 +844,89 @@ async def get_github_user_repositories(language: str, db: Session = Depends(get_
             detail="Language parameter is required. Use 'all' to get repositories of all languages."
         )
     
+    token = await get_validated_token(db)
+    
     try:
-        token = await GitHubService.get_github_token(db)
-        if not token:
-            raise HTTPException(
-                status_code=404,
-                detail="GITHUB_TOKEN secret not found. Please add it in Secrets Management."
-            )
-        
-        if not await GitHubService.verify_token(token):
-            raise HTTPException(
-                status_code=401,
-                detail="GITHUB_TOKEN is invalid. Please update it in Secrets Management."
-            )
-        
-        repositories = await GitHubService.get_user_repositories(token)
-        
-        # Enhanced filtering: check both primary language and detailed language breakdown
-        if language.lower() != "all":
-            filtered_repositories = []
-            for repo in repositories:
-                repo_has_language = False
-                
-                # Check primary language
-                if repo.get("language") and repo.get("language").lower() == language.lower():
-                    repo_has_language = True
-                
-                # Check detailed language breakdown if available
-                if not repo_has_language and repo.get("languages_detail") and isinstance(repo.get("languages_detail"), dict):
-                    for lang_name, bytes_count in repo.get("languages_detail").items():
-                        if lang_name and bytes_count > 0 and lang_name.lower() == language.lower():
-                            repo_has_language = True
-                            break
-                
-                if repo_has_language:
-                    filtered_repositories.append(repo)
-            
-            repositories = filtered_repositories
-        
-        # Format the response
-        formatted_repos = [GitHubService.format_repository(repo) for repo in repositories]
+        language_key = language.casefold()
+        is_filtered = language_key != "all"
+        if not is_filtered:
+            repositories = await GitHubService.get_user_repositories(token)
+        else:
+            # GraphQL returns the full language breakdown of every repository in the listing itself
+            repositories = await GitHubService.get_user_repositories_graphql(token)
+        
+        # Filter and format in a single pass
+        formatted_repos = [
+            GitHubService.format_repository(repo)
+            for repo in repositories
+            if repository_has_language(repo, language_key)
+        ]
         
-        return {
+        return etag_response(request, {
             "scope": "user_all_repositories",
             "repositories": formatted_repos,
             "count": len(formatted_repos),
-            "filtered_by_language": language if language.lower() != "all" else None,
-            "filter_method": "comprehensive" if language.lower() != "all" else "none",
-            "note": "Filtering includes both primary language and detailed language breakdown" if language.lower() != "all" else None
-        }
+            "filtered_by_language": language if is_filtered else None,
+            "filter_method": "comprehensive" if is_filtered else "none",
+            "note": "Filtering includes both primary language and detailed language breakdown" if is_filtered else None
+        })
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching user repositories: {str(e)}")
 
+# Last user languages response with the cached repository list and top limit it was computed
+# from; reused for as long as GitHubService keeps serving that same list
+_user_languages_cache = {"repositories": None, "top": None, "response": None}
+
 @app.get("/api/github/user/languages")
-async def get_github_user_languages(db: Session = Depends(get_db)):
+async def get_github_user_languages(request: Request, top: Optional[int] = Query(None, ge=1), token: str = Depends(get_validated_token)):
     """Get available programming languages for all user repositories (comprehensive list)"""
     try:
-        token = await GitHubService.get_github_token(db)
-        if not token:
-            raise HTTPException(
-                status_code=404,
-                detail="GITHUB_TOKEN secret not found. Please add it in Secrets Management."
-            )
-        
-        if not await GitHubService.verify_token(token):
-            raise HTTPException(
-                status_code=401,
-                detail="GITHUB_TOKEN is invalid. Please update it in Secrets Management."
-            )
-        
         repositories = await GitHubService.get_user_repositories(token)
+        if _user_languages_cache["repositories"] is repositories and _user_languages_cache["top"] == top:
+            return etag_response(request, _user_languages_cache["response"])
         
         # Get comprehensive list of all languages (primary + secondary from detailed breakdown)
-        languages = set()
-        language_stats = {}
+        repo_count = Counter()
+        is_primary = Counter()
         repos_with_detailed_languages = 0
         
         for repo in repositories:
+            primary_lang = repo.get("language")
+            
             # Add primary language if available
-            if repo.get("language"):
-                primary_lang = repo.get("language")
-                languages.add(primary_lang)
-                language_stats[primary_lang] = language_stats.get(primary_lang, {"repo_count": 0, "is_primary": 0})
-                language_stats[primary_lang]["repo_count"] += 1
-                language_stats[primary_lang]["is_primary"] += 1
+            if primary_lang:
+                repo_count[primary_lang] += 1
+                is_primary[primary_lang] += 1
             
             # Add all languages from detailed breakdown if available
-            if repo.get("languages_detail") and isinstance(repo.get("languages_detail"), dict):
+            languages_detail = repo.get("languages_detail")
+            if isinstance(languages_detail, dict) and languages_detail:
                 repos_with_detailed_languages += 1
-                for lang_name, bytes_count in repo.get("languages_detail").items():
-                    if lang_name and bytes_count > 0:  # Only include languages with actual code
-                        languages.add(lang_name)
-                        if lang_name not in language_stats:
-                            language_stats[lang_name] = {"repo_count": 0, "is_primary": 0}
-                        # Only increment repo_count if this language wasn't already counted for this repo
-                        if repo.get("language") != lang_name:
-                            language_stats[lang_name]["repo_count"] += 1
+                for lang_name, bytes_count in languages_detail.items():
+                    # Only include languages with actual code, and don't count the primary language twice
+                    if lang_name and bytes_count > 0 and lang_name != primary_lang:
+                        repo_count[lang_name] += 1
+        
+        language_stats = {
+            lang: {"repo_count": count, "is_primary": is_primary[lang]}
+            for lang, count in repo_count.items()
+        }
         
         # Sort languages by popularity (most used first) and create objects with name and count
-        sorted_languages = sorted(
-            list(languages), 
-            key=lambda lang: (language_stats.get(lang, {}).get("repo_count", 0), lang.lower()), 
-            reverse=True
-        )
+        sorted_languages = rank_languages(repo_count, top)
         
         # Format languages as objects with name and count
         formatted_languages = [
             {
                 "name": lang,
-                "count": language_stats.get(lang, {}).get("repo_count", 0)
+                "count": repo_count[lang]
             }
             for lang in sorted_languages
         ]
         
-        return {
+        response = {
             "scope": "user_all_repositories",
             "languages": formatted_languages,
             "language_stats": language_stats,
@@ -883,24 +935,21 @@ async def get_github_user_languages(db: Session = Depends(get_db)):
             "collection_method": "comprehensive" if repos_with_detailed_languages > 0 else "primary_only",
             "note": f"Collected from {repos_with_detailed_languages} repositories with detailed language data + primary languages from all {len(repositories)} repositories"
         }
+        _user_languages_cache["repositories"] = repositories
+        _user_languages_cache["top"] = top
+        _user_languages_cache["response"] = response
+        return etag_response(request, response)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching user languages: {str(e)}")
 
 @app.get("/api/github/user")
-async def get_github_user(db: Session = Depends(get_db)):
+async def get_github_user(request: Request, token: str = Depends(get_validated_token)):
     """Get GitHub user information for the authenticated token"""
     try:
-        token = await GitHubService.get_github_token(db)
-        if not token:
-            raise HTTPException(
-                status_code=404,
-                detail="GITHUB_TOKEN secret not found. Please add it in Secrets Management."
-            )
-        
         user_info = await GitHubService.get_user_info(token)
-        return {
+        return etag_response(request, {
             "login": user_info.get("login"),
             "name": user_info.get("name"),
             "email": user_info.get("email"),
@@ -913,33 +962,19 @@ async def get_github_user(db: Session = Depends(get_db)):
             "followers": user_info.get("followers"),
             "following": user_info.get("following"),
             "created_at": user_info.get("created_at")
-        }
+        })
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching user info: {str(e)}")
 
 @app.get("/api/github/repositories/{owner}/{repo_name}/details")
-async def get_github_repository_details(owner: str, repo_name: str, db: Session = Depends(get_db)):
+async def get_github_repository_details(request: Request, owner: str, repo_name: str, token: str = Depends(get_validated_token)):
     """Get detailed information about a specific repository including custom properties"""
     try:
-        token = await GitHubService.get_github_token(db)
-        if not token:
-            raise HTTPException(
-                status_code=404,
-                detail="GITHUB_TOKEN secret not found. Please add it in Secrets Management."
-            )
-        
-        if not await GitHubService.verify_token(token):
-            raise HTTPException(
-                status_code=401,
-                detail="GITHUB_TOKEN is invalid. Please update it in Secrets Management."
-            )
-        
         try:
+            # The details include the repository's branches
             repo_details = await GitHubService.get_repository_details(token, owner, repo_name)
-            # Also fetch branches
-            branches = await GitHubService.get_repository_branches(token, owner, repo_name)
         except ValueError as e:
             # Handle specific repository errors (not found, access denied, etc.)
             if "not found" in str(e).lower():
@@ -994,60 +1029,34 @@ async def get_github_repository_details(owner: str, repo_name: str, db: Session
                 "total_count": 0,
                 "has_workflows": False
             }),
-            "branches": branches  # Add branches to repository details
+            "branches": repo_details.get("branches", [])
         }
         
-        return formatted_details
+        return etag_response(request, formatted_details)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching repository details: {str(e)}")
 
 @app.get("/api/github/repositories/{owner}/{repo_name}/branches")
-async def get_repository_branches(owner: str, repo_name: str, db: Session = Depends(get_db)):
+async def get_repository_branches(request: Request, owner: str, repo_name: str, token: str = Depends(get_validated_token)):
     """Get all branches for a specific repository"""
     try:
-        token = await GitHubService.get_github_token(db)
-        if not token:
-            raise HTTPException(
-                status_code=404,
-                detail="GITHUB_TOKEN secret not found. Please add it in Secrets Management."
-            )
-        
-        if not await GitHubService.verify_token(token):
-            raise HTTPException(
-                status_code=401,
-                detail="GITHUB_TOKEN is invalid. Please update it in Secrets Management."
-            )
-        
         branches = await GitHubService.get_repository_branches(token, owner, repo_name)
-        return {"branches": branches}
+        return etag_response(request, {"branches": branches})
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching repository branches: {str(e)}")
 
 @app.get("/api/github/repositories/{full_repo_name:path}/tree")
-async def get_repository_tree(full_repo_name: str, branch: str = "main", db: Session = Depends(get_db)):
+async def get_repository_tree(request: Request, full_repo_name: str, branch: str = "main", token: str = Depends(get_validated_token)):
     """Get repository file tree for detecting legacy config files"""
     try:
-        token = await GitHubService.get_github_token(db)
-        if not token:
-            raise HTTPException(
-                status_code=404,
-                detail="GITHUB_TOKEN secret not found. Please add it in Secrets Management."
-            )
-        
-        if not await GitHubService.verify_token(token):
-            raise HTTPException(
-                status_code=401,
-                detail="GITHUB_TOKEN is invalid. Please update it in Secrets Management."
-            )
-        
         # Get GitHub API base URL
         base_url = GitHubService.get_base_url()
         
-        async with httpx.AsyncClient(verify=False) as client:
+        async with GitHubService.get_http_client() as client:
             headers = {
                 "Authorization": f"Bearer {token}",
                 "Accept": "application/vnd.github.v3+json"
@@ -1056,75 +1065,53 @@ async def get_repository_tree(full_repo_name: str, branch: str = "main", db: Ses
             # If no specific branch provided, get the default branch
             branch_to_use = branch
             if not branch or branch == "main":
-                repo_url = f"{base_url}/repos/{full_repo_name}"
-                repo_response = await client.get(repo_url, headers=headers)
-                if repo_response.status_code == 200:
-                    repo_data = repo_response.json()
-                    branch_to_use = repo_data.get('default_branch', 'main')
+                branch_to_use = await GitHubService.get_default_branch(client, full_repo_name, headers) or branch_to_use
             
             # Get tree recursively to find files in subdirectories
-            tree_url = f"{base_url}/repos/{full_repo_name}/git/trees/{branch_to_use}?recursive=1"
-            tree_response = await client.get(tree_url, headers=headers)
+            tree_url = f"{base_url}/repos/{full_repo_name}/git/trees/{branch_to_use}"
+            tree_response = await GitHubService.conditional_get(client, tree_url, headers, params={"recursive": 1})
             
             if tree_response.status_code != 200:
                 error_detail = f"Failed to fetch repository tree: {tree_response.status_code}"
-                print(f"Error getting tree for {full_repo_name}/{default_branch}: {error_detail}, Response: {tree_response.text}")
+                print(f"Error getting tree for {full_repo_name}/{branch_to_use}: {error_detail}, Response: {tree_response.text}")
                 raise HTTPException(status_code=tree_response.status_code, detail=error_detail)
             
-            return tree_response.json()
+            # Pass GitHub's JSON through as-is instead of decoding and re-encoding a multi-MB tree
+            return etag_response(request, tree_response.content)
             
     except HTTPException:
         raise
     except Exception as e:
-        import traceback
-        print(f"Exception in get_repository_tree for {full_repo_name}:")
-        print(f"Error: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Exception in get_repository_tree for %s", full_repo_name)
         raise HTTPException(status_code=500, detail=f"Error fetching repository tree: {str(e)}")
 
 @app.get("/api/github/repositories/{full_repo_name:path}/contents/{file_path:path}")
-async def get_file_contents(full_repo_name: str, file_path: str, db: Session = Depends(get_db)):
+async def get_file_contents(request: Request, full_repo_name: str, file_path: str, token: str = Depends(get_validated_token)):
     """Get file contents from a repository"""
     try:
-        token = await GitHubService.get_github_token(db)
-        if not token:
-            raise HTTPException(
-                status_code=404,
-                detail="GITHUB_TOKEN secret not found. Please add it in Secrets Management."
-            )
-        
-        if not await GitHubService.verify_token(token):
-            raise HTTPException(
-                status_code=401,
-                detail="GITHUB_TOKEN is invalid. Please update it in Secrets Management."
-            )
-        
         # Get GitHub API base URL
         base_url = GitHubService.get_base_url()
         
-        async with httpx.AsyncClient(verify=False) as client:
+        async with GitHubService.get_http_client() as client:
             file_url = f"{base_url}/repos/{full_repo_name}/contents/{file_path}"
             headers = {
                 "Authorization": f"Bearer {token}",
                 "Accept": "application/vnd.github.v3+json"
             }
             
-            file_response = await client.get(file_url, headers=headers)
+            file_response = await GitHubService.conditional_get(client, file_url, headers)
             
             if file_response.status_code != 200:
                 error_detail = f"Failed to fetch file contents: {file_response.status_code}"
                 print(f"Error getting file {full_repo_name}/{file_path}: {error_detail}")
                 raise HTTPException(status_code=file_response.status_code, detail=error_detail)
             
-            return file_response.json()
+            return etag_response(request, file_response.content)
             
     except HTTPException:
         raise
     except Exception as e:
-        import traceback
-        print(f"Exception in get_file_contents for {full_repo_name}/{file_path}:")
-        print(f"Error: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Exception in get_file_contents for %s/%s", full_repo_name, file_path)
         raise HTTPException(status_code=500, detail=f"Error fetching file contents: {str(e)}")
 
 class DeleteFileRequest(BaseModel):
@@ -1136,24 +1123,11 @@ class DeleteFileRequest(BaseModel):
 async def delete_repository_file(
     full_repo_name: str,
     request: DeleteFileRequest,
-    db: Session = Depends(get_db)
+    token: str = Depends(get_validated_token)
 ):
     """Delete a file from a repository"""
     try:
-        token = await GitHubService.get_github_token(db)
-        if not token:
-            raise HTTPException(
-                status_code=404,
-                detail="GITHUB_TOKEN secret not found. Please add it in Secrets Management."
-            )
-        
-        if not await GitHubService.verify_token(token):
-            raise HTTPException(
-                status_code=401,
-                detail="GITHUB_TOKEN is invalid. Please update it in Secrets Management."
-            )
-        
-        async with httpx.AsyncClient(verify=False) as client:
+        async with GitHubService.get_http_client() as client:
             headers = {
                 "Authorization": f"Bearer {token}",
                 "Accept": "application/vnd.github.v3+json"
@@ -1173,16 +1147,15 @@ async def delete_repository_file(
             file_sha = file_data.get('sha')
             
             # Delete file using request() method with DELETE and JSON body
-            import json
             delete_response = await client.request(
                 "DELETE",
                 file_url,
-                headers={**headers, "Content-Type": "application/json"},
-                content=json.dumps({
+                headers=headers,
+                json={
                     "message": request.commit_message,
                     "sha": file_sha,
                     "branch": request.branch
-                }).encode('utf-8')
+                }
             )
             
             if delete_response.status_code not in [200, 204]:
@@ -1196,10 +1169,7 @@ async def delete_repository_file(
     except HTTPException:
         raise
     except Exception as e:
-        import traceback
-        print(f"Exception in delete_repository_file for {full_repo_name}/{request.file_path}:")
-        print(f"Error: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Exception in delete_repository_file for %s/%s", full_repo_name, request.file_path)
         raise HTTPException(status_code=500, detail=f"Error deleting file: {str(e)}")
 
 class DeleteFilePRRequest(BaseModel):
@@ -1209,138 +1179,241 @@ class DeleteFilePRRequest(BaseModel):
     pr_body: str
     branch: str = "main"
 
-@app.post("/api/github/repositories/{full_repo_name:path}/delete-file-pr")
-async def delete_repository_file_pr(
+class DeleteFilesPRRequest(BaseModel):
+    file_paths: List[str]
+    commit_message: str
+    pr_title: str
+    pr_body: str
+
+async def get_tree_entries(client, git_url: str, tree_sha: str, paths: List[str], headers: dict) -> dict:
+    """
+    Look up the entries (mode, type) of the given paths in a Git tree, keyed by path. Paths that
+    don't exist are left out. A recursive listing is used unless GitHub truncates it, in which case
+    the missing paths are resolved one directory at a time.
+    """
+    tree_response = await client.get(f"{git_url}/trees/{tree_sha}", headers=headers, params={"recursive": "1"})
+    if tree_response.status_code != 200:
+        raise HTTPException(status_code=500, detail=f"Failed to read tree {tree_sha}: {tree_response.text}")
+    tree_data = orjson.loads(tree_response.content)
+    wanted = set(paths)
+    entries = {entry["path"]: entry for entry in tree_data.get("tree", []) if entry.get("path") in wanted}
+    if not tree_data.get("truncated"):
+        return entries
+    
+    listings = {"": {entry["path"]: entry for entry in tree_data["tree"] if "/" not in entry["path"]}}
+    
+    async def list_directory(directory: str) -> Optional[dict]:
+        """Entries of a directory by name, None if it doesn't exist"""
+        if directory not in listings:
+            parent, _, name = directory.rpartition("/")
+            parent_listing = await list_directory(parent)
+            entry = (parent_listing or {}).get(name)
+            listings[directory] = None
+            if entry and entry["type"] == "tree":
+                response = await client.get(f"{git_url}/trees/{entry['sha']}", headers=headers)
+                if response.status_code == 200:
+                    listings[directory] = {child["path"]: child for child in orjson.loads(response.content)["tree"]}
+        return listings[directory]
+    
+    for path in wanted - entries.keys():
+        directory, _, name = path.rpartition("/")
+        entry = (await list_directory(directory) or {}).get(name)
+        if entry:
+            entries[path] = {**entry, "path": path}
+    return entries
+
+async def create_file_deletion_pr(
     full_repo_name: str,
-    request: DeleteFilePRRequest,
-    db: Session = Depends(get_db)
-):
-    """Create a pull request to delete a file from a repository"""
-    try:
-        token = await GitHubService.get_github_token(db)
-        if not token:
-            raise HTTPException(
-                status_code=404,
-                detail="GITHUB_TOKEN secret not found. Please add it in Secrets Management."
-            )
+    file_paths: List[str],
+    commit_message: str,
+    pr_title: str,
+    pr_body: str,
+    token: str
+) -> dict:
+    """
+    Delete files in a single commit on a new branch and open a pull request for it.
+    Uses the Git Data API, so the number of GitHub calls does not grow with the number of files.
+    """
+    # Get GitHub API base URL
+    base_url = GitHubService.get_base_url()
+    
+    async with GitHubService.get_http_client() as client:
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "Accept": "application/vnd.github.v3+json"
+        }
+        git_url = f"{base_url}/repos/{full_repo_name}/git"
+        
+        # Get repository info
+        repo_response = await client.get(f"{base_url}/repos/{full_repo_name}", headers=headers)
+        
+        if repo_response.status_code != 200:
+            raise HTTPException(status_code=404, detail="Repository not found")
         
-        if not await GitHubService.verify_token(token):
+        repo_data = repo_response.json()
+        default_branch = repo_data.get('default_branch', 'main')
+        
+        # Get the SHA of the default branch
+        ref_response = await client.get(f"{git_url}/refs/heads/{default_branch}", headers=headers)
+        
+        if ref_response.status_code != 200:
+            raise HTTPException(status_code=404, detail=f"Branch {default_branch} not found")
+        
+        base_sha = ref_response.json()['object']['sha']
+        
+        # Get the tree of the branch head
+        commit_response = await client.get(f"{git_url}/commits/{base_sha}", headers=headers)
+        
+        if commit_response.status_code != 200:
+            raise HTTPException(status_code=404, detail=f"Commit {base_sha} not found")
+        
+        base_tree_sha = commit_response.json()['tree']['sha']
+        
+        # Keep each file's mode (executable, symlink) and refuse to open a PR that deletes fewer
+        # files than requested
+        tree_entries = await get_tree_entries(client, git_url, base_tree_sha, file_paths, headers)
+        missing_paths = [file_path for file_path in file_paths if file_path not in tree_entries]
+        if missing_paths:
+            raise HTTPException(status_code=404, detail=f"Files not found: {', '.join(missing_paths)}")
+        
+        # Build a new tree without the files (a null sha removes the path)
+        tree_response = await client.post(
+            f"{git_url}/trees",
+            headers=headers,
+            json={
+                "base_tree": base_tree_sha,
+                "tree": [
+                    {
+                        "path": file_path,
+                        "mode": tree_entries[file_path]["mode"],
+                        "type": tree_entries[file_path]["type"],
+                        "sha": None
+                    }
+                    for file_path in file_paths
+                ]
+            }
+        )
+        
+        if tree_response.status_code != 201:
             raise HTTPException(
-                status_code=401,
-                detail="GITHUB_TOKEN is invalid. Please update it in Secrets Management."
+                status_code=tree_response.status_code,
+                detail=f"Failed to remove files from tree: {tree_response.text}"
             )
         
-        # Get GitHub API base URL
-        base_url = GitHubService.get_base_url()
+        tree_sha = tree_response.json()['sha']
+        if tree_sha == base_tree_sha:
+            raise HTTPException(status_code=404, detail=f"Files not found: {', '.join(file_paths)}")
         
-        async with httpx.AsyncClient(verify=False) as client:
-            headers = {
-                "Authorization": f"Bearer {token}",
-                "Accept": "application/vnd.github.v3+json"
+        # Commit the new tree on top of the branch head
+        new_commit_response = await client.post(
+            f"{git_url}/commits",
+            headers=headers,
+            json={
+                "message": commit_message,
+                "tree": tree_sha,
+                "parents": [base_sha]
             }
-            
-            # Get repository info
-            repo_url = f"{base_url}/repos/{full_repo_name}"
-            repo_response = await client.get(repo_url, headers=headers)
-            
-            if repo_response.status_code != 200:
-                raise HTTPException(status_code=404, detail="Repository not found")
-            
-            repo_data = repo_response.json()
-            default_branch = repo_data.get('default_branch', 'main')
-            
-            # Get the SHA of the default branch
-            ref_url = f"{base_url}/repos/{full_repo_name}/git/refs/heads/{default_branch}"
-            ref_response = await client.get(ref_url, headers=headers)
-            
-            if ref_response.status_code != 200:
-                raise HTTPException(status_code=404, detail=f"Branch {default_branch} not found")
-            
-            ref_data = ref_response.json()
-            base_sha = ref_data['object']['sha']
-            
-            # Create a new branch
-            import time
-            new_branch_name = f"remove-legacy-config-{int(time.time())}"
-            create_branch_url = f"{base_url}/repos/{full_repo_name}/git/refs"
-            import json
-            create_branch_response = await client.request(
-                "POST",
-                create_branch_url,
-                headers={**headers, "Content-Type": "application/json"},
-                content=json.dumps({
-                    "ref": f"refs/heads/{new_branch_name}",
-                    "sha": base_sha
-                }).encode('utf-8')
-            )
-            
-            if create_branch_response.status_code != 201:
-                raise HTTPException(status_code=500, detail=f"Failed to create branch: {create_branch_response.text}")
-            
-            # Get file SHA
-            file_url = f"{base_url}/repos/{full_repo_name}/contents/{request.file_path}"
-            file_response = await client.get(file_url, headers=headers, params={"ref": new_branch_name})
-            
-            if file_response.status_code != 200:
-                raise HTTPException(status_code=404, detail=f"File not found: {request.file_path}")
-            
-            file_data = file_response.json()
-            file_sha = file_data.get('sha')
-            
-            # Delete file in the new branch
-            delete_response = await client.request(
-                "DELETE",
-                file_url,
-                headers={**headers, "Content-Type": "application/json"},
-                content=json.dumps({
-                    "message": request.commit_message,
-                    "sha": file_sha,
-                    "branch": new_branch_name
-                }).encode('utf-8')
-            )
-            
-            if delete_response.status_code not in [200, 204]:
-                raise HTTPException(
-                    status_code=delete_response.status_code,
-                    detail=f"Failed to delete file: {delete_response.text}"
-                )
-            
-            # Create pull request
-            pr_url = f"{base_url}/repos/{full_repo_name}/pulls"
-            pr_response = await client.request(
-                "POST",
-                pr_url,
-                headers={**headers, "Content-Type": "application/json"},
-                content=json.dumps({
-                    "title": request.pr_title,
-                    "body": request.pr_body,
-                    "head": new_branch_name,
-                    "base": default_branch
-                }).encode('utf-8')
-            )
-            
-            if pr_response.status_code != 201:
-                raise HTTPException(
-                    status_code=pr_response.status_code,
-                    detail=f"Failed to create pull request: {pr_response.text}"
-                )
-            
-            pr_data = pr_response.json()
-            return {
-                "message": f"Successfully created PR to delete {request.file_path}",
-                "pr_url": pr_data.get('html_url'),
-                "pr_number": pr_data.get('number')
+        )
+        
+        if new_commit_response.status_code != 201:
+            raise HTTPException(status_code=500, detail=f"Failed to create commit: {new_commit_response.text}")
+        
+        # Create a new branch pointing at the commit
+        new_branch_name = f"remove-legacy-config-{int(time.time())}"
+        create_branch_response = await client.post(
+            f"{git_url}/refs",
+            headers=headers,
+            json={
+                "ref": f"refs/heads/{new_branch_name}",
+                "sha": new_commit_response.json()['sha']
+            }
+        )
+        
+        if create_branch_response.status_code != 201:
+            raise HTTPException(status_code=500, detail=f"Failed to create branch: {create_branch_response.text}")
+        
+        # Create pull request
+        pr_response = await client.post(
+            f"{base_url}/repos/{full_repo_name}/pulls",
+            headers=headers,
+            json={
+                "title": pr_title,
+                "body": pr_body,
+                "head": new_branch_name,
+                "base": default_branch
             }
+        )
+        
+        if pr_response.status_code != 201:
+            raise HTTPException(
+                status_code=pr_response.status_code,
+                detail=f"Failed to create pull request: {pr_response.text}"
+            )
+        
+        return pr_response.json()
+
+@app.post("/api/github/repositories/{full_repo_name:path}/delete-file-pr", deprecated=True)
+async def delete_repository_file_pr(
+    full_repo_name: str,
+    request: DeleteFilePRRequest,
+    token: str = Depends(get_validated_token)
+):
+    """Create a pull request to delete a file from a repository (use delete-file-pr-batch instead)"""
+    try:
+        pr_data = await create_file_deletion_pr(
+            full_repo_name,
+            [request.file_path],
+            request.commit_message,
+            request.pr_title,
+            request.pr_body,
+            token
+        )
+        return {
+            "message": f"Successfully created PR to delete {request.file_path}",
+            "pr_url": pr_data.get('html_url'),
+            "pr_number": pr_data.get('number')
+        }
             
     except HTTPException:
         raise
     except Exception as e:
-        import traceback
-        print(f"Exception in delete_repository_file_pr for {full_repo_name}/{request.file_path}:")
-        print(f"Error: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Exception in delete_repository_file_pr for %s/%s", full_repo_name, request.file_path)
         raise HTTPException(status_code=500, detail=f"Error creating PR to delete file: {str(e)}")
 
+@app.post("/api/github/repositories/{full_repo_name:path}/delete-file-pr-batch")
+async def delete_repository_files_pr(
+    full_repo_name: str,
+    request: DeleteFilesPRRequest,
+    db: Session = Depends(get_db)
+):
+    """Create a single pull request that deletes several files from a repository"""
+    if not request.file_paths:
+        raise HTTPException(status_code=400, detail="file_paths must contain at least one file")
+    
+    token = await get_validated_token(db)
+    
+    try:
+        pr_data = await create_file_deletion_pr(
+            full_repo_name,
+            request.file_paths,
+            request.commit_message,
+            request.pr_title,
+            request.pr_body,
+            token
+        )
+        return {
+            "message": f"Successfully created PR to delete {len(request.file_paths)} file(s)",
+            "file_paths": request.file_paths,
+            "pr_url": pr_data.get('html_url'),
+            "pr_number": pr_data.get('number')
+        }
+            
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Exception in delete_repository_files_pr for %s", full_repo_name)
+        raise HTTPException(status_code=500, detail=f"Error creating PR to delete files: {str(e)}")
+
 @app.get("/api/github/search/workflow-content")
 async def search_repositories_by_workflow_content(
     search_term: str, 
@@ -1367,20 +1440,9 @@ async def search_repositories_by_workflow_content(
             detail="Organization name is required when scope is 'organization'"
         )
     
+    token = await get_validated_token(db)
+    
     try:
-        token = await GitHubService.get_github_token(db)
-        if not token:
-            raise HTTPException(
-                status_code=404,
-                detail="GITHUB_TOKEN secret not found. Please add it in Secrets Management."
-            )
-        
-        if not await GitHubService.verify_token(token):
-            raise HTTPException(
-                status_code=401,
-                detail="GITHUB_TOKEN is invalid. Please update it in Secrets Management."
-            )
-        
         search_results = await GitHubService.search_repositories_by_workflow_content(
             token=token,
             search_term=search_term.strip(),
@@ -1422,20 +1484,9 @@ async def analyze_workflows_with_templates(
             detail="Organization name is required when scope is 'organization'"
         )
     
+    token = await get_validated_token(db)
+    
     try:
-        token = await GitHubService.get_github_token(db)
-        if not token:
-            raise HTTPException(
-                status_code=404,
-                detail="GITHUB_TOKEN secret not found. Please add it in Secrets Management."
-            )
-        
-        if not await GitHubService.verify_token(token):
-            raise HTTPException(
-                status_code=401,
-                detail="GITHUB_TOKEN is invalid. Please update it in Secrets Management."
-            )
-        
         # First, get basic workflow search results
         search_results = await GitHubService.search_repositories_by_workflow_content(
             token=token,
@@ -1467,9 +1518,7 @@ async def analyze_workflows_with_templates(
                 available_templates=template_list
             )
         except Exception as analysis_error:
-            print(f"Analysis error: {analysis_error}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Analysis error: %s", analysis_error)
             raise HTTPException(status_code=500, detail=f"Error during workflow analysis: {str(analysis_error)}")
         
         return {
@@ -1491,13 +1540,84 @@ async def analyze_workflows_with_templates(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"General error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("General error: %s", e)
         raise HTTPException(status_code=500, detail=f"Error analyzing workflow content: {str(e)}")
 
 # ==================== Template Management API ====================
 
+# Templates change rarely, so the structures the scan and analysis endpoints derive from them
+# are built once per TemplateCRUD.version; the TTL picks up edits made by other processes.
+# Each view loads only the columns it needs.
+TEMPLATES_SNAPSHOT_TTL = timedelta(seconds=60)
+_templates_snapshot_cache = {}  # view name -> {"version", "timestamp", "snapshot"}
+
+def _get_cached_templates_view(name: str, db: Session, columns: tuple, build):
+    """Build a view of all templates with build(templates), reusing it while the templates are unchanged"""
+    now = datetime.now()
+    cached = _templates_snapshot_cache.get(name)
+    if (cached is not None
+            and cached["version"] == TemplateCRUD.version
+            and now - cached["timestamp"] < TEMPLATES_SNAPSHOT_TTL):
+        return cached["snapshot"]
+    
+    version = TemplateCRUD.version
+    snapshot = build(TemplateCRUD.get_all_templates(db, columns=columns))
+    _templates_snapshot_cache[name] = {"version": version, "timestamp": now, "snapshot": snapshot}
+    return snapshot
+
+def _build_detection_templates(templates: List[Template]) -> list:
+    return [
+        {
+            'id': t.id,
+            'name': t.name,
+            'content': t.content,
+            'template_type': t.template_type or 'workflow'
+        }
+        for t in templates
+    ]
+
+def _build_keyword_templates(templates: List[Template]) -> tuple:
+    templates_with_keywords = []
+    keyword_to_templates = {}
+    for template in templates:
+        if not template.keywords:
+            continue
+        summary = {
+            "id": template.id,
+            "name": template.name,
+            "description": template.description
+        }
+        templates_with_keywords.append(summary)
+        # Rows written before keywords_normalized existed are normalized here
+        keywords = template.keywords_normalized
+        if keywords is None:
+            keywords = normalize_keywords(template.keywords)
+        for keyword in keywords:
+            keyword_to_templates.setdefault(keyword, []).append(summary)
+    return keyword_to_templates, templates_with_keywords
+
+def get_detection_templates(db: Session) -> list:
+    """
+    Templates for duplicate detection (id, name, content, template_type).
+    Shared between requests and must not be modified.
+    """
+    return _get_cached_templates_view(
+        "detection", db,
+        (Template.id, Template.name, Template.content, Template.template_type),
+        _build_detection_templates
+    )
+
+def get_keyword_templates(db: Session) -> tuple:
+    """
+    Return (keyword_to_templates, templates_with_keywords) without loading template content.
+    Shared between requests and must not be modified.
+    """
+    return _get_cached_templates_view(
+        "keywords", db,
+        (Template.id, Template.name, Template.description, Template.keywords, Template.keywords_normalized),
+        _build_keyword_templates
+    )
+
 class TemplateCreate(BaseModel):
     """Schema for creating a template"""
     name: str
@@ -1531,12 +1651,24 @@ class TemplateResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
 
-    @field_serializer('created_at', 'updated_at')
-    def serialize_datetime(self, dt: datetime, _info):
-        return dt.isoformat() if dt else None
+    model_config = ConfigDict(from_attributes=True)
+
+TEMPLATE_RESPONSE_FIELDS = tuple(TemplateResponse.model_fields)
+
+def templates_response(templates: List[Template]) -> ORJSONResponse:
+    """
+    Render template rows straight to JSON, skipping per-row TemplateResponse validation
+    (orjson serializes the datetimes in the same ISO format)
+    """
+    return ORJSONResponse(templates_to_rows(templates))
+
+def templates_to_rows(templates: List[Template]) -> List[dict]:
+    """Template rows as plain dicts with the TemplateResponse fields"""
+    return [{field: getattr(t, field) for field in TEMPLATE_RESPONSE_FIELDS} for t in templates]
 
-    class Config:
-        from_attributes = True
+# Rendered body of GET /api/templates, rebuilt when TemplateCRUD.version changes (or after the
+# snapshot TTL, for edits made by other processes)
+_templates_list_cache = {"version": None, "timestamp": None, "body": None}
 
 @app.post("/api/templates", response_model=TemplateResponse)
 async def create_template(template: TemplateCreate, db: Session = Depends(get_templates_db)):
@@ -1559,11 +1691,20 @@ async def create_template(template: TemplateCreate, db: Session = Depends(get_te
         raise HTTPException(status_code=500, detail=f"Error creating template: {str(e)}")
 
 @app.get("/api/templates", response_model=List[TemplateResponse])
-async def get_all_templates(db: Session = Depends(get_templates_db)):
-    """Get all templates"""
+async def get_all_templates(request: Request, db: Session = Depends(get_templates_db)):
+    """Get all templates (supports If-None-Match revalidation)"""
     try:
-        templates = TemplateCRUD.get_all_templates(db)
-        return templates
+        now = datetime.now()
+        cached = _templates_list_cache
+        if (cached["body"] is None
+                or cached["version"] != TemplateCRUD.version
+                or now - cached["timestamp"] >= TEMPLATES_SNAPSHOT_TTL):
+            version = TemplateCRUD.version
+            body = orjson.dumps(templates_to_rows(TemplateCRUD.get_all_templates(db)))
+            _templates_list_cache.update(version=version, timestamp=now, body=body)
+        
+        # Templates are edited in the UI, so clients must revalidate rather than reuse a cached list
+        return etag_response(request, _templates_list_cache["body"], cache_control="no-cache")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching templates: {str(e)}")
 
@@ -1580,7 +1721,7 @@ async def search_templates(query: str, db: Session = Depends(get_templates_db)):
     """Search templates by name or description"""
     try:
         templates = TemplateCRUD.search_templates(db, query)
-        return templates
+        return templates_response(templates)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error searching templates: {str(e)}")
 
@@ -1618,8 +1759,106 @@ async def delete_template(template_id: int, db: Session = Depends(get_templates_
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting template: {str(e)}")
 
+# Files larger than this many UTF-8 bytes are committed through the Git Data API, which takes the text as is
+# instead of base64 inside the JSON body like the contents API
+GIT_DATA_UPLOAD_THRESHOLD = 512 * 1024
+
+async def get_file_sha(client, full_repo_name: str, path: str, headers: dict, ref: str) -> Optional[str]:
+    """Get the blob SHA of a file on a branch, or None if the file doesn't exist there"""
+    file_response = await client.get(
+        f"{GitHubService.get_base_url()}/repos/{full_repo_name}/contents/{path}", headers=headers, params={"ref": ref}
+    )
+    if file_response.status_code != 200:
+        return None
+    return orjson.loads(file_response.content).get("sha")
+
+async def get_contents_text(client, file_data: dict, headers: dict) -> str:
+    """Text of a file from its contents API JSON; files over 1 MB come without content and are downloaded"""
+    if file_data.get("encoding") == "base64" and file_data.get("content"):
+        return base64.b64decode(file_data["content"]).decode("utf-8")
+    content_response = await client.get(file_data["download_url"], headers=headers)
+    return content_response.text
+
+async def upsert_file_via_git_data(client, full_repo_name: str, path: str, headers: dict, branch: str,
+                                   content: str, message: str, head_sha: Optional[str] = None) -> dict:
+    """
+    Commit a file to a branch with the Git Data API (tree, commit, ref update). head_sha is the
+    branch's current commit if the caller knows it. Returns the commit in the contents API's shape.
+    """
+    repo_url = f"{GitHubService.get_base_url()}/repos/{full_repo_name}"
+    
+    if head_sha is None:
+        ref_response = await client.get(f"{repo_url}/git/ref/heads/{branch}", headers=headers)
+        if ref_response.status_code != 200:
+            raise HTTPException(status_code=500, detail=f"Failed to get branch '{branch}': {ref_response.text}")
+        head_sha = orjson.loads(ref_response.content)["object"]["sha"]
+    
+    commit_response = await client.get(f"{repo_url}/git/commits/{head_sha}", headers=headers)
+    if commit_response.status_code != 200:
+        raise HTTPException(status_code=500, detail=f"Failed to get commit: {commit_response.text}")
+    base_tree_sha = orjson.loads(commit_response.content)["tree"]["sha"]
+    
+    tree_response = await client.post(f"{repo_url}/git/trees", headers=headers, json={
+        "base_tree": base_tree_sha,
+        "tree": [{"path": path, "mode": "100644", "type": "blob", "content": content}]
+    })
+    if tree_response.status_code != 201:
+        raise HTTPException(status_code=500, detail=f"Failed to create tree: {tree_response.text}")
+    
+    new_commit_response = await client.post(f"{repo_url}/git/commits", headers=headers, json={
+        "message": message,
+        "tree": orjson.loads(tree_response.content)["sha"],
+        "parents": [head_sha]
+    })
+    if new_commit_response.status_code != 201:
+        raise HTTPException(status_code=500, detail=f"Failed to create commit: {new_commit_response.text}")
+    new_commit = orjson.loads(new_commit_response.content)
+    
+    update_ref_response = await client.patch(
+        f"{repo_url}/git/refs/heads/{branch}", headers=headers, json={"sha": new_commit["sha"]}
+    )
+    if update_ref_response.status_code != 200:
+        raise HTTPException(status_code=500, detail=f"Failed to update branch: {update_ref_response.text}")
+    
+    return {"commit": new_commit}
+
+async def upsert_workflow_file(client, full_repo_name: str, path: str, headers: dict, branch: str, content: str,
+                               message: str, file_sha: Optional[str] = None, head_sha: Optional[str] = None) -> dict:
+    """
+    Create or update (when the existing file's SHA is given) a file on a branch, returning GitHub's
+    commit response. Large files go through upsert_file_via_git_data().
+    """
+    content_bytes = content.encode('utf-8')
+    if len(content_bytes) > GIT_DATA_UPLOAD_THRESHOLD:
+        return await upsert_file_via_git_data(client, full_repo_name, path, headers, branch, content, message, head_sha)
+    
+    commit_data = {
+        "message": message,
+        "content": base64.b64encode(content_bytes).decode('ascii'),
+        "branch": branch
+    }
+    if file_sha:
+        commit_data["sha"] = file_sha  # Required for updating existing file
+    
+    commit_response = await client.put(
+        f"{GitHubService.get_base_url()}/repos/{full_repo_name}/contents/{path}", headers=headers, json=commit_data
+    )
+    if commit_response.status_code not in [200, 201]:
+        raise HTTPException(status_code=500, detail=f"Failed to commit workflow: {commit_response.text}")
+    return orjson.loads(commit_response.content)
+
+class ApplyTemplateRequest(BaseModel):
+    """Schema for applying a template to a repository"""
+    template_name: str
+    repository: str
+    method: Literal["direct", "pull_request"] = "direct"
+    branch: str = "main"
+    pr_title: Optional[str] = None
+    pr_body: Optional[str] = None
+    template_content: Optional[str] = None  # Custom content to apply instead of the stored template
+
 @app.post("/api/templates/apply")
-async def apply_template_to_repository(request: dict, db: Session = Depends(get_templates_db)):
+async def apply_template_to_repository(request: ApplyTemplateRequest, db: Session = Depends(get_templates_db)):
     """
     Apply a template to a repository either directly or via pull request.
     
@@ -1634,40 +1873,31 @@ async def apply_template_to_repository(request: dict, db: Session = Depends(get_
     }
     """
     try:
-        template_name = request.get("template_name")
-        repository = request.get("repository")
-        method = request.get("method", "direct")
-        branch = request.get("branch", "main")
-        pr_title = request.get("pr_title", f"Add {template_name} workflow")
-        pr_body = request.get("pr_body", f"This PR adds the {template_name} workflow template.")
-        template_content = request.get("template_content")  # Optional: custom template content
-        
-        if not template_name or not repository:
-            raise HTTPException(status_code=400, detail="template_name and repository are required")
-        
-        if method not in ["direct", "pull_request"]:
-            raise HTTPException(status_code=400, detail="method must be 'direct' or 'pull_request'")
+        template_name = request.template_name
+        repository = request.repository
+        method = request.method
+        branch = request.branch
+        pr_title = request.pr_title or f"Add {template_name} workflow"
+        pr_body = request.pr_body or f"This PR adds the {template_name} workflow template."
+        template_content = request.template_content
         
         # Use provided template content or fetch from database
         if template_content:
             # Use custom content provided by user (for temporary modifications)
             content_to_apply = template_content
         else:
-            # Get template from database
-            templates = TemplateCRUD.search_templates(db, template_name)
-            if not templates:
+            # Get template from database by its exact name (unique index lookup)
+            template = TemplateCRUD.get_template_by_name(db, template_name)
+            if template is None:
                 raise HTTPException(status_code=404, detail=f"Template '{template_name}' not found")
             
-            template = templates[0]  # Use first matching template
             content_to_apply = template.content
         
         # Get GitHub token
-        github_token_secret = SecretCRUD.get_secret_by_name(db, "GITHUB_TOKEN")
-        if not github_token_secret:
+        github_token = await get_github_token_cached()
+        if not github_token:
             raise HTTPException(status_code=404, detail="GITHUB_TOKEN secret not found")
         
-        github_token = decrypt_secret(github_token_secret.encrypted_value)
-        
         # Parse repository owner and name
         parts = repository.split('/')
         if len(parts) != 2:
@@ -1676,47 +1906,30 @@ async def apply_template_to_repository(request: dict, db: Session = Depends(get_
         owner, repo_name = parts
         
         # Generate workflow filename from template name (sanitize it)
-        import re
-        workflow_filename = re.sub(r'[^a-zA-Z0-9-]', '-', template.name.lower()) + '.yml'
+        workflow_filename, pr_branch_name = template_workflow_names(template_name)
         workflow_path = f".github/workflows/{workflow_filename}"
         
         # Get GitHub API base URL
         base_url = GitHubService.get_base_url()
         
-        async with httpx.AsyncClient(verify=False) as client:
+        async with GitHubService.get_http_client() as client:
             headers = {
                 "Authorization": f"token {github_token}",
                 "Accept": "application/vnd.github.v3+json"
             }
             
+            commit_message = f"Add {template_name} workflow"
+            # Only the contents API needs the existing file's SHA
+            needs_file_sha = len(content_to_apply.encode('utf-8')) <= GIT_DATA_UPLOAD_THRESHOLD
+            
             if method == "direct":
-                # Direct commit to branch
-                # First, check if file already exists
-                file_url = f"{base_url}/repos/{owner}/{repo_name}/contents/{workflow_path}"
-                params = {"ref": branch}
-                
+                # Direct commit to branch, updating the file if it already exists
                 file_sha = None
-                file_response = await client.get(file_url, headers=headers, params=params)
-                if file_response.status_code == 200:
-                    file_sha = file_response.json().get("sha")
-                
-                # Create or update the file
-                import base64
-                content_base64 = base64.b64encode(content_to_apply.encode()).decode()
-                
-                commit_data = {
-                    "message": f"Add {template_name} workflow",
-                    "content": content_base64,
-                    "branch": branch
-                }
-                
-                if file_sha:
-                    commit_data["sha"] = file_sha  # Required for updating existing file
-                
-                commit_response = await client.put(file_url, headers=headers, json=commit_data)
-                
-                if commit_response.status_code not in [200, 201]:
-                    raise HTTPException(status_code=500, detail=f"Failed to commit workflow: {commit_response.text}")
+                if needs_file_sha:
+                    file_sha = await get_file_sha(client, repository, workflow_path, headers, branch)
+                commit_result = await upsert_workflow_file(
+                    client, repository, workflow_path, headers, branch, content_to_apply, commit_message, file_sha
+                )
                 
                 return {
                     "success": True,
@@ -1724,58 +1937,36 @@ async def apply_template_to_repository(request: dict, db: Session = Depends(get_
                     "repository": repository,
                     "branch": branch,
                     "workflow_path": workflow_path,
-                    "commit_url": commit_response.json().get("commit", {}).get("html_url"),
+                    "commit_url": commit_result.get("commit", {}).get("html_url"),
                     "message": f"Template '{template_name}' applied directly to {branch} branch"
                 }
             
             else:  # pull_request
                 # Create a new branch and PR
-                # 1. Get the base branch SHA
-                ref_url = f"{base_url}/repos/{owner}/{repo_name}/git/ref/heads/{branch}"
-                ref_response = await client.get(ref_url, headers=headers)
-                
-                if ref_response.status_code != 200:
-                    raise HTTPException(status_code=500, detail=f"Failed to get base branch: {ref_response.text}")
-                
-                base_sha = ref_response.json()["object"]["sha"]
-                
-                # 2. Create a new branch
-                new_branch = f"add-{workflow_filename.replace('.yml', '')}"
-                create_ref_url = f"{base_url}/repos/{owner}/{repo_name}/git/refs"
-                create_ref_data = {
-                    "ref": f"refs/heads/{new_branch}",
-                    "sha": base_sha
-                }
-                
-                create_ref_response = await client.post(create_ref_url, headers=headers, json=create_ref_data)
-                
-                # If branch already exists, try with a timestamp
-                if create_ref_response.status_code == 422:
-                    from datetime import datetime
-                    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-                    new_branch = f"add-{workflow_filename.replace('.yml', '')}-{timestamp}"
-                    create_ref_data["ref"] = f"refs/heads/{new_branch}"
-                    create_ref_response = await client.post(create_ref_url, headers=headers, json=create_ref_data)
+                # 1. Get the base branch SHA, and the workflow's SHA if the base branch already has it
+                #    (the new branch inherits the file, so updating it requires the SHA)
+                lookups = [GitHubService.get_branch_sha(client, repository, branch, headers)]
+                if needs_file_sha:
+                    lookups.append(get_file_sha(client, repository, workflow_path, headers, branch))
+                base_sha, *file_sha = await asyncio.gather(*lookups)
+                file_sha = file_sha[0] if file_sha else None
+                
+                if base_sha is None:
+                    raise HTTPException(status_code=500, detail=f"Failed to get base branch '{branch}'")
+                
+                # 2. Create a new branch (suffixed if the name is already taken)
+                new_branch, create_ref_response = await GitHubService.create_branch(
+                    client, repository, pr_branch_name, base_sha, headers
+                )
                 
                 if create_ref_response.status_code != 201:
                     raise HTTPException(status_code=500, detail=f"Failed to create branch: {create_ref_response.text}")
                 
                 # 3. Add the workflow file to the new branch
-                file_url = f"{base_url}/repos/{owner}/{repo_name}/contents/{workflow_path}"
-                
-                import base64
-                content_base64 = base64.b64encode(content_to_apply.encode()).decode()
-                
-                commit_data = {
-                    "message": f"Add {template_name} workflow",
-                    "content": content_base64,
-                    "branch": new_branch
-                }
-                
-                commit_response = await client.put(file_url, headers=headers, json=commit_data)
-                
-                if commit_response.status_code not in [200, 201]:
-                    raise HTTPException(status_code=500, detail=f"Failed to commit workflow: {commit_response.text}")
+                await upsert_workflow_file(
+                    client, repository, workflow_path, headers, new_branch, content_to_apply, commit_message,
+                    file_sha, head_sha=base_sha
+                )
                 
                 # 4. Create pull request
                 pr_url = f"{base_url}/repos/{owner}/{repo_name}/pulls"
@@ -1791,7 +1982,7 @@ async def apply_template_to_repository(request: dict, db: Session = Depends(get_
                 if pr_response.status_code != 201:
                     raise HTTPException(status_code=500, detail=f"Failed to create pull request: {pr_response.text}")
                 
-                pr_data = pr_response.json()
+                pr_data = orjson.loads(pr_response.content)
                 
                 return {
                     "success": True,
@@ -1812,10 +2003,38 @@ async def apply_template_to_repository(request: dict, db: Session = Depends(get_
 
 # ==================== Onboarding Endpoints ====================
 
+class RepositoryBranches(BaseModel):
+    """A repository to scan, optionally limited to specific branches"""
+    repository: str
+    branches: Optional[List[str]] = None
+
+class OnboardingScanRequest(BaseModel):
+    """Schema for an onboarding scan, normalized from the current and legacy request formats"""
+    repositories: List[RepositoryBranches] = []
+    search_all_branches: bool = False
+
+    @model_validator(mode='before')
+    @classmethod
+    def normalize_legacy_formats(cls, data):
+        if isinstance(data, list):
+            # Very old format - just a list of repo names
+            return {"repositories": [{"repository": repo} for repo in data]}
+        if isinstance(data, dict):
+            repositories = data.get("repositories") or []
+            if repositories and isinstance(repositories[0], dict):
+                # Per-repository branch selection replaces the search_all_branches flag
+                return {"repositories": repositories}
+            # Old format: repository names with a search_all_branches flag
+            return {
+                "repositories": [{"repository": repo} for repo in repositories],
+                "search_all_branches": data.get("search_all_branches", False)
+            }
+        return data
+
 @app.post("/api/onboarding/scan")
 async def scan_repositories_for_onboarding(
-    request: dict,
-    db: Session = Depends(get_db),
+    request: OnboardingScanRequest,
+    token: str = Depends(get_validated_token),
     templates_db: Session = Depends(get_templates_db)
 ):
     """
@@ -1843,49 +2062,18 @@ async def scan_repositories_for_onboarding(
     }
     """
     try:
-        # Handle both old format (list) and new format (dict with branches)
-        repositories_data = request.get("repositories", [])
-        
-        # Check if new format (list of objects with branches)
-        if repositories_data and isinstance(repositories_data[0], dict) and "repository" in repositories_data[0]:
-            # New format with per-repository branch selection
-            search_all_branches = False
-        elif isinstance(request, list):
-            # Very old format - just a list of repo names
-            repositories_data = [{"repository": repo, "branches": None} for repo in request]
-            search_all_branches = False
-        else:
-            # Old format with search_all_branches flag
-            repo_list = request.get("repositories", [])
-            repositories_data = [{"repository": repo, "branches": None} for repo in repo_list]
-            search_all_branches = request.get("search_all_branches", False)
-        
-        # Get GitHub token
-        token = await GitHubService.get_github_token(db)
-        if not token:
-            raise HTTPException(status_code=401, detail="GitHub token not found. Please configure GITHUB_TOKEN in secrets.")
+        # Legacy request formats are normalized by OnboardingScanRequest
+        repositories_data = [repo.model_dump() for repo in request.repositories]
+        search_all_branches = request.search_all_branches
         
-        # Get all templates with keywords
-        templates = TemplateCRUD.get_all_templates(templates_db)
-        templates_with_keywords = [t for t in templates if t.keywords]
+        # Templates with keywords and the keyword map built from them
+        keyword_to_templates, templates_with_keywords = get_keyword_templates(templates_db)
         
         if not templates_with_keywords:
             raise HTTPException(status_code=400, detail="No templates with keywords found. Please add keywords to templates first.")
         
-        # Build keyword map from templates
-        keyword_to_templates = {}
-        for template in templates_with_keywords:
-            keywords = [k.strip().lower() for k in template.keywords.split(',')]
-            for keyword in keywords:
-                if keyword not in keyword_to_templates:
-                    keyword_to_templates[keyword] = []
-                keyword_to_templates[keyword].append({
-                    "id": template.id,
-                    "name": template.name,
-                    "description": template.description
-                })
-        
         # Use optimized concurrent scanner for repositories
+        from optimized_search import optimized_search
         results = await optimized_search.search_repositories_concurrent(
             GitHubService,
             token,
@@ -1922,16 +2110,11 @@ class PolarisConversionResponse(BaseModel):
 
 
 @app.post("/api/polaris/convert", response_model=PolarisConversionResponse)
-async def convert_polaris_file(request: PolarisConversionRequest, db: Session = Depends(get_db)):
+async def convert_polaris_file(request: PolarisConversionRequest, token: str = Depends(get_validated_token)):
     """
     Convert polaris.yml to coverity.yaml
     """
     try:
-        # Get GitHub token
-        token = await GitHubService.get_github_token(db)
-        if not token:
-            raise HTTPException(status_code=401, detail="GitHub token not configured")
-        
         # Parse repository owner and name
         parts = request.repository.split('/')
         if len(parts) != 2:
@@ -1944,8 +2127,10 @@ async def convert_polaris_file(request: PolarisConversionRequest, db: Session =
         if not file_content:
             raise HTTPException(status_code=404, detail="Polaris file not found")
         
-        # Convert polaris.yml to coverity.yaml
-        coverity_yaml_content, metadata, polaris_content = convert_polaris_to_coverity(file_content)
+        # Convert polaris.yml to coverity.yaml in a worker thread; YAML parsing and dumping
+        # would otherwise block the event loop
+        from polaris_converter import convert_polaris_to_coverity
+        coverity_yaml_content, metadata, polaris_content = await run_in_threadpool(convert_polaris_to_coverity, file_content)
         
         return PolarisConversionResponse(
             success=True,
@@ -1990,16 +2175,11 @@ class ApplyToCurrentBranchResponse(BaseModel):
 
 
 @app.post("/api/polaris/apply-to-branch", response_model=ApplyToCurrentBranchResponse)
-async def apply_to_current_branch(request: ApplyToCurrentBranchRequest, db: Session = Depends(get_db)):
+async def apply_to_current_branch(request: ApplyToCurrentBranchRequest, token: str = Depends(get_validated_token)):
     """
     Apply coverity.yaml file directly to the current (default) branch of the repository
     """
     try:
-        # Get GitHub token
-        token = await GitHubService.get_github_token(db)
-        if not token:
-            raise HTTPException(status_code=401, detail="GitHub token not configured")
-        
         # Parse repository owner and name
         parts = request.repository.split('/')
         if len(parts) != 2:
@@ -2010,35 +2190,27 @@ async def apply_to_current_branch(request: ApplyToCurrentBranchRequest, db: Sess
         # Get GitHub API base URL
         base_url = GitHubService.get_base_url()
         
-        async with httpx.AsyncClient(verify=False) as client:
+        async with GitHubService.get_http_client() as client:
             headers = {
                 "Authorization": f"token {token}",
                 "Accept": "application/vnd.github.v3+json"
             }
             
-            # Get repository info to find default branch
-            repo_url = f"{base_url}/repos/{owner}/{repo_name}"
-            repo_response = await client.get(repo_url, headers=headers)
-            
-            if repo_response.status_code != 200:
-                raise HTTPException(status_code=404, detail="Repository not found")
-            
-            repo_data = repo_response.json()
-            default_branch = repo_data.get('default_branch', 'main')
-            
             # Create or update polaris.yaml file in the default branch
             file_path = "polaris.yaml"
             file_url = f"{base_url}/repos/{owner}/{repo_name}/contents/{file_path}"
             
-            # Check if file already exists
-            file_check_response = await client.get(
-                file_url,
-                headers=headers,
-                params={"ref": default_branch}
+            # Find the default branch and check if the file already exists concurrently
+            # (without a ref, the contents API reads the default branch)
+            default_branch, file_check_response = await asyncio.gather(
+                GitHubService.get_default_branch(client, request.repository, headers),
+                client.get(file_url, headers=headers)
             )
             
-            import base64
-            content_base64 = base64.b64encode(request.coverity_yaml_content.encode()).decode()
+            if default_branch is None:
+                raise HTTPException(status_code=404, detail="Repository not found")
+            
+            content_base64 = base64.b64encode(request.coverity_yaml_content.encode('utf-8')).decode('ascii')
             
             commit_data = {
                 "message": f"Migrate from {request.original_polaris_file} to polaris.yaml (CoP to Polaris)",
@@ -2048,20 +2220,20 @@ async def apply_to_current_branch(request: ApplyToCurrentBranchRequest, db: Sess
             
             # If file exists, include its SHA for update
             if file_check_response.status_code == 200:
-                existing_file = file_check_response.json()
+                existing_file = orjson.loads(file_check_response.content)
                 commit_data["sha"] = existing_file["sha"]
             
             # Create or update the file
             commit_response = await client.put(file_url, headers=headers, json=commit_data)
             
             if commit_response.status_code not in [200, 201]:
-                error_msg = commit_response.json().get('message', 'Unknown error')
+                error_msg = orjson.loads(commit_response.content).get('message', 'Unknown error')
                 raise HTTPException(
                     status_code=commit_response.status_code,
                     detail=f"Failed to commit file: {error_msg}"
                 )
             
-            result = commit_response.json()
+            result = orjson.loads(commit_response.content)
             commit_url = result.get('commit', {}).get('html_url')
             commit_sha = result.get('commit', {}).get('sha')
             
@@ -2082,16 +2254,11 @@ async def apply_to_current_branch(request: ApplyToCurrentBranchRequest, db: Sess
 
 
 @app.post("/api/polaris/create-pr", response_model=CreatePullRequestResponse)
-async def create_pull_request(request: CreatePullRequestRequest, db: Session = Depends(get_db)):
+async def create_pull_request(request: CreatePullRequestRequest, token: str = Depends(get_validated_token)):
     """
     Create a pull request to add coverity.yaml file to the repository
     """
     try:
-        # Get GitHub token
-        token = await GitHubService.get_github_token(db)
-        if not token:
-            raise HTTPException(status_code=401, detail="GitHub token not configured")
-        
         # Parse repository owner and name
         parts = request.repository.split('/')
         if len(parts) != 2:
@@ -2099,8 +2266,7 @@ async def create_pull_request(request: CreatePullRequestRequest, db: Session = D
         owner, repo_name = parts
         
         # Create a unique branch name
-        import datetime
-        timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
         branch_name = f"polaris-to-coverity-migration-{timestamp}"
         
         # Create the pull request using GitHub API
@@ -2131,10 +2297,9 @@ class RepositoryAnalysisRequest(BaseModel):
     analysis_type: str = "comprehensive"
 
 @app.post("/api/ai-analyze")
-async def analyze_repositories_with_blackduck(request: RepositoryAnalysisRequest, db: Session = Depends(get_db), templates_db: Session = Depends(get_templates_db)):
+async def analyze_repositories_with_blackduck(request: RepositoryAnalysisRequest, templates_db: Session = Depends(get_templates_db)):
     """Analyze multiple repositories' workflow files using Black Duck security tools analysis (Optimized with parallel processing)"""
     try:
-        import time
         start_time = time.time()
         
         results = {
@@ -2146,30 +2311,16 @@ async def analyze_repositories_with_blackduck(request: RepositoryAnalysisRequest
         }
         
         # Get GitHub token from secrets
-        github_token = None
-        try:
-            secret = SecretCRUD.get_secret_by_name(db, "GITHUB_TOKEN")
-            if secret:
-                github_token = decrypt_secret(secret.encrypted_value)
-        except Exception as e:
-            print(f"Warning: Could not get GitHub token: {e}")
+        github_token = await get_github_token_cached()
         
         if not github_token:
             raise HTTPException(status_code=400, detail="GITHUB_TOKEN secret not found or invalid")
         
         # Get all templates for duplicate detection (once, outside the loop)
-        all_templates = TemplateCRUD.get_all_templates(templates_db)
-        templates_for_detection = [
-            {
-                'id': t.id,
-                'name': t.name,
-                'content': t.content,
-                'template_type': t.template_type or 'workflow'
-            }
-            for t in all_templates
-        ]
+        templates_for_detection = get_detection_templates(templates_db)
         
         # Use parallel processing for repository analysis
+        from ai_analysis_parallel import analyze_repositories_parallel
         repo_results = await analyze_repositories_parallel(
             repositories=request.repositories,
             github_token=github_token,
@@ -2190,19 +2341,19 @@ async def analyze_repositories_with_blackduck(request: RepositoryAnalysisRequest
     except HTTPException:
         raise
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error analyzing repositories")
         raise HTTPException(status_code=500, detail=f"Error analyzing repositories: {str(e)}")
 
 @app.post("/api/ai-analyze-workflow")
 async def analyze_workflow_with_blackduck(request: WorkflowAnalysisRequest):
     """Analyze single workflow content using Black Duck security tools analysis"""
     try:
+        from workflow_analyzer import LocalWorkflowAnalyzer
         analyzer = LocalWorkflowAnalyzer()
         result = await analyzer.analyze_workflow(request.content, "test-workflow.yml")
         
-        # Convert the result to a dictionary for JSON serialization
-        return {
+        # Convert the result to plain JSON types and render it directly, skipping jsonable_encoder's walk
+        return ORJSONResponse({
             "file_name": result.file_name,
             "technologies": [{"name": t.name, "type": t.type.value, "confidence": t.confidence, "evidence": t.evidence} for t in result.technologies],
             "patterns": [{"name": p.name, "category": p.category.value, "confidence": p.confidence, "evidence": p.evidence} for p in result.patterns],
@@ -2237,10 +2388,9 @@ async def analyze_workflow_with_blackduck(request: WorkflowAnalysisRequest):
                 ],
                 "recommendations": result.blackduck_analysis.recommendations
             }
-        }
+        })
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error analyzing workflow")
         raise HTTPException(status_code=500, detail=f"Error analyzing workflow: {str(e)}")
 
 
@@ -2263,6 +2413,15 @@ class WorkflowEnhancementApplyRequest(BaseModel):
     assessment_type: Optional[str] = None  # SAST, SCA, or SAST,SCA
 
 
+# Polaris assessment_types for the assessment type formats the UI sends
+POLARIS_ASSESSMENT_TYPES = {
+    "SAST": "SAST",
+    "SCA": "SCA",
+    "SAST,SCA": "SAST,SCA",
+    "SAST_SCA": "SAST,SCA",
+}
+
+@lru_cache(maxsize=256)
 def fill_template_placeholders(template_content: str, assessment_type: str = None) -> str:
     """
     Fill placeholders in template content with actual values
@@ -2273,19 +2432,26 @@ def fill_template_placeholders(template_content: str, assessment_type: str = Non
     - SCA -> SCA
     - SAST_SCA or SAST,SCA -> SAST,SCA
     """
+    # Most templates have no placeholder
+    if "{assessment_types}" not in template_content:
+        return template_content
+    
     if not assessment_type:
         assessment_type = "SAST"  # Default
     
     # Normalize assessment type format
-    # Handle both "SAST_SCA" and "SAST,SCA" formats
-    if "SAST" in assessment_type.upper() and "SCA" in assessment_type.upper():
-        polaris_assessment_types = "SAST,SCA"
-    elif "SAST" in assessment_type.upper():
-        polaris_assessment_types = "SAST"
-    elif "SCA" in assessment_type.upper():
-        polaris_assessment_types = "SCA"
-    else:
-        polaris_assessment_types = assessment_type
+    normalized = assessment_type.upper()
+    polaris_assessment_types = POLARIS_ASSESSMENT_TYPES.get(normalized)
+    if polaris_assessment_types is None:
+        # Other spellings that mention the types
+        has_sast = "SAST" in normalized
+        has_sca = "SCA" in normalized
+        polaris_assessment_types = (
+            "SAST,SCA" if has_sast and has_sca
+            else "SAST" if has_sast
+            else "SCA" if has_sca
+            else assessment_type
+        )
     
     # Replace placeholders
     filled_content = template_content.replace("{assessment_types}", polaris_assessment_types)
@@ -2301,17 +2467,7 @@ async def preview_workflow_enhancement(request: WorkflowEnhancementPreviewReques
     """
     try:
         # Get GitHub token
-        github_token = None
-        try:
-            db = next(get_db())
-            try:
-                secret = SecretCRUD.get_secret_by_name(db, "GITHUB_TOKEN")
-                if secret:
-                    github_token = decrypt_secret(secret.encrypted_value)
-            finally:
-                db.close()
-        except Exception as e:
-            print(f"Warning: Could not get GitHub token: {e}")
+        github_token = await get_github_token_cached()
         
         if not github_token:
             raise HTTPException(status_code=400, detail="GITHUB_TOKEN secret not found or invalid")
@@ -2325,10 +2481,18 @@ async def preview_workflow_enhancement(request: WorkflowEnhancementPreviewReques
             'Accept': 'application/vnd.github.v3+json'
         }
         
+        # The raw media type returns the file body itself
+        raw_headers = {**headers, 'Accept': 'application/vnd.github.v3.raw'}
         workflow_url = f"{base_url}/repos/{request.repository}/contents/{request.workflow_file_path}"
         
-        async with httpx.AsyncClient(verify=False) as client:
-            response = await client.get(workflow_url, headers=headers)
+        templates_db = next(get_templates_db())
+        try:
+            async with GitHubService.get_http_client() as client:
+                # Get template from database while the workflow is fetched
+                response, template = await asyncio.gather(
+                    client.get(workflow_url, headers=raw_headers),
+                    asyncio.to_thread(TemplateCRUD.get_template_by_id, templates_db, request.template_id)
+                )
             
             if response.status_code != 200:
                 raise HTTPException(
@@ -2336,14 +2500,8 @@ async def preview_workflow_enhancement(request: WorkflowEnhancementPreviewReques
                     detail=f"Workflow file not found: {request.workflow_file_path}"
                 )
             
-            file_data = response.json()
-            original_content = client.get(file_data['download_url'], headers=headers)
-            original_workflow = (await original_content).text
-        
-        # Get template from database
-        templates_db = next(get_templates_db())
-        try:
-            template = TemplateCRUD.get_template_by_id(templates_db, request.template_id)
+            original_workflow = response.text
+            
             if not template:
                 raise HTTPException(status_code=404, detail="Template not found")
             
@@ -2354,6 +2512,7 @@ async def preview_workflow_enhancement(request: WorkflowEnhancementPreviewReques
             )
             
             # Check if this is a step fragment or job fragment
+            from workflow_parser import WorkflowParser
             parser = WorkflowParser()
             
             if template.template_type == 'step':
@@ -2367,20 +2526,14 @@ async def preview_workflow_enhancement(request: WorkflowEnhancementPreviewReques
                 
                 insert_position = request.insertion_point.get('after_step', 'after_build')
                 
-                enhanced_workflow = parser.insert_step_into_job(
+                # Insert the steps and add comments explaining the enhancement
+                enhanced_workflow_with_comments = parser.insert_step_with_comments(
                     workflow_content=original_workflow,
                     step_yaml=filled_template_content,
                     target_job=target_job,
-                    insert_position=insert_position
-                )
-                
-                # Add comments explaining the enhancement
-                enhanced_workflow_with_comments = parser.add_step_enhancement_comments(
-                    original_yaml=original_workflow,
-                    enhanced_yaml=enhanced_workflow,
+                    insert_position=insert_position,
                     enhancement_description=f"Added {template.name} steps to {target_job} job",
-                    template_name=template.name,
-                    target_job=target_job
+                    template_name=template.name
                 )
                 
                 return {
@@ -2396,21 +2549,14 @@ async def preview_workflow_enhancement(request: WorkflowEnhancementPreviewReques
                 # Job fragment - merge as new job
                 job_id = f"security-scan-{template.category}"
                 
-                # Merge job into workflow
-                enhanced_workflow = parser.merge_job_into_workflow(
+                # Merge job into workflow and add comments explaining the enhancement
+                enhanced_workflow_with_comments = parser.merge_job_with_comments(
                     workflow_content=original_workflow,
                     job_yaml=filled_template_content,
                     job_id=job_id,
-                    insert_after=request.insertion_point.get('after_job')
-                )
-                
-                # Add comments explaining the enhancement
-                enhanced_workflow_with_comments = parser.add_enhancement_comments(
-                    original_yaml=original_workflow,
-                    enhanced_yaml=enhanced_workflow,
+                    insert_after=request.insertion_point.get('after_job'),
                     enhancement_description=f"Added {job_id} job for {template.category} security scanning",
-                    template_name=template.name,
-                    insertion_type="job"
+                    template_name=template.name
                 )
                 
                 return {
@@ -2427,8 +2573,7 @@ async def preview_workflow_enhancement(request: WorkflowEnhancementPreviewReques
     except HTTPException:
         raise
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error previewing enhancement")
         raise HTTPException(status_code=500, detail=f"Error previewing enhancement: {str(e)}")
 
 
@@ -2440,17 +2585,7 @@ async def apply_workflow_enhancement(request: WorkflowEnhancementApplyRequest):
     """
     try:
         # Get GitHub token
-        github_token = None
-        try:
-            db = next(get_db())
-            try:
-                secret = SecretCRUD.get_secret_by_name(db, "GITHUB_TOKEN")
-                if secret:
-                    github_token = decrypt_secret(secret.encrypted_value)
-            finally:
-                db.close()
-        except Exception as e:
-            print(f"Warning: Could not get GitHub token: {e}")
+        github_token = await get_github_token_cached()
         
         if not github_token:
             raise HTTPException(status_code=400, detail="GITHUB_TOKEN secret not found or invalid")
@@ -2461,28 +2596,35 @@ async def apply_workflow_enhancement(request: WorkflowEnhancementApplyRequest):
             'X-GitHub-Api-Version': '2022-11-28'
         }
         
-        # Get template
-        templates_db = next(get_templates_db())
-        try:
-            template = TemplateCRUD.get_template_by_id(templates_db, request.template_id)
-            if not template:
-                raise HTTPException(status_code=404, detail="Template not found")
-        finally:
-            templates_db.close()
-        
         # Get GitHub API base URL
         base_url = GitHubService.get_base_url()
+        branch = request.branch_name or 'main'
         
-        async with httpx.AsyncClient(verify=False) as client:
-            # Determine the base branch to work from
-            repo_url = f"{base_url}/repos/{request.repository}"
-            repo_response = await client.get(repo_url, headers=headers)
-            default_branch = repo_response.json()['default_branch']
+        async with GitHubService.get_http_client() as client:
+            # Get the template while determining the base branch to work from
+            templates_db = next(get_templates_db())
+            try:
+                template, default_branch = await asyncio.gather(
+                    asyncio.to_thread(TemplateCRUD.get_template_by_id, templates_db, request.template_id),
+                    GitHubService.get_default_branch(client, request.repository, headers)
+                )
+            finally:
+                templates_db.close()
+            
+            if not template:
+                raise HTTPException(status_code=404, detail="Template not found")
+            if default_branch is None:
+                raise HTTPException(status_code=404, detail=f"Repository not found: {request.repository}")
             
-            # 1. Get current file content and SHA from the base branch
+            # 1. Get current file content and SHA from the base branch (explicitly, to ensure we have
+            #    the right SHA), together with the lookups a pull request needs
             file_url = f"{base_url}/repos/{request.repository}/contents/{request.workflow_file_path}"
-            # Explicitly get from default branch to ensure we have the right SHA
-            file_response = await client.get(f"{file_url}?ref={default_branch}", headers=headers)
+            check_branch_url = f"{base_url}/repos/{request.repository}/git/ref/heads/{branch}"
+            lookups = [client.get(file_url, headers=headers, params={"ref": default_branch})]
+            if request.method == 'pull_request':
+                lookups.append(GitHubService.get_branch_sha(client, request.repository, default_branch, headers))
+                lookups.append(client.get(check_branch_url, headers=headers))
+            file_response, *branch_lookups = await asyncio.gather(*lookups)
             
             if file_response.status_code != 200:
                 raise HTTPException(
@@ -2490,12 +2632,11 @@ async def apply_workflow_enhancement(request: WorkflowEnhancementApplyRequest):
                     detail=f"Workflow file not found: {request.workflow_file_path}"
                 )
             
-            file_data = file_response.json()
+            file_data = orjson.loads(file_response.content)
             file_sha = file_data['sha']
             
-            # Get original content
-            original_response = await client.get(file_data['download_url'], headers=headers)
-            original_content = original_response.text
+            # Get original content from the same response (the SHA is needed too)
+            original_content = await get_contents_text(client, file_data, headers)
             
             # 2. Generate enhanced workflow
             # Fill template placeholders with actual values
@@ -2504,6 +2645,7 @@ async def apply_workflow_enhancement(request: WorkflowEnhancementApplyRequest):
                 request.assessment_type
             )
             
+            from workflow_parser import WorkflowParser
             parser = WorkflowParser()
             
             # Initialize job_id as None (will be set for job templates)
@@ -2521,60 +2663,41 @@ async def apply_workflow_enhancement(request: WorkflowEnhancementApplyRequest):
                 
                 insert_position = request.insertion_point.get('after_step', 'after_build')
                 
-                enhanced_content = parser.insert_step_into_job(
+                # Insert the steps and add comments explaining the enhancement
+                enhanced_content = parser.insert_step_with_comments(
                     workflow_content=original_content,
                     step_yaml=filled_template_content,
                     target_job=target_job,
-                    insert_position=insert_position
-                )
-                
-                # Add comments explaining the enhancement
-                enhanced_content = parser.add_step_enhancement_comments(
-                    original_yaml=original_content,
-                    enhanced_yaml=enhanced_content,
+                    insert_position=insert_position,
                     enhancement_description=f"Added {template.name} steps to {target_job} job",
-                    template_name=template.name,
-                    target_job=target_job
+                    template_name=template.name
                 )
                 
                 commit_message = request.commit_message or f"Add {template.name} step to {target_job} job"
             else:
                 # Job fragment - merge as new job
                 job_id = f"security-scan-{template.category}"
-                enhanced_content = parser.merge_job_into_workflow(
+                # Merge the job and add comments explaining the enhancement
+                enhanced_content = parser.merge_job_with_comments(
                     workflow_content=original_content,
                     job_yaml=filled_template_content,
                     job_id=job_id,
-                    insert_after=request.insertion_point.get('after_job')
-                )
-                
-                # Add comments explaining the enhancement
-                enhanced_content = parser.add_enhancement_comments(
-                    original_yaml=original_content,
-                    enhanced_yaml=enhanced_content,
+                    insert_after=request.insertion_point.get('after_job'),
                     enhancement_description=f"Added {job_id} job for {template.category} security scanning",
-                    template_name=template.name,
-                    insertion_type="job"
+                    template_name=template.name
                 )
                 
                 commit_message = request.commit_message or f"Add {template.name} to workflow"
             
-            # 3. Prepare commit
-            import base64
-            encoded_content = base64.b64encode(enhanced_content.encode('utf-8')).decode('utf-8')
-            
-            branch = request.branch_name or 'main'
-            
+            # 3. Prepare the target branch
             # If method is pull_request, create a new branch first
             if request.method == 'pull_request':
-                # Get ref for default branch
-                ref_url = f"{base_url}/repos/{request.repository}/git/ref/heads/{default_branch}"
-                ref_response = await client.get(ref_url, headers=headers)
-                base_sha = ref_response.json()['object']['sha']
+                # Ref of the default branch and the existing state of the branch, fetched above
+                base_sha, check_response = branch_lookups
+                if base_sha is None:
+                    raise HTTPException(status_code=500, detail=f"Failed to get base branch '{default_branch}'")
                 
                 # Create new branch (check if it already exists first)
-                check_branch_url = f"{base_url}/repos/{request.repository}/git/ref/heads/{branch}"
-                check_response = await client.get(check_branch_url, headers=headers)
                 
                 if check_response.status_code == 404:
                     # Branch doesn't exist, create it
@@ -2595,7 +2718,6 @@ async def apply_workflow_enhancement(request: WorkflowEnhancementApplyRequest):
                     print(f"Branch created successfully: {branch}")
                     # After creating branch, re-fetch file SHA from the new branch
                     print(f"Fetching file SHA from new branch: {branch}")
-                    import asyncio
                     await asyncio.sleep(0.5)  # Small delay to ensure branch is ready
                     branch_file_response = await client.get(f"{file_url}?ref={branch}", headers=headers)
                     if branch_file_response.status_code == 200:
@@ -2611,7 +2733,6 @@ async def apply_workflow_enhancement(request: WorkflowEnhancementApplyRequest):
                     if delete_response.status_code == 204:
                         print(f"Branch deleted successfully: {branch}")
                         # Wait a moment for GitHub to process the deletion
-                        import asyncio
                         await asyncio.sleep(0.5)
                         # Now create the branch fresh
                         create_ref_url = f"{base_url}/repos/{request.repository}/git/refs"
@@ -2639,11 +2760,12 @@ async def apply_workflow_enhancement(request: WorkflowEnhancementApplyRequest):
             # The Contents API doesn't properly support updating existing files on non-default branches
             # So we use the Git Data API instead: create blob -> create tree -> create commit -> update ref
             
-            # Step 1: Create a blob with the new content
+            # Step 1: Create a blob with the new content (workflow YAML is text, so it goes
+            # as UTF-8 without a base64 round trip)
             blob_url = f"{base_url}/repos/{request.repository}/git/blobs"
             blob_payload = {
-                "content": encoded_content,
-                "encoding": "base64"
+                "content": enhanced_content,
+                "encoding": "utf-8"
             }
             blob_response = await client.post(blob_url, headers=headers, json=blob_payload)
             if blob_response.status_code not in [200, 201]:
@@ -2750,7 +2872,7 @@ async def apply_workflow_enhancement(request: WorkflowEnhancementApplyRequest):
                 pr_payload = {
                     "title": commit_message,
                     "head": branch,
-                    "base": repo_response.json()['default_branch'],
+                    "base": default_branch,
                     "body": f"This PR adds {template.name} security scanning to the workflow.\n\nTemplate: {template.name}\nCategory: {template.category}"
                 }
                 pr_response = await client.post(pr_url, headers=headers, json=pr_payload)
@@ -2772,8 +2894,8 @@ async def apply_workflow_enhancement(request: WorkflowEnhancementApplyRequest):
     except HTTPException:
         raise
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error applying enhancement")
+        raise HTTPException(status_code=500, detail=f"Error applying enhancement: {str(e)}")
 
 
 # ==================== Workflow Duplicate Detection & Removal ====================
@@ -2794,21 +2916,94 @@ class DuplicateRemovalRequest(BaseModel):
     commit_message: Optional[str] = None
 
 
+def get_duplicate_detection_templates(db: Session, template_ids: Optional[List[int]]) -> List[Template]:
+    """The requested templates in request order, or all templates when none are requested"""
+    if not template_ids:
+        return TemplateCRUD.get_all_templates(db)
+    templates_by_id = TemplateCRUD.get_templates_by_ids(db, template_ids)
+    return [templates_by_id[tid] for tid in template_ids if tid in templates_by_id]
+
+
+def find_workflow_duplicates(workflow_content: str, templates: List[Template]) -> dict:
+    """Workflow, job and step level matches of the templates in a workflow, grouped by level"""
+    from workflow_duplicate_detector import DuplicateDetector
+    detector = DuplicateDetector()
+    
+    # Detect duplicates against each template
+    workflow_duplicates = []
+    job_duplicates = []
+    step_duplicates = []
+    
+    # Parse the workflow once; parsed templates are reused across requests
+    workflow_data = detector.normalize_yaml_content(workflow_content)
+    workflow_fingerprint = detector.quick_fingerprint(workflow_data)
+    workflow_index = detector.index_structure(workflow_data)
+    
+    for template in templates:
+        # A template referencing actions the workflow doesn't use can't match it
+        if not detector.template_fingerprint(template.id, template.content) <= workflow_fingerprint:
+            continue
+        
+        try:
+            duplicates = detector.detect_duplicates_preparsed(
+                workflow_data=workflow_data,
+                template_data=detector.parse_template(template.id, template.content),
+                template_name=template.name,
+                template_id=template.id,
+                workflow_index=workflow_index,
+                template_index=detector.template_index(template.id, template.content)
+            )
+        except Exception as e:
+            print(f"Error comparing with template {template.name}: {e}")
+            continue
+        
+        # Aggregate results
+        if duplicates["is_complete_duplicate"]:
+            workflow_duplicates.append({
+                "template_id": template.id,
+                "template_name": template.name,
+                "template_category": template.category,
+                "match_percentage": duplicates["match_percentage"],
+                "can_remove_file": True,
+                "reasoning": f"Entire workflow matches template '{template.name}'"
+            })
+        
+        job_duplicates.extend({
+            "template_id": template.id,
+            "template_name": template.name,
+            "job_name": job_dup["job_name"],
+            "match_percentage": job_dup["match_percentage"],
+            "can_remove": True,
+            "reasoning": f"Job '{job_dup['job_name']}' matches template '{template.name}'"
+        } for job_dup in duplicates["duplicate_jobs"])
+        
+        step_duplicates.extend({
+            "template_id": template.id,
+            "template_name": template.name,
+            "job_name": step_dup["job_name"],
+            "step_indices": step_dup["step_indices"],
+            "step_count": len(step_dup["step_indices"]),
+            "match_percentage": step_dup["match_percentage"],
+            "can_remove": True,
+            "reasoning": f"{len(step_dup['step_indices'])} steps in job '{step_dup['job_name']}' match template '{template.name}'"
+        } for step_dup in duplicates["duplicate_steps"])
+    
+    return {
+        "workflow_duplicates": workflow_duplicates,
+        "job_duplicates": job_duplicates,
+        "step_duplicates": step_duplicates
+    }
+
+
 @app.post("/api/workflows/detect-duplicates")
-async def detect_workflow_duplicates(request: DuplicateDetectionRequest, db: Session = Depends(get_db), templates_db: Session = Depends(get_templates_db)):
+async def detect_workflow_duplicates(request: DuplicateDetectionRequest, templates_db: Session = Depends(get_templates_db)):
     """
     Detect duplicate content between a workflow file and templates.
     Returns information about exact matches at workflow, job, and step levels.
     """
     try:
         # Get GitHub token
-        github_token = None
-        try:
-            secret = SecretCRUD.get_secret_by_name(db, "GITHUB_TOKEN")
-            if secret:
-                github_token = decrypt_secret(secret.encrypted_value)
-        except Exception as e:
-            print(f"Warning: Could not get GitHub token: {e}")
+        github_token = await get_github_token_cached()
         
         if not github_token:
             raise HTTPException(status_code=400, detail="GITHUB_TOKEN secret not found or invalid")
@@ -2824,8 +3019,13 @@ async def detect_workflow_duplicates(request: DuplicateDetectionRequest, db: Ses
         
         workflow_url = f"{base_url}/repos/{request.repository}/contents/{request.workflow_file_path}"
         
-        async with httpx.AsyncClient(verify=False) as client:
-            response = await client.get(workflow_url, headers=headers)
+        async with GitHubService.get_http_client() as client:
+            # Get the templates to compare against while the workflow is fetched
+            # (the raw media type returns the file body itself)
+            response, templates = await asyncio.gather(
+                client.get(workflow_url, headers={**headers, 'Accept': 'application/vnd.github.v3.raw'}),
+                asyncio.to_thread(get_duplicate_detection_templates, templates_db, request.template_ids)
+            )
             
             if response.status_code != 200:
                 raise HTTPException(
@@ -2833,16 +3033,7 @@ async def detect_workflow_duplicates(request: DuplicateDetectionRequest, db: Ses
                     detail=f"Workflow file not found: {request.workflow_file_path}"
                 )
             
-            file_data = response.json()
-            content_response = await client.get(file_data['download_url'], headers=headers)
-            workflow_content = content_response.text
-        
-        # Get templates to compare against
-        if request.template_ids:
-            templates = [TemplateCRUD.get_template_by_id(templates_db, tid) for tid in request.template_ids]
-            templates = [t for t in templates if t is not None]
-        else:
-            templates = TemplateCRUD.get_all_templates(templates_db)
+            workflow_content = response.text
         
         if not templates:
             return {
@@ -2853,68 +3044,14 @@ async def detect_workflow_duplicates(request: DuplicateDetectionRequest, db: Ses
                 "message": "No templates available for comparison"
             }
         
-        # Initialize duplicate detector
-        detector = DuplicateDetector()
-        
-        # Detect duplicates against each template
-        all_duplicates = {
-            "workflow_duplicates": [],
-            "job_duplicates": [],
-            "step_duplicates": []
-        }
-        
-        for template in templates:
-            try:
-                duplicates = detector.detect_all_duplicates(
-                    workflow_content=workflow_content,
-                    template_content=template.content,
-                    template_name=template.name,
-                    template_id=template.id
-                )
-                
-                # Aggregate results
-                if duplicates["is_complete_duplicate"]:
-                    all_duplicates["workflow_duplicates"].append({
-                        "template_id": template.id,
-                        "template_name": template.name,
-                        "template_category": template.category,
-                        "match_percentage": duplicates["match_percentage"],
-                        "can_remove_file": True,
-                        "reasoning": f"Entire workflow matches template '{template.name}'"
-                    })
-                
-                for job_dup in duplicates["duplicate_jobs"]:
-                    all_duplicates["job_duplicates"].append({
-                        "template_id": template.id,
-                        "template_name": template.name,
-                        "job_name": job_dup["job_name"],
-                        "match_percentage": job_dup["match_percentage"],
-                        "can_remove": True,
-                        "reasoning": f"Job '{job_dup['job_name']}' matches template '{template.name}'"
-                    })
-                
-                for step_dup in duplicates["duplicate_steps"]:
-                    all_duplicates["step_duplicates"].append({
-                        "template_id": template.id,
-                        "template_name": template.name,
-                        "job_name": step_dup["job_name"],
-                        "step_indices": step_dup["step_indices"],
-                        "step_count": len(step_dup["step_indices"]),
-                        "match_percentage": step_dup["match_percentage"],
-                        "can_remove": True,
-                        "reasoning": f"{len(step_dup['step_indices'])} steps in job '{step_dup['job_name']}' match template '{template.name}'"
-                    })
-                
-            except Exception as e:
-                print(f"Error comparing with template {template.name}: {e}")
-                continue
+        # Parsing and comparing are CPU-bound, keep them off the event loop
+        all_duplicates = await run_in_threadpool(find_workflow_duplicates, workflow_content, templates)
+        workflow_duplicates = all_duplicates["workflow_duplicates"]
+        job_duplicates = all_duplicates["job_duplicates"]
+        step_duplicates = all_duplicates["step_duplicates"]
         
         # Determine overall status
-        duplicates_found = (
-            len(all_duplicates["workflow_duplicates"]) > 0 or
-            len(all_duplicates["job_duplicates"]) > 0 or
-            len(all_duplicates["step_duplicates"]) > 0
-        )
+        duplicates_found = bool(workflow_duplicates or job_duplicates or step_duplicates)
         
         return {
             "success": True,
@@ -2923,9 +3060,9 @@ async def detect_workflow_duplicates(request: DuplicateDetectionRequest, db: Ses
             "duplicates_found": duplicates_found,
             "duplicates": all_duplicates,
             "summary": {
-                "complete_workflow_matches": len(all_duplicates["workflow_duplicates"]),
-                "duplicate_jobs": len(all_duplicates["job_duplicates"]),
-                "duplicate_step_sequences": len(all_duplicates["step_duplicates"]),
+                "complete_workflow_matches": len(workflow_duplicates),
+                "duplicate_jobs": len(job_duplicates),
+                "duplicate_step_sequences": len(step_duplicates),
                 "total_templates_checked": len(templates)
             },
             "message": "Duplicate detection completed successfully"
@@ -2934,13 +3071,12 @@ async def detect_workflow_duplicates(request: DuplicateDetectionRequest, db: Ses
     except HTTPException:
         raise
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error detecting duplicates")
         raise HTTPException(status_code=500, detail=f"Error detecting duplicates: {str(e)}")
 
 
 @app.post("/api/workflows/remove-duplicates")
-async def remove_workflow_duplicates(request: DuplicateRemovalRequest, db: Session = Depends(get_db)):
+async def remove_workflow_duplicates(request: DuplicateRemovalRequest):
     """
     Remove duplicate content from a workflow file.
     Can remove entire file, specific jobs, or step sequences.
@@ -2948,13 +3084,7 @@ async def remove_workflow_duplicates(request: DuplicateRemovalRequest, db: Sessi
     """
     try:
         # Get GitHub token
-        github_token = None
-        try:
-            secret = SecretCRUD.get_secret_by_name(db, "GITHUB_TOKEN")
-            if secret:
-                github_token = decrypt_secret(secret.encrypted_value)
-        except Exception as e:
-            print(f"Warning: Could not get GitHub token: {e}")
+        github_token = await get_github_token_cached()
         
         if not github_token:
             raise HTTPException(status_code=400, detail="GITHUB_TOKEN secret not found or invalid")
@@ -2970,27 +3100,39 @@ async def remove_workflow_duplicates(request: DuplicateRemovalRequest, db: Sessi
             raise HTTPException(status_code=400, detail="Repository must be in format 'owner/repo'")
         owner, repo_name = parts
         
-        # Check if we should remove the entire file
-        remove_entire_file = any(
-            dup.get("type") == "complete_workflow" or dup.get("can_remove_file")
-            for dup in request.duplicates_to_remove
-        )
+        # Check if we should remove the entire file, and sort the partial removals: jobs first, then steps
+        remove_entire_file = False
+        jobs_to_remove = []
+        steps_to_remove = []
+        for dup in request.duplicates_to_remove:
+            dup_type = dup.get("type")
+            if dup_type == "complete_workflow" or dup.get("can_remove_file"):
+                remove_entire_file = True
+            elif dup_type == "job":
+                jobs_to_remove.append(dup)
+            elif dup_type == "steps":
+                steps_to_remove.append(dup)
         
         # Get GitHub API base URL
         base_url = GitHubService.get_base_url()
         
-        async with httpx.AsyncClient(verify=False) as client:
+        async with GitHubService.get_http_client() as client:
+            file_url = f"{base_url}/repos/{request.repository}/contents/{request.workflow_file_path}"
+            
+            # Get the file (and its SHA) together with the default branch head a pull request starts from
+            lookups = [client.get(file_url, headers=headers)]
+            if request.method == 'pull_request':
+                lookups.append(GitHubService.get_default_branch_head(client, request.repository, headers))
+            file_response, *default_branch_head = await asyncio.gather(*lookups)
+            
+            if file_response.status_code != 200:
+                raise HTTPException(status_code=404, detail="Workflow file not found")
+            
+            file_data = orjson.loads(file_response.content)
+            file_sha = file_data['sha']
+            
             if remove_entire_file:
                 # Remove the entire workflow file
-                file_url = f"{base_url}/repos/{request.repository}/contents/{request.workflow_file_path}"
-                
-                # Get file SHA
-                file_response = await client.get(file_url, headers=headers)
-                if file_response.status_code != 200:
-                    raise HTTPException(status_code=404, detail="Workflow file not found")
-                
-                file_data = file_response.json()
-                file_sha = file_data['sha']
                 
                 # Determine branch
                 branch = request.branch_name or 'main'
@@ -2999,19 +3141,13 @@ async def remove_workflow_duplicates(request: DuplicateRemovalRequest, db: Sessi
                 # If pull request method, create a new branch
                 pr_html_url = None
                 if request.method == 'pull_request':
-                    # Get default branch
-                    repo_url = f"{base_url}/repos/{request.repository}"
-                    repo_response = await client.get(repo_url, headers=headers)
-                    default_branch = repo_response.json()['default_branch']
-                    
-                    # Get base SHA
-                    ref_url = f"{base_url}/repos/{request.repository}/git/ref/heads/{default_branch}"
-                    ref_response = await client.get(ref_url, headers=headers)
-                    base_sha = ref_response.json()['object']['sha']
+                    # Default branch and its head SHA, fetched above
+                    default_branch, base_sha = default_branch_head[0]
+                    if base_sha is None:
+                        raise HTTPException(status_code=500, detail="Failed to get the default branch")
                     
                     # Create new branch
-                    import datetime
-                    timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+                    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
                     branch = request.branch_name or f"remove-duplicate-workflow-{timestamp}"
                     
                     create_ref_url = f"{base_url}/repos/{request.repository}/git/refs"
@@ -3034,7 +3170,7 @@ async def remove_workflow_duplicates(request: DuplicateRemovalRequest, db: Sessi
                     "branch": branch
                 }
                 
-                delete_response = await client.delete(file_url, headers=headers, json=delete_payload)
+                delete_response = await client.request("DELETE", file_url, headers=headers, json=delete_payload)
                 
                 if delete_response.status_code not in [200, 204]:
                     raise HTTPException(
@@ -3069,41 +3205,17 @@ async def remove_workflow_duplicates(request: DuplicateRemovalRequest, db: Sessi
             
             else:
                 # Partial removal - remove specific jobs or steps
-                file_url = f"{base_url}/repos/{request.repository}/contents/{request.workflow_file_path}"
-                file_response = await client.get(file_url, headers=headers)
-                
-                if file_response.status_code != 200:
-                    raise HTTPException(status_code=404, detail="Workflow file not found")
-                
-                file_data = file_response.json()
-                file_sha = file_data['sha']
-                
                 # Get original content
-                content_response = await client.get(file_data['download_url'], headers=headers)
-                original_content = content_response.text
+                original_content = await get_contents_text(client, file_data, headers)
                 
                 # Apply removals
+                from workflow_duplicate_detector import DuplicateDetector
                 detector = DuplicateDetector()
-                modified_content = original_content
-                
-                # Sort removals: jobs first, then steps
-                jobs_to_remove = [d for d in request.duplicates_to_remove if d.get("type") == "job"]
-                steps_to_remove = [d for d in request.duplicates_to_remove if d.get("type") == "steps"]
                 
-                # Remove jobs
-                for job_dup in jobs_to_remove:
-                    job_name = job_dup.get("job_name")
-                    if job_name:
-                        modified_content = detector.remove_job_from_workflow(modified_content, job_name)
-                
-                # Remove step sequences
-                for step_dup in steps_to_remove:
-                    job_name = step_dup.get("job_name")
-                    step_indices = step_dup.get("step_indices", [])
-                    if job_name and step_indices:
-                        modified_content = detector.remove_steps_from_job(
-                            modified_content, job_name, step_indices
-                        )
+                # Remove jobs and step sequences in one parse/dump pass
+                modified_content = detector.apply_removals(
+                    original_content, jobs_to_remove, steps_to_remove
+                )
                 
                 # Determine branch and commit message
                 branch = request.branch_name or 'main'
@@ -3112,16 +3224,12 @@ async def remove_workflow_duplicates(request: DuplicateRemovalRequest, db: Sessi
                 # If pull request method, create a new branch
                 pr_html_url = None
                 if request.method == 'pull_request':
-                    repo_url = f"{base_url}/repos/{request.repository}"
-                    repo_response = await client.get(repo_url, headers=headers)
-                    default_branch = repo_response.json()['default_branch']
-                    
-                    ref_url = f"{base_url}/repos/{request.repository}/git/ref/heads/{default_branch}"
-                    ref_response = await client.get(ref_url, headers=headers)
-                    base_sha = ref_response.json()['object']['sha']
+                    # Default branch and its head SHA, fetched above
+                    default_branch, base_sha = default_branch_head[0]
+                    if base_sha is None:
+                        raise HTTPException(status_code=500, detail="Failed to get the default branch")
                     
-                    import datetime
-                    timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+                    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
                     branch = request.branch_name or f"remove-duplicates-{timestamp}"
                     
                     create_ref_url = f"{base_url}/repos/{request.repository}/git/refs"
@@ -3138,8 +3246,7 @@ async def remove_workflow_duplicates(request: DuplicateRemovalRequest, db: Sessi
                         await client.patch(update_ref_url, headers=headers, json=update_ref_payload)
                 
                 # Update file with modified content
-                import base64
-                encoded_content = base64.b64encode(modified_content.encode('utf-8')).decode('utf-8')
+                encoded_content = base64.b64encode(modified_content.encode('utf-8')).decode('ascii')
                 
                 update_payload = {
                     "message": commit_message,
@@ -3148,7 +3255,12 @@ async def remove_workflow_duplicates(request: DuplicateRemovalRequest, db: Sessi
                     "branch": branch
                 }
                 
-                update_response = await client.put(file_url, headers=headers, json=update_payload)
+                # Serialize with orjson straight to bytes rather than httpx's json= encoding
+                update_response = await client.put(
+                    file_url,
+                    headers={**headers, "Content-Type": "application/json"},
+                    content=orjson.dumps(update_payload)
+                )
                 
                 if update_response.status_code not in [200, 201]:
                     raise HTTPException(
@@ -3186,8 +3298,7 @@ async def remove_workflow_duplicates(request: DuplicateRemovalRequest, db: Sessi
     except HTTPException:
         raise
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error removing duplicates")
         raise HTTPException(status_code=500, detail=f"Error removing duplicates: {str(e)}")
 
 
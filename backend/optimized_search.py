@@ -10,7 +10,11 @@ from dataclasses import dataclass
 from datetime import datetime, timedelta
 import hashlib
 import json
-import httpx
+
+try:
+    import ahocorasick  # Optional: single-pass keyword matching
+except ImportError:
+    ahocorasick = None
 
 @dataclass
 class SearchCache:
@@ -32,6 +36,9 @@ class OptimizedSearch:
         
         # Pre-compiled regex patterns for faster searching
         self.keyword_patterns = {}
+        
+        # Aho-Corasick automatons keyed by the keyword set they match
+        self.keyword_automatons = {}
     
     def compile_keyword_patterns(self, keywords: List[str]) -> Dict[str, re.Pattern]:
         """
@@ -49,6 +56,42 @@ class OptimizedSearch:
                 patterns[keyword] = self.keyword_patterns[keyword]
         return patterns
     
+    @staticmethod
+    def _is_word_boundary(text: str, index: int) -> bool:
+        """Same test as the regex \\b: a word character on exactly one side of the index"""
+        before = index > 0 and (text[index - 1].isalnum() or text[index - 1] == '_')
+        after = index < len(text) and (text[index].isalnum() or text[index] == '_')
+        return before != after
+    
+    def find_keywords(self, content: str, keyword_patterns: Dict[str, re.Pattern]) -> Set[str]:
+        """
+        Find which keywords occur in the content as whole words. With pyahocorasick installed all
+        keywords are matched in a single pass over the content; otherwise each keyword's
+        pre-compiled pattern is searched in turn.
+        """
+        if ahocorasick is None:
+            return {keyword for keyword, pattern in keyword_patterns.items() if pattern.search(content)}
+        
+        automaton_key = tuple(keyword_patterns)
+        automaton = self.keyword_automatons.get(automaton_key)
+        if automaton is None:
+            automaton = ahocorasick.Automaton()
+            for keyword in keyword_patterns:
+                word = keyword.lower()
+                automaton.add_word(word, (keyword, len(word)))
+            automaton.make_automaton()
+            self.keyword_automatons = {automaton_key: automaton}  # Only the current keyword set is kept
+        
+        text = content.lower()
+        keywords_found = set()
+        for end_index, (keyword, length) in automaton.iter(text):
+            if keyword in keywords_found:
+                continue
+            start_index = end_index + 1 - length
+            if self._is_word_boundary(text, start_index) and self._is_word_boundary(text, end_index + 1):
+                keywords_found.add(keyword)
+        return keywords_found
+    
     async def search_repositories_concurrent(
         self,
         github_service,
@@ -139,7 +182,7 @@ class OptimizedSearch:
             }
             root_url = f"https://api.github.com/repos/{owner}/{repo_name}/contents/"
             
-            async with httpx.AsyncClient(verify=False, timeout=30.0) as client:
+            async with github_service.get_http_client() as client:
                 root_response = await client.get(root_url, headers=headers)
                 
                 if root_response.status_code == 200:
@@ -367,20 +410,17 @@ class OptimizedSearch:
                 # Fetch content from API
                 try:
                     content = await github_service.get_file_content(
-                        token, owner, repo_name, workflow['path']
+                        token, owner, repo_name, workflow['path'], sha=workflow.get('sha')
                     )
                     
-                    # Optimized search using pre-compiled regex patterns
-                    matched_keywords = []
+                    # Match all keywords in one pass over the content
+                    keywords_found = self.find_keywords(content, keyword_patterns)
+                    matched_keywords = [keyword for keyword in keyword_patterns if keyword in keywords_found]
                     matched_templates = set()
-                    keywords_found = set()
                     
-                    for keyword, pattern in keyword_patterns.items():
-                        if pattern.search(content):
-                            matched_keywords.append(keyword)
-                            keywords_found.add(keyword)
-                            for template in keyword_to_templates[keyword]:
-                                matched_templates.add((template['id'], template['name'], template['description']))
+                    for keyword in matched_keywords:
+                        for template in keyword_to_templates[keyword]:
+                            matched_templates.add((template['id'], template['name'], template['description']))
                     
                     # Cache the result
                     self.cache[cache_key] = SearchCache(
@@ -476,21 +516,18 @@ class OptimizedSearch:
                 # Fetch content from API
                 try:
                     content = await github_service.get_file_content(
-                        token, owner, repo_name, workflow['path']
+                        token, owner, repo_name, workflow['path'], ref=branch, sha=workflow.get('sha')
                     )
                     
-                    # Optimized search using pre-compiled regex patterns
-                    matched_keywords = []
+                    # Match all keywords in one pass over the content
+                    keywords_found = self.find_keywords(content, keyword_patterns)
+                    matched_keywords = [keyword for keyword in keyword_patterns if keyword in keywords_found]
                     matched_templates = set()
-                    keywords_found = set()
                     
-                    for keyword, pattern in keyword_patterns.items():
-                        if pattern.search(content):
-                            matched_keywords.append(keyword)
-                            keywords_found.add(keyword)
-                            if keyword in keyword_to_templates:
-                                for template in keyword_to_templates[keyword]:
-                                    matched_templates.add((template['id'], template['name'], template['description']))
+                    for keyword in matched_keywords:
+                        if keyword in keyword_to_templates:
+                            for template in keyword_to_templates[keyword]:
+                                matched_templates.add((template['id'], template['name'], template['description']))
                     
                     # Cache the result
                     cache_entry = SearchCache(
@@ -279,12 +279,11 @@ def populate_template_fragments():
         
         for fragment in fragments:
             # Check if template already exists
-            existing = TemplateCRUD.search_templates(db, fragment["name"])
+            existing_template = TemplateCRUD.get_template_by_name(db, fragment["name"])
             
-            if existing:
+            if existing_template:
                 print(f"⚠️  Template '{fragment['name']}' already exists, updating...")
                 # Update the existing template
-                existing_template = existing[0]
                 existing_template.content = fragment["content"]
                 existing_template.description = fragment["description"]
                 existing_template.keywords = fragment["keywords"]
@@ -312,12 +311,11 @@ def populate_template_fragments():
         
         for workflow in workflow_templates:
             # Check if template already exists
-            existing = TemplateCRUD.search_templates(db, workflow["name"])
+            existing_template = TemplateCRUD.get_template_by_name(db, workflow["name"])
             
-            if existing:
+            if existing_template:
                 print(f"⚠️  Template '{workflow['name']}' already exists, updating...")
                 # Update the existing template
-                existing_template = existing[0]
                 existing_template.content = workflow["content"]
                 existing_template.description = workflow["description"]
                 existing_template.keywords = workflow["keywords"]
@@ -1,8 +1,9 @@
+from sqlalchemy import delete
 from sqlalchemy.orm import Session
 from database import Secret
 from crypto import encrypt_secret, decrypt_secret
 from datetime import datetime
-from typing import List, Optional
+from typing import Iterable, List, Optional
 
 class SecretCRUD:
     """CRUD operations for secrets"""
@@ -83,6 +84,21 @@ class SecretCRUD:
         db.commit()
         return True
     
+    @staticmethod
+    def delete_secret_if_not_protected(db: Session, secret_id: int, protected_names: Iterable[str]) -> Optional[str]:
+        """
+        Delete a secret unless its name is protected, in a single statement.
+        Returns the deleted secret's name, or None if the secret was not found or is protected.
+        """
+        result = db.execute(
+            delete(Secret)
+            .where(Secret.id == secret_id, Secret.name.notin_(protected_names))
+            .returning(Secret.name)
+        )
+        deleted_name = result.scalar_one_or_none()
+        db.commit()
+        return deleted_name
+    
     @staticmethod
     def decrypt_secret_value(secret: Secret) -> str:
         """Decrypt the value of a secret"""
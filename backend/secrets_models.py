@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional
 from datetime import datetime
 
@@ -19,12 +19,11 @@ class SecretUpdate(BaseModel):
 
 class SecretResponse(SecretBase):
     """Model for secret response (without the actual secret value)"""
+    model_config = ConfigDict(from_attributes=True)
+    
     id: int
     created_at: datetime
     updated_at: datetime
-    
-    class Config:
-        from_attributes = True
 
 class SecretWithValue(SecretResponse):
     """Model for secret response with decrypted value"""
@@ -1,15 +1,25 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, func, insert
+from sqlalchemy.orm import Session, load_only
 from sqlalchemy.exc import IntegrityError
-from templates_models import Template
-from typing import List, Optional
+from templates_models import Template, normalize_keywords
+from typing import Dict, List, Optional
 
 class TemplateCRUD:
     """CRUD operations for templates"""
 
+    # Bumped after every committed write so derived in-process caches know when to rebuild
+    version = 0
+
+    @staticmethod
+    def bump_version():
+        """Invalidate derived template caches; call after committing writes made with commit=False"""
+        TemplateCRUD.version += 1
+
     @staticmethod
     def create_template(db: Session, name: str, content: str, description: str = None, keywords: str = None, 
-                       template_type: str = 'workflow', category: str = None, meta_data: dict = None) -> Template:
-        """Create a new template"""
+                       template_type: str = 'workflow', category: str = None, meta_data: dict = None,
+                       commit: bool = True) -> Template:
+        """Create a new template (pass commit=False to leave committing to the caller)"""
         try:
             template = Template(
                 name=name,
@@ -21,27 +31,81 @@ class TemplateCRUD:
                 meta_data=meta_data
             )
             db.add(template)
-            db.commit()
-            db.refresh(template)
+            if commit:
+                db.commit()
+                TemplateCRUD.bump_version()
+                db.refresh(template)
+            else:
+                db.flush()
             return template
         except IntegrityError:
             db.rollback()
             raise ValueError(f"Template with name '{name}' already exists")
 
+    @staticmethod
+    def create_templates_bulk(db: Session, rows: List[Dict], commit: bool = True) -> int:
+        """Create many templates with a single batched INSERT statement"""
+        if not rows:
+            return 0
+        # Bulk INSERTs bypass the model's keywords validator, so normalize keywords here
+        rows = [{**row, 'keywords_normalized': normalize_keywords(row.get('keywords'))} for row in rows]
+        try:
+            db.execute(insert(Template), rows)
+            if commit:
+                db.commit()
+                TemplateCRUD.bump_version()
+            return len(rows)
+        except IntegrityError:
+            db.rollback()
+            raise ValueError("One or more templates already exist")
+
     @staticmethod
     def get_template_by_id(db: Session, template_id: int) -> Optional[Template]:
         """Get a template by ID"""
         return db.query(Template).filter(Template.id == template_id).first()
 
+    @staticmethod
+    def get_templates_by_ids(db: Session, template_ids: List[int]) -> Dict[int, Template]:
+        """Get the templates with the given IDs in one query, keyed by ID"""
+        if not template_ids:
+            return {}
+        templates = db.query(Template).filter(Template.id.in_(set(template_ids))).all()
+        return {template.id: template for template in templates}
+
     @staticmethod
     def get_template_by_name(db: Session, name: str) -> Optional[Template]:
         """Get a template by name"""
         return db.query(Template).filter(Template.name == name).first()
 
     @staticmethod
-    def get_all_templates(db: Session) -> List[Template]:
-        """Get all templates"""
-        return db.query(Template).order_by(Template.name).all()
+    def get_all_templates(db: Session, columns: Optional[tuple] = None) -> List[Template]:
+        """Get all templates, optionally loading only the given columns"""
+        query = db.query(Template)
+        if columns:
+            query = query.options(load_only(*columns))
+        return query.order_by(Template.name).all()
+
+    @staticmethod
+    def count_templates(db: Session) -> int:
+        """Count templates without loading them"""
+        return db.query(func.count(Template.id)).scalar()
+
+    @staticmethod
+    def has_invalid_meta_data(db: Session) -> bool:
+        """Check whether any template has meta_data stored as a JSON string instead of an object"""
+        for (meta_data,) in db.query(Template.meta_data).yield_per(100):
+            if isinstance(meta_data, str):
+                return True
+        return False
+
+    @staticmethod
+    def delete_all_templates(db: Session, commit: bool = True) -> int:
+        """Delete all templates with a single statement"""
+        result = db.execute(delete(Template))
+        if commit:
+            db.commit()
+            TemplateCRUD.bump_version()
+        return result.rowcount
 
     @staticmethod
     def update_template(db: Session, template_id: int, name: str = None, content: str = None, description: str = None, 
@@ -68,6 +132,7 @@ class TemplateCRUD:
                 template.meta_data = meta_data
 
             db.commit()
+            TemplateCRUD.bump_version()
             db.refresh(template)
             return template
         except IntegrityError:
@@ -83,6 +148,7 @@ class TemplateCRUD:
 
         db.delete(template)
         db.commit()
+        TemplateCRUD.bump_version()
         return True
 
     @staticmethod
@@ -1,7 +1,14 @@
 from sqlalchemy import Column, Integer, String, Text, DateTime, JSON
+from sqlalchemy.orm import validates
 from sqlalchemy.sql import func
 from database import TemplatesBase
 
+def normalize_keywords(keywords):
+    """Split comma-separated keywords into a list of stripped, lowercased keywords"""
+    if not keywords:
+        return []
+    return [keyword.strip().lower() for keyword in keywords.split(',')]
+
 class Template(TemplatesBase):
     """Template model for storing reusable text templates"""
     __tablename__ = "templates"
@@ -11,6 +18,7 @@ class Template(TemplatesBase):
     description = Column(Text, nullable=True)
     content = Column(Text, nullable=False)
     keywords = Column(Text, nullable=True)  # Comma-separated keywords
+    keywords_normalized = Column(JSON, nullable=True)  # Stripped, lowercased keywords list, kept in sync with keywords
     
     # New fields for workflow enhancement feature
     template_type = Column(String(50), nullable=True, default='workflow')  # 'workflow', 'job', 'step'
@@ -20,5 +28,10 @@ class Template(TemplatesBase):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
+    @validates('keywords')
+    def _sync_keywords_normalized(self, key, keywords):
+        self.keywords_normalized = normalize_keywords(keywords)
+        return keywords
+
     def __repr__(self):
         return f"<Template(id={self.id}, name='{self.name}', type='{self.template_type}')>"
@@ -2,6 +2,8 @@ import httpx
 import asyncio
 import os
 
+from github_service import GitHubService
+
 async def test():
     token = os.getenv('GITHUB_TOKEN')
     headers = {
@@ -10,7 +12,7 @@ async def test():
         'X-GitHub-Api-Version': '2022-11-28'
     }
     
-    async with httpx.AsyncClient(verify=False) as client:
+    async with httpx.AsyncClient(verify=GitHubService._get_ssl_verify()) as client:
         # Test 1: Can we GET the base tree?
         print("Test 1: Getting base tree...")
         r = await client.get(
@@ -333,6 +333,10 @@ class LocalWorkflowAnalyzer:
 
     async def analyze_workflow(self, workflow_content: str, file_name: str = "workflow.yml") -> WorkflowAnalysis:
         """Analyze a workflow file and return detailed analysis"""
+        return self.analyze_workflow_sync(workflow_content, file_name)
+
+    def analyze_workflow_sync(self, workflow_content: str, file_name: str = "workflow.yml") -> WorkflowAnalysis:
+        """Synchronous body of analyze_workflow, for callers running it in a worker thread"""
         
         # Convert to lowercase for pattern matching
         content_lower = workflow_content.lower()
@@ -527,6 +531,10 @@ class LocalWorkflowAnalyzer:
 
     async def find_template_matches(self, workflow_analysis: WorkflowAnalysis, available_templates: List[Dict]) -> List[TemplateMatch]:
         """Find matching templates for the analyzed workflow"""
+        return self.find_template_matches_sync(workflow_analysis, available_templates)
+
+    def find_template_matches_sync(self, workflow_analysis: WorkflowAnalysis, available_templates: List[Dict]) -> List[TemplateMatch]:
+        """Synchronous body of find_template_matches, for callers running it in a worker thread"""
         matches = []
         
         for template in available_templates:
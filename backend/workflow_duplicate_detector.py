@@ -3,10 +3,18 @@ Workflow Duplicate Detection Module
 Detects exact matches between workflow files and templates for removal recommendations
 """
 
+import hashlib
+import orjson
 import yaml
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, FrozenSet, List, Any, Optional, Tuple
 from workflow_parser import WorkflowParser, WorkflowYAMLLoader, WorkflowYAMLDumper
 
+# Parsed template content with its fingerprint and structure index by template id, and the content
+# they were computed from
+_template_tree_cache: Dict[int, Tuple[str, Any, FrozenSet[str], Dict[str, Any]]] = {}
+
+CANONICAL_JSON_OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+
 
 class DuplicateDetector:
     """Detects duplicate content between workflows and templates"""
@@ -26,6 +34,88 @@ class DuplicateDetector:
             print(f"Error normalizing YAML: {e}")
             return {}
     
+    def parse_template(self, template_id: Optional[int], template_content: str) -> Any:
+        """
+        Parse template content, reusing the parsed tree while the template's content is unchanged
+        The trees are shared between callers and must not be modified
+        """
+        return self._cached_template(template_id, template_content)[1]
+    
+    def template_fingerprint(self, template_id: Optional[int], template_content: str) -> FrozenSet[str]:
+        """quick_fingerprint of a template, cached with its parsed tree"""
+        return self._cached_template(template_id, template_content)[2]
+    
+    def template_index(self, template_id: Optional[int], template_content: str) -> Dict[str, Any]:
+        """index_structure of a template, cached with its parsed tree"""
+        return self._cached_template(template_id, template_content)[3]
+    
+    def _cached_template(self, template_id: Optional[int], template_content: str) -> Tuple[str, Any, FrozenSet[str], Dict[str, Any]]:
+        cached = _template_tree_cache.get(template_id) if template_id is not None else None
+        if cached is not None and cached[0] == template_content:
+            return cached
+        
+        template_data = self.normalize_yaml_content(template_content)
+        cached = (
+            template_content, template_data,
+            self.quick_fingerprint(template_data), self.index_structure(template_data)
+        )
+        if template_id is not None:
+            _template_tree_cache[template_id] = cached
+        return cached
+    
+    def quick_fingerprint(self, data: Any) -> FrozenSet[str]:
+        """
+        The 'uses' references (actions and reusable workflows) anywhere in parsed YAML
+        
+        An exact match of a template contains all of the template's references, so a template
+        whose fingerprint is not a subset of the workflow's can be skipped without comparing.
+        """
+        found = set()
+        pending = [data]
+        while pending:
+            node = pending.pop()
+            if isinstance(node, dict):
+                uses = node.get('uses')
+                if isinstance(uses, str):
+                    found.add(uses)
+                pending.extend(node.values())
+            elif isinstance(node, list):
+                pending.extend(node)
+        return frozenset(found)
+    
+    def structure_hash(self, data: Any) -> Optional[bytes]:
+        """
+        Hash of parsed YAML's canonical JSON (sorted keys). Structures compare_yaml_structures treats
+        as equal always hash equal, so differing hashes rule a match out; equal hashes still need the
+        structural comparison. None if the data can't be serialized (e.g. binary or set values).
+        """
+        try:
+            canonical = orjson.dumps(data, option=CANONICAL_JSON_OPTIONS)
+        except TypeError:
+            return None
+        return hashlib.blake2b(canonical, digest_size=16).digest()
+    
+    def index_structure(self, data: Any) -> Dict[str, Any]:
+        """
+        Structure hashes of parsed YAML: the whole document, each item of a list (template steps),
+        and for a workflow each job and each job's steps
+        """
+        index = {'hash': self.structure_hash(data)}
+        if isinstance(data, list):
+            index['items'] = [self.structure_hash(item) for item in data]
+        elif isinstance(data, dict) and isinstance(data.get('jobs'), dict):
+            index['jobs'] = {}
+            index['steps'] = {}
+            for job_name, job_content in data['jobs'].items():
+                index['jobs'][job_name] = self.structure_hash(job_content)
+                if isinstance(job_content, dict) and isinstance(job_content.get('steps'), list):
+                    index['steps'][job_name] = [self.structure_hash(step) for step in job_content['steps']]
+        return index
+    
+    @staticmethod
+    def _hashes_differ(hash1: Optional[bytes], hash2: Optional[bytes]) -> bool:
+        return hash1 is not None and hash2 is not None and hash1 != hash2
+    
     def compare_yaml_structures(self, struct1: Dict[str, Any], struct2: Dict[str, Any]) -> bool:
         """
         Deep comparison of two YAML structures
@@ -65,37 +155,61 @@ class DuplicateDetector:
         
         Returns list of duplicate job matches with removal recommendations
         """
-        duplicates = []
-        
         try:
             # Parse workflow and template
             workflow_data = self.normalize_yaml_content(workflow_content)
             template_data = self.normalize_yaml_content(template_content)
-            
-            if not workflow_data or not template_data:
-                return duplicates
-            
-            workflow_jobs = workflow_data.get('jobs', {})
-            
-            # Template should be a single job definition
-            if not isinstance(template_data, dict):
-                return duplicates
-            
-            # Compare each workflow job with the template
-            for job_name, job_content in workflow_jobs.items():
-                if self.compare_yaml_structures(job_content, template_data):
-                    duplicates.append({
-                        'type': 'job',
-                        'job_name': job_name,
-                        'template_id': template_id,
-                        'template_name': template_name,
-                        'match_type': 'exact',
-                        'recommendation': f"Remove job '{job_name}' - exact duplicate of template '{template_name}'"
-                    })
+            return self.find_job_duplicates(workflow_data, template_data, template_name, template_id)
         
         except Exception as e:
             print(f"Error detecting job duplicates: {e}")
         
+        return []
+    
+    def find_job_duplicates(
+        self,
+        workflow_data: Any,
+        template_data: Any,
+        template_name: str,
+        template_id: int,
+        workflow_index: Optional[Dict[str, Any]] = None,
+        template_index: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Find workflow jobs that exactly match the template job, in already-parsed YAML
+        With the index_structure of both, only jobs whose hash matches are compared.
+        """
+        duplicates = []
+        
+        if not isinstance(workflow_data, dict) or not template_data:
+            return duplicates
+        
+        workflow_jobs = workflow_data.get('jobs') or {}
+        if not isinstance(workflow_jobs, dict):
+            return duplicates
+        
+        # Template should be a single job definition
+        if not isinstance(template_data, dict):
+            return duplicates
+        
+        job_hashes = workflow_index.get('jobs', {}) if workflow_index and template_index else {}
+        template_hash = template_index['hash'] if template_index else None
+        
+        # Compare each workflow job with the template
+        for job_name, job_content in workflow_jobs.items():
+            if self._hashes_differ(job_hashes.get(job_name), template_hash):
+                continue
+            if self.compare_yaml_structures(job_content, template_data):
+                duplicates.append({
+                    'type': 'job',
+                    'job_name': job_name,
+                    'template_id': template_id,
+                    'template_name': template_name,
+                    'match_type': 'exact',
+                    'match_percentage': 100,
+                    'recommendation': f"Remove job '{job_name}' - exact duplicate of template '{template_name}'"
+                })
+        
         return duplicates
     
     def detect_step_duplicates(
@@ -110,48 +224,80 @@ class DuplicateDetector:
         
         Returns list of duplicate step matches with removal recommendations
         """
-        duplicates = []
-        
         try:
             # Parse workflow and template
             workflow_data = self.normalize_yaml_content(workflow_content)
             template_data = self.normalize_yaml_content(template_content)
+            return self.find_step_duplicates(workflow_data, template_data, template_name, template_id)
+        
+        except Exception as e:
+            print(f"Error detecting step duplicates: {e}")
+        
+        return []
+    
+    def find_step_duplicates(
+        self,
+        workflow_data: Any,
+        template_data: Any,
+        template_name: str,
+        template_id: int,
+        workflow_index: Optional[Dict[str, Any]] = None,
+        template_index: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Find consecutive job steps that exactly match the template steps, in already-parsed YAML
+        With the index_structure of both, only step sequences whose hashes match are compared.
+        """
+        duplicates = []
+        
+        if not isinstance(workflow_data, dict) or not template_data:
+            return duplicates
+        
+        workflow_jobs = workflow_data.get('jobs') or {}
+        if not isinstance(workflow_jobs, dict):
+            return duplicates
+        
+        # Template should be a list of steps
+        if not isinstance(template_data, list):
+            return duplicates
+        
+        step_hashes = workflow_index.get('steps', {}) if workflow_index and template_index else {}
+        template_step_hashes = template_index.get('items') if template_index else None
+        
+        # Compare steps in each job
+        for job_name, job_content in workflow_jobs.items():
+            if not isinstance(job_content, dict):
+                continue
+            job_steps = job_content.get('steps', [])
             
-            if not workflow_data or not template_data:
-                return duplicates
-            
-            workflow_jobs = workflow_data.get('jobs', {})
+            if not isinstance(job_steps, list):
+                continue
             
-            # Template should be a list of steps
-            if not isinstance(template_data, list):
-                return duplicates
+            job_step_hashes = step_hashes.get(job_name)
             
-            # Compare steps in each job
-            for job_name, job_content in workflow_jobs.items():
-                job_steps = job_content.get('steps', [])
-                
-                if not isinstance(job_steps, list):
+            # Check if template steps exist consecutively in job steps
+            template_len = len(template_data)
+            for i in range(len(job_steps) - template_len + 1):
+                if job_step_hashes is not None and template_step_hashes is not None and any(
+                    self._hashes_differ(step_hash, template_step_hash)
+                    for step_hash, template_step_hash in zip(job_step_hashes[i:i + template_len], template_step_hashes)
+                ):
                     continue
                 
-                # Check if template steps exist consecutively in job steps
-                template_len = len(template_data)
-                for i in range(len(job_steps) - template_len + 1):
-                    consecutive_steps = job_steps[i:i + template_len]
-                    
-                    if self.compare_yaml_structures(consecutive_steps, template_data):
-                        duplicates.append({
-                            'type': 'steps',
-                            'job_name': job_name,
-                            'step_indices': list(range(i, i + template_len)),
-                            'step_count': template_len,
-                            'template_id': template_id,
-                            'template_name': template_name,
-                            'match_type': 'exact',
-                            'recommendation': f"Remove {template_len} step(s) from job '{job_name}' (indices {i}-{i+template_len-1}) - exact duplicate of template '{template_name}'"
-                        })
-        
-        except Exception as e:
-            print(f"Error detecting step duplicates: {e}")
+                consecutive_steps = job_steps[i:i + template_len]
+                
+                if self.compare_yaml_structures(consecutive_steps, template_data):
+                    duplicates.append({
+                        'type': 'steps',
+                        'job_name': job_name,
+                        'step_indices': list(range(i, i + template_len)),
+                        'step_count': template_len,
+                        'template_id': template_id,
+                        'template_name': template_name,
+                        'match_type': 'exact',
+                        'match_percentage': 100,
+                        'recommendation': f"Remove {template_len} step(s) from job '{job_name}' (indices {i}-{i+template_len-1}) - exact duplicate of template '{template_name}'"
+                    })
         
         return duplicates
     
@@ -171,25 +317,66 @@ class DuplicateDetector:
             # Parse both
             workflow_data = self.normalize_yaml_content(workflow_content)
             template_data = self.normalize_yaml_content(template_content)
-            
-            if not workflow_data or not template_data:
-                return None
-            
-            # Compare entire structures
-            if self.compare_yaml_structures(workflow_data, template_data):
-                return {
-                    'type': 'complete_workflow',
-                    'template_id': template_id,
-                    'template_name': template_name,
-                    'match_type': 'exact',
-                    'recommendation': f"Remove entire workflow file - exact duplicate of template '{template_name}'"
-                }
+            return self.find_workflow_duplicate(workflow_data, template_data, template_name, template_id)
         
         except Exception as e:
             print(f"Error detecting workflow duplicate: {e}")
         
         return None
     
+    def find_workflow_duplicate(
+        self,
+        workflow_data: Any,
+        template_data: Any,
+        template_name: str,
+        template_id: int,
+        workflow_index: Optional[Dict[str, Any]] = None,
+        template_index: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Check whether the entire workflow matches the template, in already-parsed YAML"""
+        if not workflow_data or not template_data:
+            return None
+        
+        if workflow_index and template_index and self._hashes_differ(workflow_index['hash'], template_index['hash']):
+            return None
+        
+        # Compare entire structures
+        if self.compare_yaml_structures(workflow_data, template_data):
+            return {
+                'type': 'complete_workflow',
+                'template_id': template_id,
+                'template_name': template_name,
+                'match_type': 'exact',
+                'match_percentage': 100,
+                'recommendation': f"Remove entire workflow file - exact duplicate of template '{template_name}'"
+            }
+        
+        return None
+    
+    def detect_duplicates_preparsed(
+        self,
+        workflow_data: Any,
+        template_data: Any,
+        template_name: str,
+        template_id: int,
+        workflow_index: Optional[Dict[str, Any]] = None,
+        template_index: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Detect workflow, job and step duplicates of one template in an already-parsed workflow
+        
+        Parse the workflow once with normalize_yaml_content and the template with parse_template;
+        their index_structure (template_index for templates) lets most comparisons be skipped.
+        """
+        indexes = (workflow_index, template_index)
+        workflow_dup = self.find_workflow_duplicate(workflow_data, template_data, template_name, template_id, *indexes)
+        return {
+            'is_complete_duplicate': workflow_dup is not None,
+            'match_percentage': 100 if workflow_dup else 0,
+            'duplicate_jobs': self.find_job_duplicates(workflow_data, template_data, template_name, template_id, *indexes),
+            'duplicate_steps': self.find_step_duplicates(workflow_data, template_data, template_name, template_id, *indexes)
+        }
+    
     def detect_all_duplicates(
         self,
         workflow_content: str,
@@ -215,6 +402,11 @@ class DuplicateDetector:
             'step_duplicates': []
         }
         
+        # Parse the workflow once for all templates
+        workflow_data = self.normalize_yaml_content(workflow_content)
+        workflow_fingerprint = self.quick_fingerprint(workflow_data)
+        workflow_index = self.index_structure(workflow_data)
+        
         for template in templates:
             template_id = template.get('id')
             template_name = template.get('name')
@@ -224,13 +416,22 @@ class DuplicateDetector:
             if not template_content:
                 continue
             
+            # Skip templates that reference actions the workflow doesn't use
+            if not self.template_fingerprint(template_id, template_content) <= workflow_fingerprint:
+                continue
+            
+            template_data = self.parse_template(template_id, template_content)
+            template_index = self.template_index(template_id, template_content)
+            
             # Check for complete workflow duplicate
             if template_type == 'workflow':
-                workflow_dup = self.detect_workflow_duplicate(
-                    workflow_content,
-                    template_content,
+                workflow_dup = self.find_workflow_duplicate(
+                    workflow_data,
+                    template_data,
                     template_name,
-                    template_id
+                    template_id,
+                    workflow_index,
+                    template_index
                 )
                 if workflow_dup:
                     results['complete_workflow_duplicate'] = workflow_dup
@@ -240,11 +441,13 @@ class DuplicateDetector:
             
             # Check for job duplicates
             elif template_type == 'job':
-                job_dups = self.detect_job_duplicates(
-                    workflow_content,
-                    template_content,
+                job_dups = self.find_job_duplicates(
+                    workflow_data,
+                    template_data,
                     template_name,
-                    template_id
+                    template_id,
+                    workflow_index,
+                    template_index
                 )
                 if job_dups:
                     results['job_duplicates'].extend(job_dups)
@@ -252,11 +455,13 @@ class DuplicateDetector:
             
             # Check for step duplicates
             elif template_type == 'step':
-                step_dups = self.detect_step_duplicates(
-                    workflow_content,
-                    template_content,
+                step_dups = self.find_step_duplicates(
+                    workflow_data,
+                    template_data,
                     template_name,
-                    template_id
+                    template_id,
+                    workflow_index,
+                    template_index
                 )
                 if step_dups:
                     results['step_duplicates'].extend(step_dups)
@@ -347,4 +552,70 @@ class DuplicateDetector:
         
         except Exception as e:
             print(f"Error removing steps from job: {e}")
-            return workflow_content
\ No newline at end of file
+            return workflow_content
+    
+    def apply_removals(
+        self,
+        workflow_content: str,
+        jobs_to_remove: List[Dict[str, Any]],
+        steps_to_remove: List[Dict[str, Any]]
+    ) -> str:
+        """
+        Remove several jobs and step sequences with a single parse and dump
+        
+        Removals are applied in the same order as repeated calls to
+        remove_job_from_workflow and remove_steps_from_job would apply them.
+        
+        Args:
+            workflow_content: Original workflow YAML content
+            jobs_to_remove: Job duplicates, each with a 'job_name'
+            steps_to_remove: Step duplicates, each with 'job_name' and 'step_indices'
+        
+        Returns:
+            Modified workflow content with all removals applied
+        """
+        try:
+            workflow_data = yaml.load(workflow_content, Loader=WorkflowYAMLLoader)
+            jobs = workflow_data.get('jobs') if isinstance(workflow_data, dict) else None
+            if not isinstance(jobs, dict):
+                return workflow_content
+            
+            modified = False
+            
+            for job_dup in jobs_to_remove:
+                job_name = job_dup.get("job_name")
+                if job_name and job_name in jobs:
+                    del jobs[job_name]
+                    modified = True
+            
+            for step_dup in steps_to_remove:
+                job_name = step_dup.get("job_name")
+                step_indices = step_dup.get("step_indices", [])
+                if not job_name or not step_indices or job_name not in jobs:
+                    continue
+                
+                steps = jobs[job_name].get('steps') if isinstance(jobs[job_name], dict) else None
+                if not isinstance(steps, list):
+                    continue
+                
+                # Remove steps in reverse order to maintain indices
+                for index in sorted(step_indices, reverse=True):
+                    if 0 <= index < len(steps):
+                        del steps[index]
+                        modified = True
+            
+            if not modified:
+                return workflow_content
+            
+            # Convert back to YAML once
+            return yaml.dump(
+                workflow_data,
+                Dumper=WorkflowYAMLDumper,
+                default_flow_style=False,
+                sort_keys=False,
+                allow_unicode=True
+            )
+        
+        except Exception as e:
+            print(f"Error removing duplicates from workflow: {e}")
+            return workflow_content
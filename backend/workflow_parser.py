@@ -4,13 +4,19 @@ Handles parsing, analyzing, and modifying workflow YAML structure
 """
 
 import yaml
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass
+from datetime import datetime
 import re
 
 
+# libyaml-backed safe loader when PyYAML was built with it (much faster), pure Python otherwise
+SafeLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+if SafeLoader is yaml.SafeLoader:
+    print("Warning: PyYAML was built without libyaml, workflow YAML parsing falls back to the slower pure Python loader")
+
 # Custom YAML loader to preserve 'on' as a string key (not convert to True)
-class WorkflowYAMLLoader(yaml.SafeLoader):
+class WorkflowYAMLLoader(SafeLoader):
     pass
 
 # Remove 'on', 'off', 'yes', 'no' from boolean resolution
@@ -22,7 +28,12 @@ for ch in "OoYyNn":
         ]
 
 
+# Template placeholders in both ${PLACEHOLDER} and $PLACEHOLDER formats
+PLACEHOLDER_PATTERN = re.compile(r'\$\{(\w+)\}|\$(\w+)')
+
+
 # Custom YAML dumper to handle 'on' key properly (don't convert to 'true')
+# Stays on the pure Python SafeDumper: libyaml's emitter ignores the increase_indent override
 class WorkflowYAMLDumper(yaml.SafeDumper):
     def write_line_break(self, data=None):
         super().write_line_break(data)
@@ -117,7 +128,7 @@ class WorkflowParser:
     def parse_workflow(self, content: str) -> WorkflowStructure:
         """Parse workflow YAML content into structured format"""
         try:
-            workflow_dict = yaml.safe_load(content)
+            workflow_dict = yaml.load(content, Loader=SafeLoader)
         except yaml.YAMLError as e:
             raise ValueError(f"Invalid YAML: {e}")
         
@@ -460,14 +471,14 @@ class WorkflowParser:
             YAML string of the job
         """
         content = template.get('content', '')
+        if not placeholders:
+            return content
         
-        # Substitute placeholders
-        for placeholder, value in placeholders.items():
-            # Handle both ${PLACEHOLDER} and $PLACEHOLDER formats
-            content = content.replace(f'${{{placeholder}}}', value)
-            content = content.replace(f'${placeholder}', value)
-        
-        return content
+        # Substitute all placeholders in one pass, leaving unknown names as they are
+        return PLACEHOLDER_PATTERN.sub(
+            lambda match: placeholders.get(match.group(1) or match.group(2), match.group(0)),
+            content
+        )
     
     def merge_job_into_workflow(
         self,
@@ -488,6 +499,60 @@ class WorkflowParser:
         Returns:
             Modified workflow YAML content
         """
+        workflow_dict, _ = self._merge_job(workflow_content, job_yaml, job_id, insert_after)
+        
+        # Convert back to YAML with nice formatting
+        # Use custom dumper to preserve 'on' key (don't convert to 'true')
+        return yaml.dump(
+            workflow_dict, 
+            Dumper=WorkflowYAMLDumper,
+            default_flow_style=False, 
+            sort_keys=False, 
+            width=999999,
+            allow_unicode=True,
+            indent=2
+        )
+    
+    def merge_job_with_comments(
+        self,
+        workflow_content: str,
+        job_yaml: str,
+        job_id: str,
+        insert_after: Optional[str],
+        enhancement_description: str,
+        template_name: str
+    ) -> str:
+        """
+        Merge a new job into an existing workflow and add the enhancement comments in one pass
+        
+        Same result as merge_job_into_workflow followed by add_enhancement_comments, with the
+        added job known from the merge instead of searched for in the original text per job line.
+        """
+        workflow_dict, job_is_new = self._merge_job(workflow_content, job_yaml, job_id, insert_after)
+        
+        enhanced_yaml = yaml.dump(
+            workflow_dict,
+            Dumper=WorkflowYAMLDumper,
+            default_flow_style=False,
+            sort_keys=False,
+            width=999999,
+            allow_unicode=True,
+            indent=2
+        )
+        
+        return self._annotate_added_job(
+            workflow_content, enhanced_yaml, enhancement_description, template_name,
+            lambda job_name: job_is_new and job_name == job_id
+        )
+    
+    def _merge_job(
+        self,
+        workflow_content: str,
+        job_yaml: str,
+        job_id: str,
+        insert_after: Optional[str]
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Merge the job into the parsed workflow; returns it and whether the job ID is new"""
         # Parse existing workflow with custom loader to preserve 'on' key
         workflow_dict = yaml.load(workflow_content, Loader=WorkflowYAMLLoader)
         
@@ -504,6 +569,8 @@ class WorkflowParser:
         if 'jobs' not in workflow_dict:
             workflow_dict['jobs'] = {}
         
+        job_is_new = job_id not in workflow_dict['jobs']
+        
         # If insert_after is specified, we need to preserve order
         if insert_after and insert_after in workflow_dict['jobs']:
             # Create a new ordered dict
@@ -520,17 +587,7 @@ class WorkflowParser:
             # Just append at the end
             workflow_dict['jobs'][job_id] = job_dict
         
-        # Convert back to YAML with nice formatting
-        # Use custom dumper to preserve 'on' key (don't convert to 'true')
-        return yaml.dump(
-            workflow_dict, 
-            Dumper=WorkflowYAMLDumper,
-            default_flow_style=False, 
-            sort_keys=False, 
-            width=999999,
-            allow_unicode=True,
-            indent=2
-        )
+        return workflow_dict, job_is_new
     
     def insert_step_into_job(
         self, 
@@ -551,6 +608,58 @@ class WorkflowParser:
         Returns:
             Modified workflow YAML content with step inserted
         """
+        workflow_dict, _ = self._insert_steps(workflow_content, step_yaml, target_job, insert_position)
+        
+        # Convert back to YAML
+        return yaml.dump(
+            workflow_dict,
+            Dumper=WorkflowYAMLDumper,
+            default_flow_style=False,
+            sort_keys=False,
+            width=999999,
+            allow_unicode=True,
+            indent=2
+        )
+    
+    def insert_step_with_comments(
+        self,
+        workflow_content: str,
+        step_yaml: str,
+        target_job: str,
+        insert_position: str,
+        enhancement_description: str,
+        template_name: str
+    ) -> str:
+        """
+        Insert a step into an existing job and add the enhancement comments in one pass
+        
+        Same result as insert_step_into_job followed by add_step_enhancement_comments,
+        without parsing the original and enhanced workflows again to find the added steps.
+        """
+        workflow_dict, new_step_names = self._insert_steps(workflow_content, step_yaml, target_job, insert_position)
+        
+        enhanced_yaml = yaml.dump(
+            workflow_dict,
+            Dumper=WorkflowYAMLDumper,
+            default_flow_style=False,
+            sort_keys=False,
+            width=999999,
+            allow_unicode=True,
+            indent=2
+        )
+        
+        return self._annotate_added_steps(
+            workflow_content, enhanced_yaml, enhancement_description, template_name, target_job, new_step_names
+        )
+    
+    def _insert_steps(
+        self,
+        workflow_content: str,
+        step_yaml: str,
+        target_job: str,
+        insert_position: str
+    ) -> Tuple[Dict[str, Any], List[str]]:
+        """Insert steps into the parsed workflow; returns it with the names of the added steps"""
         workflow_dict = yaml.load(workflow_content, Loader=WorkflowYAMLLoader)
         
         # Parse step YAML
@@ -574,6 +683,12 @@ class WorkflowParser:
         if 'steps' not in job:
             job['steps'] = []
         
+        original_step_names = {step.get('name') for step in job['steps']}
+        new_step_names = [
+            step.get('name', '') for step in new_steps
+            if step.get('name', '') and step.get('name') not in original_step_names
+        ]
+        
         # Determine insertion point
         if insert_position == "end":
             # Add at the end
@@ -603,16 +718,7 @@ class WorkflowParser:
             # Default to end
             job['steps'].extend(new_steps)
         
-        # Convert back to YAML
-        return yaml.dump(
-            workflow_dict,
-            Dumper=WorkflowYAMLDumper,
-            default_flow_style=False,
-            sort_keys=False,
-            width=999999,
-            allow_unicode=True,
-            indent=2
-        )
+        return workflow_dict, new_step_names
     
     def add_job_dependency(self, workflow_content: str, job_id: str, needs: List[str]) -> str:
         """
@@ -662,8 +768,21 @@ class WorkflowParser:
         Returns:
             Enhanced YAML with comments preserved and added
         """
-        from datetime import datetime
-        
+        # Check if this job exists in original
+        return self._annotate_added_job(
+            original_yaml, enhanced_yaml, enhancement_description, template_name,
+            lambda job_name: f"  {job_name}:" not in original_yaml
+        )
+    
+    def _annotate_added_job(
+        self,
+        original_yaml: str,
+        enhanced_yaml: str,
+        enhancement_description: str,
+        template_name: str,
+        is_added_job: Callable[[str], bool]
+    ) -> str:
+        """Add the enhancement header and a comment before the first job is_added_job accepts"""
         lines = enhanced_yaml.split('\n')
         result_lines = []
         
@@ -710,8 +829,7 @@ class WorkflowParser:
                 # This is a job definition
                 job_name = line.split(':')[0].strip()
                 
-                # Check if this job exists in original
-                if f"  {job_name}:" not in original_yaml:
+                if is_added_job(job_name):
                     # This is the newly added job
                     result_lines.append(f"  # >>> Added by enhancement: {template_name}")
                     result_lines.append(f"  # {enhancement_description}")
@@ -742,8 +860,39 @@ class WorkflowParser:
         Returns:
             Enhanced YAML with comments
         """
-        from datetime import datetime
+        # Parse both YAMLs to find added steps
+        original_dict = yaml.load(original_yaml, Loader=WorkflowYAMLLoader)
+        enhanced_dict = yaml.load(enhanced_yaml, Loader=WorkflowYAMLLoader)
+        
+        original_steps = []
+        if 'jobs' in original_dict and target_job in original_dict['jobs']:
+            original_steps = original_dict['jobs'][target_job].get('steps', [])
         
+        enhanced_steps = []
+        if 'jobs' in enhanced_dict and target_job in enhanced_dict['jobs']:
+            enhanced_steps = enhanced_dict['jobs'][target_job].get('steps', [])
+        
+        # Find new steps
+        new_step_names = []
+        for step in enhanced_steps:
+            step_name = step.get('name', '')
+            if step_name and not any(s.get('name') == step_name for s in original_steps):
+                new_step_names.append(step_name)
+        
+        return self._annotate_added_steps(
+            original_yaml, enhanced_yaml, enhancement_description, template_name, target_job, new_step_names
+        )
+    
+    def _annotate_added_steps(
+        self,
+        original_yaml: str,
+        enhanced_yaml: str,
+        enhancement_description: str,
+        template_name: str,
+        target_job: str,
+        new_step_names: List[str]
+    ) -> str:
+        """Add the enhancement header and a comment before the first added step"""
         lines = enhanced_yaml.split('\n')
         result_lines = []
         
@@ -771,25 +920,6 @@ class WorkflowParser:
         result_lines.append(header_comment.rstrip())
         result_lines.append('')
         
-        # Parse both YAMLs to find added steps
-        original_dict = yaml.load(original_yaml, Loader=WorkflowYAMLLoader)
-        enhanced_dict = yaml.load(enhanced_yaml, Loader=WorkflowYAMLLoader)
-        
-        original_steps = []
-        if 'jobs' in original_dict and target_job in original_dict['jobs']:
-            original_steps = original_dict['jobs'][target_job].get('steps', [])
-        
-        enhanced_steps = []
-        if 'jobs' in enhanced_dict and target_job in enhanced_dict['jobs']:
-            enhanced_steps = enhanced_dict['jobs'][target_job].get('steps', [])
-        
-        # Find new steps
-        new_step_names = []
-        for step in enhanced_steps:
-            step_name = step.get('name', '')
-            if step_name and not any(s.get('name') == step_name for s in original_steps):
-                new_step_names.append(step_name)
-        
         # Add comments before new steps
         in_target_job = False
         in_steps = False
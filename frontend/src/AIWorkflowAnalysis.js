@@ -1,5 +1,6 @@
 import React, { useState, useEffect, useCallback } from 'react';
 import { githubAPI } from './githubAPI';
+import { formatErrorDetail } from './errorDetail';
 
 // Use relative URL for Docker/nginx proxy, or localhost for local development
 const API_BASE_URL = process.env.REACT_APP_API_URL || '/api';
@@ -272,7 +273,7 @@ const AIWorkflowAnalysis = () => {
 
       if (!response.ok) {
         const errorData = await response.json();
-        throw new Error(errorData.detail || 'Failed to analyze repositories');
+        throw new Error(formatErrorDetail(errorData.detail) || 'Failed to analyze repositories');
       }
 
       const data = await response.json();
@@ -322,7 +323,7 @@ const AIWorkflowAnalysis = () => {
 
       if (!response.ok) {
         const errorData = await response.json();
-        throw new Error(errorData.detail || 'Failed to apply template');
+        throw new Error(formatErrorDetail(errorData.detail) || 'Failed to apply template');
       }
 
       const result = await response.json();
@@ -431,7 +432,7 @@ const AIWorkflowAnalysis = () => {
 
       if (!response.ok) {
         const errorData = await response.json();
-        throw new Error(errorData.detail || 'Failed to preview enhancement');
+        throw new Error(formatErrorDetail(errorData.detail) || 'Failed to preview enhancement');
       }
 
       const result = await response.json();
@@ -491,7 +492,7 @@ const AIWorkflowAnalysis = () => {
 
       if (!response.ok) {
         const errorData = await response.json();
-        throw new Error(errorData.detail || 'Failed to apply enhancement');
+        throw new Error(formatErrorDetail(errorData.detail) || 'Failed to apply enhancement');
       }
 
       const result = await response.json();
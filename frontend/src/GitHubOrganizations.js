@@ -1,5 +1,6 @@
 import React, { useState, useEffect, useCallback } from 'react';
 import { githubAPI } from './githubAPI';
+import { formatErrorDetail } from './errorDetail';
 
 // Use relative URL for Docker/nginx proxy, or localhost for local development
 const API_BASE_URL = process.env.REACT_APP_API_URL || '/api';
@@ -494,7 +495,7 @@ const GitHubOrganizations = () => {
 
       if (!response.ok) {
         const errorData = await response.json();
-        throw new Error(errorData.detail || 'Failed to scan repositories');
+        throw new Error(formatErrorDetail(errorData.detail) || 'Failed to scan repositories');
       }
 
       const data = await response.json();
@@ -444,39 +444,77 @@ const LegacyConfigCleanup = () => {
       let successCount = 0;
       let failCount = 0;
 
-      for (const fileId of selectedFiles) {
-        const file = legacyFiles.find(f => f.id === fileId);
-        if (!file) continue;
+      const filesToProcess = legacyFiles.filter(f => selectedFiles.has(f.id));
 
-        try {
-          const endpoint = deletionMode === 'pr' 
-            ? `${API_BASE_URL}/github/repositories/${file.repository}/delete-file-pr`
-            : `${API_BASE_URL}/github/repositories/${file.repository}/delete-file`;
+      if (deletionMode === 'pr') {
+        // One pull request per repository, removing all of its selected files in a single commit
+        const filesByRepository = new Map();
+        for (const file of filesToProcess) {
+          if (!filesByRepository.has(file.repository)) {
+            filesByRepository.set(file.repository, []);
+          }
+          filesByRepository.get(file.repository).push(file.path);
+        }
+
+        for (const [repository, filePaths] of filesByRepository) {
+          try {
+            const fileList = filePaths.map(path => `- \`${path}\``).join('\n');
+            const response = await fetch(`${API_BASE_URL}/github/repositories/${repository}/delete-file-pr-batch`, {
+              method: 'POST',
+              headers: {
+                'Content-Type': 'application/json'
+              },
+              body: JSON.stringify({
+                file_paths: filePaths,
+                commit_message: `Remove ${filePaths.length} legacy configuration file(s)`,
+                pr_title: filePaths.length === 1
+                  ? `Remove legacy configuration file: ${filePaths[0]}`
+                  : `Remove ${filePaths.length} legacy configuration files`,
+                pr_body: `This pull request removes the following legacy configuration file(s):\n\n${fileList}\n\nThese files are no longer needed as we have migrated to the new configuration system.`
+              })
+            });
+
+            if (response.ok) {
+              successCount += filePaths.length;
+            } else {
+              failCount += filePaths.length;
+              const errorData = await response.json();
+              console.error(`Failed to create PR for ${repository}:`, errorData);
+            }
+          } catch (err) {
+            failCount += filePaths.length;
+            console.error(`Error processing ${repository}:`, err);
+          }
+        }
+      } else {
+        for (const file of filesToProcess) {
+          try {
+            const endpoint = `${API_BASE_URL}/github/repositories/${file.repository}/delete-file`;
           
-          const response = await fetch(endpoint, {
-            method: deletionMode === 'pr' ? 'POST' : 'DELETE',
-            headers: {
-              'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({
-              file_path: file.path,
-              commit_message: `Remove legacy ${file.path} configuration file`,
-              pr_title: `Remove legacy configuration file: ${file.path}`,
-              pr_body: `This pull request removes the legacy configuration file \`${file.path}\`.\n\nThis file is no longer needed as we have migrated to the new configuration system.`
-            })
-          });
+            const response = await fetch(endpoint, {
+              method: 'DELETE',
+              headers: {
+                'Content-Type': 'application/json'
+              },
+              body: JSON.stringify({
+                file_path: file.path,
+                commit_message: `Remove legacy ${file.path} configuration file`,
+                pr_title: `Remove legacy configuration file: ${file.path}`,
+                pr_body: `This pull request removes the legacy configuration file \`${file.path}\`.\n\nThis file is no longer needed as we have migrated to the new configuration system.`
+              })
+            });
 
-          if (response.ok) {
-            successCount++;
-          } else {
+            if (response.ok) {
+              successCount++;
+            } else {
+              failCount++;
+              const errorData = await response.json();
+              console.error(`Failed to delete ${file.path}:`, errorData);
+            }
+          } catch (err) {
             failCount++;
-            const errorData = await response.json();
-            const actionText = deletionMode === 'pr' ? 'create PR for' : 'delete';
-            console.error(`Failed to ${actionText} ${file.path}:`, errorData);
+            console.error(`Error processing ${file.path}:`, err);
           }
-        } catch (err) {
-          failCount++;
-          console.error(`Error processing ${file.path}:`, err);
         }
       }
 
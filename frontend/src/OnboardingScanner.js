@@ -1,6 +1,7 @@
 import React, { useState } from 'react';
 import { getOrganizationRepositories, getUserRepositories } from './githubAPI';
 import axios from 'axios';
+import { formatErrorDetail } from './errorDetail';
 
 // Use relative URL for Docker/nginx proxy, or localhost for local development
 const API_BASE_URL = process.env.REACT_APP_API_URL ? process.env.REACT_APP_API_URL.replace('/api', '') : '';
@@ -72,7 +73,7 @@ function OnboardingScanner() {
       const response = await axios.post(`${API_BASE_URL}/api/onboarding/scan`, selectedRepos);
       setScanResults(response.data);
     } catch (err) {
-      setError(err.response?.data?.detail || 'Failed to scan repositories');
+      setError(formatErrorDetail(err.response?.data?.detail) || 'Failed to scan repositories');
     } finally {
       setLoading(false);
     }
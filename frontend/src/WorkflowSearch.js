@@ -394,11 +394,11 @@ const WorkflowSearch = () => {
                         </div>
                         <div className="stat-item">
                           <span className="stat-label">Total Searched:</span>
-                          <span className="stat-value">{workflowSearchResults.search_statistics.total_repositories_searched}</span>
+                          <span className="stat-value">{workflowSearchResults.search_statistics.total_repositories_searched ?? 'All (code search)'}</span>
                         </div>
                         <div className="stat-item">
                           <span className="stat-label">Repositories with Workflows:</span>
-                          <span className="stat-value">{workflowSearchResults.search_statistics.repositories_with_workflows}</span>
+                          <span className="stat-value">{workflowSearchResults.search_statistics.repositories_with_workflows ?? 'n/a'}</span>
                         </div>
                         <div className="stat-item">
                           <span className="stat-label">Workflow Files Found:</span>
@@ -0,0 +1,13 @@
+// FastAPI validation errors (422) report `detail` as a list of { loc, msg } objects
+// instead of a message string; join them into one readable message
+export const formatErrorDetail = (detail) => {
+  if (!Array.isArray(detail)) {
+    return detail;
+  }
+  return detail
+    .map(error => {
+      const field = (error.loc || []).filter(part => part !== 'body').join('.');
+      return field ? `${field}: ${error.msg}` : error.msg;
+    })
+    .join('; ');
+};